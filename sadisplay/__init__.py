@@ -1,6 +1,65 @@
 # -*- coding: utf-8 -*-
+import importlib
 
 __version__ = '0.4.9'
 
-from sadisplay.describe import describe  # flake8: noqa
 from sadisplay.render import plantuml, dot  # flake8: noqa
+
+# describing needs sqlalchemy, rendering saved descriptions must not
+# import it (see sadisplay.desc), so sadisplay.describer is imported on
+# the first call of these functions. The module sadisplay.describe is
+# imported first, so the function below takes its name in the package.
+importlib.import_module('sadisplay.describe')
+
+
+def describe(items, **kwargs):
+    """Detecting attributes, inherits and relations
+
+    :param items: list of objects to describe (mapped classes,
+                  mappers or tables)
+    :param kwargs: options of sadisplay.describer.describe, which also
+                   describes the result
+
+    Return tuple (objects, relations, inherits)
+    """
+    from sadisplay import describer
+
+    return describer.describe(items, **kwargs)
+
+
+def describe_registry(base, **kwargs):
+    """Describe all classes mapped by a declarative base or registry
+
+    :param base: declarative base class or ``sqlalchemy.orm.registry``
+    :param kwargs: options passed to :func:`describe`
+
+    Return tuple (objects, relations, inherits)
+    """
+    from sadisplay import describer
+
+    return describer.describe_registry(base, **kwargs)
+
+
+def describe_metadata(metadata, **kwargs):
+    """Describe all tables of a ``MetaData`` in dependency order
+
+    :param metadata: ``sqlalchemy.MetaData`` instance
+    :param kwargs: options passed to :func:`describe`
+
+    Return tuple (objects, relations, inherits)
+    """
+    from sadisplay import describer
+
+    return describer.describe_metadata(metadata, **kwargs)
+
+
+class Describer(object):
+    """Reusable describe engine, see sadisplay.describer.Describer
+
+    Instances are of that class, imported on first use.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        from sadisplay import describer
+
+        return describer.Describer(*args, **kwargs)
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Schema checks over ``describe()`` results
+
+Each check takes the ``(objects, relations, inherits)`` tuple and runs
+in linear time over it, so it can gate CI even on huge databases.
+"""
+from collections import defaultdict
+
+
+def _qualified(cls):
+    if cls.get('schema'):
+        return '%s.%s' % (cls['schema'], cls['name'])
+    return cls['name']
+
+
+def _foreign_keys(cls):
+    """Column lists of foreign key constraints of class record
+
+    Without ``constraints`` (``show_indexes=False`` or classes not mapped
+    to a table) each foreign key column is taken as one constraint.
+    Constraints on columns of the table not mapped by the class (e.g.
+    of single table inheritance subclasses) are left to those classes.
+    """
+    if 'constraints' in cls:
+        names = set(name for type, name, role in cls['cols'])
+        return [cols for cols in cls['constraints']['fks']
+                if set(cols) <= names]
+    return [[name] for type, name, role in cls['cols'] if role == 'fk']
+
+
+def _covering(cls):
+    """Column lists whose leading columns can serve a foreign key"""
+    covering = [index['cols'] for index in cls['indexes'] if index['cols']]
+    if 'constraints' in cls:
+        covering.append(cls['constraints']['pk'])
+        covering += cls['constraints']['unique']
+    else:
+        # column order of the primary key is not known
+        covering += [[name] for type, name, role in cls['cols']
+                     if role == 'pk']
+    return covering
+
+
+def unindexed_foreign_keys(desc):
+    """Foreign keys whose columns do not lead an index
+
+    A foreign key is indexed if its columns, in any order, are the
+    leading columns of an index, the primary key or a unique
+    constraint. Indexes must be described with their columns
+    (``show_columns_of_indexes=True``).
+
+    :param desc: result of sadisplay.describe function
+
+    Return list::
+
+        [{
+            'name': '<class name>',
+            'schema': '<schema or None>',
+            'columns': ['<foreign key column name>', ...],
+            'to': ['<referenced class name>', ...],
+        }, ...]
+    """
+    objects, relations, inherits = desc
+
+    targets = defaultdict(list)
+    for rel in relations:
+        targets[rel.get('from_schema'), rel['from'],
+                rel['by']].append(rel['to'])
+
+    result = []
+    for cls in objects:
+        covering = _covering(cls)
+
+        for cols in _foreign_keys(cls):
+            if not cols or any(
+                    set(cover[:len(cols)]) == set(cols)
+                    for cover in covering):
+                continue
+
+            to = []
+            for col in cols:
+                to += [t for t in targets.get(
+                    (cls.get('schema'), cls['name'], col), [])
+                       if t not in to]
+
+            result.append({
+                'name': cls['name'],
+                'schema': cls.get('schema'),
+                'columns': list(cols),
+                'to': to,
+            })
+
+    return result
+
+
+def format_unindexed_foreign_key(finding):
+    columns = ', '.join(finding['columns'])
+    if len(finding['columns']) > 1:
+        columns = '(%s)' % columns
+    return '%s.%s%s: foreign key without index' % (
+        _qualified(finding), columns,
+        ' -> %s' % ', '.join(finding['to']) if finding['to'] else '')
+
+
+def highlight_unindexed_foreign_keys(desc, findings=None):
+    """Mark relations by unindexed foreign keys for the renderers
+
+    Return new ``describe()`` result where such relations have
+    ``'unindexed': True``
+    """
+    objects, relations, inherits = desc
+
+    if findings is None:
+        findings = unindexed_foreign_keys(desc)
+
+    unindexed = set((f.get('schema'), f['name'], col) for f in findings
+                    for col in f['columns'])
+    relations = [
+        dict(rel, unindexed=True)
+        if (rel.get('from_schema'), rel['from'], rel['by']) in unindexed
+        else rel for rel in relations
+    ]
+
+    return objects, relations, inherits
+
+
+def _index_trie(indexes):
+    """Prefix trie of index columns, nodes are (children, indexes)"""
+    root = ({}, [])
+    for index in indexes:
+        node = root
+        for col in index['cols']:
+            node = node[0].setdefault(col, ({}, []))
+        node[1].append(index)
+    return root
+
+
+def _primary_key(cls):
+    """Columns of primary key in order, None if not known"""
+    if 'constraints' in cls:
+        return cls['constraints']['pk']
+    pk = [name for type, name, role in cls['cols'] if role == 'pk']
+    # column order of composite primary keys is not known
+    return pk if len(pk) == 1 else None
+
+
+def redundant_indexes(desc):
+    """Indexes made redundant by another index or the primary key
+
+    Per class the columns of indexes and of the primary key are put into
+    a prefix trie, so each index is compared in time of its length:
+
+    * ``duplicate`` - same columns in the same order as another index
+    * ``prefix`` - columns are a left prefix of a longer index or of the
+      primary key
+    * ``primary-key`` - same columns in the same order as the primary key
+
+    Unique indexes enforce their constraint, so they are not reported as
+    ``prefix``, and of duplicates a unique index is kept.
+
+    :param desc: result of sadisplay.describe function
+
+    Return list::
+
+        [{
+            'name': '<class name>',
+            'schema': '<schema or None>',
+            'index': '<redundant index name>',
+            'kind': '<duplicate|prefix|primary-key>',
+            'of': '<index name or PRIMARY KEY>',
+        }, ...]
+    """
+    objects, relations, inherits = desc
+
+    result = []
+    for cls in objects:
+        indexes = [index for index in cls['indexes'] if index['cols']]
+        if not indexes:
+            continue
+
+        pk = _primary_key(cls)
+        keys = [{'name': 'PRIMARY KEY', 'cols': pk, 'pk': True}] \
+            if pk else []
+        found = {}
+
+        nodes = [_index_trie(keys + indexes)]
+        while nodes:
+            children, items = nodes.pop()
+            nodes.extend(children.values())
+            if not items:
+                continue
+
+            # the primary key, then unique indexes are kept
+            items = sorted(items, key=lambda i: (
+                not i.get('pk'), not i.get('unique')))
+            keeper = items[0]
+            for item in items[1:]:
+                found.setdefault(item['name'], (
+                    'primary-key' if keeper.get('pk') else 'duplicate',
+                    keeper['name']))
+
+            if children and not keeper.get('pk') and \
+                    not keeper.get('unique'):
+                # any path down ends at a longer index
+                node = next(iter(children.values()))
+                while not node[1]:
+                    node = next(iter(node[0].values()))
+                found.setdefault(keeper['name'], ('prefix',
+                                                  node[1][0]['name']))
+
+        for index in indexes:
+            if index['name'] in found:
+                kind, of = found[index['name']]
+                result.append({
+                    'name': cls['name'],
+                    'schema': cls.get('schema'),
+                    'index': index['name'],
+                    'kind': kind,
+                    'of': of,
+                })
+
+    return result
+
+
+def format_redundant_index(finding):
+    return '%s: index %s is %s' % (
+        _qualified(finding), finding['index'], {
+            'duplicate': 'a duplicate of %s',
+            'prefix': 'a left prefix of %s',
+            'primary-key': 'a duplicate of the %s',
+        }[finding['kind']] % finding['of'])
+
+
+def highlight_redundant_indexes(desc, findings=None):
+    """Mark redundant indexes for the renderers
+
+    Return new ``describe()`` result where such indexes have
+    ``'redundant': '<duplicate|prefix> of <other index>'``
+    """
+    objects, relations, inherits = desc
+
+    if findings is None:
+        findings = redundant_indexes(desc)
+
+    labels = {
+        'duplicate': 'duplicate of %s',
+        'prefix': 'prefix of %s',
+        'primary-key': 'duplicate of %s',
+    }
+    redundant = dict(
+        ((f['name'], f.get('schema'), f['index']),
+         labels[f['kind']] % f['of']) for f in findings)
+    if not redundant:
+        return desc
+
+    result = []
+    for cls in objects:
+        indexes = []
+        for index in cls['indexes']:
+            key = (cls['name'], cls.get('schema'), index['name'])
+            if key in redundant:
+                index = dict(index, redundant=redundant[key])
+            indexes.append(index)
+        result.append(dict(cls, indexes=indexes))
+
+    return result, relations, inherits
+
+
+CHECKS = {
+    'unindexed-fks': (unindexed_foreign_keys, format_unindexed_foreign_key,
+                      highlight_unindexed_foreign_keys),
+    'redundant-indexes': (redundant_indexes, format_redundant_index,
+                          highlight_redundant_indexes),
+}
+
+
+def check(desc, names):
+    """Run named checks
+
+    Return list of (check name, formatted finding) tuples
+    """
+    report = []
+    for name in names:
+        run, format, highlight = CHECKS[name]
+        report += [(name, format(finding)) for finding in run(desc)]
+    return report
+
+
+def highlight(desc, names):
+    """Annotate ``describe()`` result with findings of named checks"""
+    for name in names:
+        desc = CHECKS[name][2](desc)
+    return desc
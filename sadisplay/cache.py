@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from sadisplay import __version__
+
+
+class FragmentCache(object):
+    """Content-addressed cache of rendered class fragments
+
+    Each fragment is keyed by a stable hash of the output format, the
+    render options and the class record produced by ``describe()``, so
+    an unchanged class is reused verbatim whatever diagram it is part of.
+
+    Fragments are kept in memory with LRU eviction and, if ``directory``
+    is given, also stored on disk to be reused across runs.
+
+    :param maxsize: maximum number of fragments kept in memory
+    :param directory: optional directory for persistent fragments
+
+    Example usage::
+
+        import sadisplay
+        from sadisplay.cache import FragmentCache
+
+        cache = FragmentCache(directory='.sadisplay-cache')
+        sadisplay.dot(desc, cache=cache)
+        sadisplay.plantuml(desc, cache=cache)
+    """
+
+    def __init__(self, maxsize=4096, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def key(*parts):
+        """Stable hex digest of JSON serializable parts"""
+        data = json.dumps(
+            [__version__] + list(parts),
+            sort_keys=True,
+            separators=(',', ':'), )
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.frag')
+
+    def get(self, key):
+        """Return cached fragment or None"""
+        with self._lock:
+            try:
+                value = self._fragments.pop(key)
+            except KeyError:
+                pass
+            else:
+                self._fragments[key] = value
+                return value
+
+        if not self.directory:
+            return None
+
+        try:
+            with io.open(self._path(key), encoding='utf-8') as f:
+                value = f.read()
+        except (IOError, OSError):
+            return None
+
+        self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        """Store fragment in memory and on disk"""
+        self._remember(key, value)
+
+        if not self.directory:
+            return
+
+        path = self._path(key)
+        if not os.path.isdir(os.path.dirname(path)):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                # created concurrently
+                pass
+
+        # write then rename, so readers never see partial fragments
+        tmp = '%s.%s.%s' % (path, os.getpid(),
+                            threading.current_thread().ident)
+        with io.open(tmp, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.rename(tmp, path)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._fragments.pop(key, None)
+            self._fragments[key] = value
+            while len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+
+    def fragment(self, kind, record, options, render):
+        """Return rendered fragment of record, rendering it on miss
+
+        :param kind: output format name
+        :param record: class record of ``describe()`` result
+        :param options: render options which affect the fragment
+        :param render: callable which renders the record on miss
+        """
+        key = self.key(kind, options, record)
+        value = self.get(key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is not None:
+            return value
+
+        value = render(record)
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        """Drop in-memory fragments (disk fragments are kept)"""
+        with self._lock:
+            self._fragments.clear()
+
+    def __len__(self):
+        return len(self._fragments)
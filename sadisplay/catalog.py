@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Reflection of whole schemas by a few catalog queries
+
+``MetaData.reflect`` inspects tables one by one, issuing several queries
+per table. On dialects listed in DIALECTS tables, columns, foreign keys
+and indexes of a schema are fetched by one joined query each instead,
+and Table objects are built from the rows into the MetaData, ready for
+``describe()``. Other dialects fall back to ``MetaData.reflect``.
+"""
+import re
+from collections import OrderedDict
+
+from sqlalchemy import text, Table, Column, PrimaryKeyConstraint, \
+    ForeignKeyConstraint, UniqueConstraint, Index
+
+# catalog of sqlite tables, without sqlite internal ones
+_SQLITE_MASTER = (
+    'FROM {prefix}sqlite_master m {join} '
+    'WHERE m.type = \'table\' AND m.name NOT LIKE \'sqlite~_%\' ESCAPE \'~\' '
+    'ORDER BY {order}')
+
+# table valued pragma functions are available since 3.16
+SQLITE_VERSION = (3, 16)
+
+# table_xinfo lists generated columns too, since 3.31
+SQLITE_XINFO_VERSION = (3, 31)
+
+
+def _sqlite_rows(conn, schema, columns, join, order):
+    prefix = '%s.' % conn.dialect.identifier_preparer.quote(schema)
+    query = text('SELECT %s ' % columns + _SQLITE_MASTER.format(
+        prefix=prefix, join=join, order=order))
+    return conn.execute(query, {'schema': schema}).fetchall()
+
+
+def _sqlite_type(dialect, type_, generated):
+    """Column type like SQLiteDialect.get_columns and _get_column_info"""
+    type_ = type_.upper()
+    if generated:
+        # "INTEGER GENERATED ALWAYS" of generated columns
+        type_ = re.sub('GENERATED', '', type_)
+        type_ = re.sub('ALWAYS', '', type_).strip()
+    return dialect._resolve_type_affinity(type_)
+
+
+def _sqlite(conn, schema):
+    """Return OrderedDict of table name -> columns, fks, indexes and
+    unique constraints
+    """
+    schema = schema or 'main'
+    tables = OrderedDict()
+
+    for name, in _sqlite_rows(conn, schema, 'm.name', '', 'm.name'):
+        tables[name] = {
+            'columns': [],
+            'fks': [],
+            'indexes': [],
+            'uniques': [],
+        }
+
+    if conn.dialect.server_version_info >= SQLITE_XINFO_VERSION:
+        info, hidden_column = 'table_xinfo', 'c.hidden'
+    else:
+        info, hidden_column = 'table_info', '0'
+
+    for name, cid, column, type_, notnull, default, pk, hidden in \
+            _sqlite_rows(
+                conn, schema, 'm.name, c.cid, c.name, c.type, c."notnull", '
+                'c.dflt_value, c.pk, %s' % hidden_column,
+                'JOIN pragma_%s(m.name, :schema) c' % info, 'm.name, c.cid'):
+        # hidden columns of virtual tables, 2 and 3 are generated ones
+        if hidden == 1:
+            continue
+        tables[name]['columns'].append({
+            'name': column,
+            'type': _sqlite_type(conn.dialect, type_, bool(hidden)),
+            'nullable': not notnull,
+            'default': default,
+            'pk': pk,
+        })
+
+    for name, id_, seq, target, column, to in _sqlite_rows(
+            conn, schema,
+            'm.name, f.id, f.seq, f."table", f."from", f."to"',
+            'JOIN pragma_foreign_key_list(m.name, :schema) f',
+            'm.name, f.id, f.seq'):
+        fks = tables[name]['fks']
+        if not fks or fks[-1]['id'] != id_:
+            fks.append({'id': id_, 'table': target, 'cols': [], 'to': []})
+        fks[-1]['cols'].append(column)
+        fks[-1]['to'].append(to)
+
+    for name, index, unique, origin, seqno, column in _sqlite_rows(
+            conn, schema,
+            'm.name, i.name, i."unique", i.origin, c.seqno, c.name',
+            'JOIN pragma_index_list(m.name, :schema) i '
+            'JOIN pragma_index_info(i.name, :schema) c', 'm.name, i.seq, '
+            'c.seqno'):
+        # indexes of primary keys are implicit, those of unique
+        # constraints stand for the constraint
+        if origin == 'pk':
+            continue
+        indexes = tables[name]['uniques' if origin == 'u' else 'indexes']
+        if not indexes or indexes[-1]['name'] != index:
+            indexes.append({'name': index, 'unique': unique, 'cols': []})
+        indexes[-1]['cols'].append(column)
+
+    for table in tables.values():
+        # without referred columns the primary key is referred
+        for fk in table['fks']:
+            if None in fk['to']:
+                target = tables.get(fk['table'])
+                columns = target['columns'] if target else []
+                fk['to'] = [
+                    c['name'] for c in sorted(columns, key=lambda c: c['pk'])
+                    if c['pk']
+                ]
+        # indexes on expressions are skipped like by MetaData.reflect
+        table['indexes'] = [i for i in table['indexes']
+                            if None not in i['cols']]
+
+    return tables
+
+
+def _sqlite_supported(dialect):
+    version = getattr(dialect.dbapi, 'sqlite_version_info', (0, ))
+    return tuple(version) >= SQLITE_VERSION
+
+
+DIALECTS = {
+    'sqlite': (_sqlite, _sqlite_supported),
+}
+
+
+def supported(dialect):
+    """Whether schemas of dialect can be reflected by catalog queries"""
+    if dialect.name not in DIALECTS:
+        return False
+    return DIALECTS[dialect.name][1](dialect)
+
+
+def _build(meta, schema, name, table):
+    def _spec(target, column):
+        return '.'.join([s for s in (schema, target, column) if s])
+
+    args = []
+    for column in table['columns']:
+        kwargs = {'nullable': column['nullable']}
+        if column['default'] is not None:
+            kwargs['server_default'] = text(column['default'])
+        args.append(Column(column['name'], column['type'], **kwargs))
+
+    pks = sorted((c for c in table['columns'] if c['pk']),
+                 key=lambda c: c['pk'])
+    if pks:
+        args.append(PrimaryKeyConstraint(*[c['name'] for c in pks]))
+
+    for fk in table['fks']:
+        if len(fk['to']) != len(fk['cols']):
+            # referred table without primary key
+            continue
+        args.append(ForeignKeyConstraint(
+            fk['cols'], [_spec(fk['table'], to) for to in fk['to']]))
+
+    for unique in table['uniques']:
+        args.append(UniqueConstraint(*unique['cols']))
+
+    for index in table['indexes']:
+        args.append(Index(index['name'], *index['cols'],
+                          unique=bool(index['unique'])))
+
+    return Table(name, meta, *args, schema=schema)
+
+
+def reflect(conn, meta, schema=None, only=None):
+    """Reflect tables of schema into meta by catalog queries
+
+    :param conn: connection of a dialect for which :func:`supported`
+    :param meta: MetaData to add tables to, tables already in it are
+                 kept
+    :param schema: schema name, None for the default one
+    :param only: optional list of table names, tables referenced by
+                 their foreign keys are reflected too like by
+                 ``MetaData.reflect``
+
+    Return list of names of reflected tables
+    """
+    fetch = DIALECTS[conn.dialect.name][0]
+    tables = fetch(conn, schema)
+
+    names = list(tables)
+    if only is not None:
+        selected = set()
+        todo = [name for name in only if name in tables]
+        while todo:
+            name = todo.pop()
+            if name in selected:
+                continue
+            selected.add(name)
+            todo += [fk['table'] for fk in tables[name]['fks']
+                     if fk['table'] in tables]
+        names = [name for name in names if name in selected]
+
+    reflected = []
+    for name in names:
+        key = '%s.%s' % (schema, name) if schema else name
+        if key not in meta.tables:
+            _build(meta, schema, name, tables[name])
+            reflected.append(name)
+    return reflected
+
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+Command line of sadisplay
+
+    sadisplay [options]          reflect database, see sadisplay.reflect
+    sadisplay serve [options]    serve diagrams, see sadisplay.serve
+    sadisplay render [options]   render saved description
+    sadisplay source [options] PATH...
+                                 describe models found in source files
+                                 without importing them
+
+Rendering a description saved by ``sadisplay --save`` never imports
+SQLAlchemy.
+"""
+import io
+import os
+import sys
+from optparse import OptionParser
+
+from sadisplay import render, image, analyze, __version__
+from sadisplay.progress import Progress, StderrDisplay
+from sadisplay.desc import split_schemas, overview, load, save
+from sadisplay.cache import FragmentCache
+
+
+def add_output_options(parser):
+    """Add options of rendered formats, files and checks"""
+
+    parser.add_option(
+        '-r',
+        '--render',
+        dest='render',
+        default='dot',
+        help='Output format(s) through "," - plantuml, dot, dot-large '
+        '(plain nodes and collapsed edges for sfdp)', )
+
+    parser.add_option(
+        '--large-columns',
+        dest='large_columns',
+        default='keys',
+        choices=['all', 'keys', 'none'],
+        help='Columns of dot-large tables - all, keys (pk/fk) or none', )
+
+    parser.add_option(
+        '-o',
+        '--output',
+        dest='output',
+        help='Directory to write schema.<format> files to', )
+
+    parser.add_option(
+        '-T',
+        '--image',
+        dest='image',
+        choices=list(image.IMAGE_TYPES),
+        help='Render images with local dot/plantuml - svg or png', )
+
+    parser.add_option(
+        '--overview',
+        dest='overview',
+        action='store_true',
+        help='Output overview of schemas with counts of tables and '
+        'foreign keys between them, with --split-schemas linked to '
+        'their diagrams (formats dot, plantuml, json)', )
+
+    parser.add_option(
+        '--split-schemas',
+        dest='split_schemas',
+        action='store_true',
+        help='Output one diagram per schema', )
+
+    parser.add_option(
+        '-j',
+        '--jobs',
+        dest='jobs',
+        type='int',
+        default=4,
+        help='Maximum number of concurrent image processes', )
+
+    parser.add_option(
+        '--timeout',
+        dest='timeout',
+        type='float',
+        default=300,
+        help='Seconds to wait for each image process', )
+
+    parser.add_option(
+        '--plantuml-jar',
+        dest='plantuml_jar',
+        help='Path to plantuml.jar (default $PLANTUML_JAR)', )
+
+    parser.add_option(
+        '--check',
+        dest='check',
+        help='Report findings of checks through "," and exit, '
+        'with status 1 if any - {0}'.format(', '.join(sorted(
+            analyze.CHECKS))), )
+
+    parser.add_option(
+        '--highlight',
+        dest='highlight',
+        help='Highlight findings of checks through "," in diagrams', )
+
+    parser.add_option(
+        '--cache-dir',
+        dest='cache_dir',
+        help='Directory to reuse rendered tables across runs', )
+
+
+def add_progress_options(parser):
+    """Add options of progress display and time budget"""
+
+    parser.add_option(
+        '--progress',
+        dest='progress',
+        action='store_true',
+        help='Show progress of stages with ETA on stderr', )
+
+    parser.add_option(
+        '--time-budget',
+        dest='time_budget',
+        type='float',
+        help='Seconds for the whole run, then output what is done '
+        'and a summary of skipped tables on stderr', )
+
+
+def make_progress(options):
+    """Progress of progress options or None if not asked for"""
+    if not options.progress and options.time_budget is None:
+        return None
+    return Progress(
+        callback=StderrDisplay() if options.progress else None,
+        time_budget=options.time_budget, )
+
+
+def finish_progress(progress):
+    """End progress display and write summary of skipped items"""
+    if progress is None:
+        return
+    if isinstance(progress.callback, StderrDisplay):
+        progress.callback.finish()
+    lines = progress.summary()
+    if lines:
+        sys.stderr.write('time budget of {0}s spent\n'.format(
+            progress.time_budget))
+        for line in lines:
+            sys.stderr.write('  {0}\n'.format(line))
+
+
+def output_settings(options):
+    """Validate output options, exit on errors
+
+    Return tuple (formats, checks), where checks are lists of check
+    names of --check and --highlight
+    """
+    formats = list(map(str.strip, options.render.split(',')))
+    for name in formats:
+        known = name in render.RENDERERS
+        if options.overview:
+            known = name in render.OVERVIEW_RENDERERS and (
+                known or not options.split_schemas)
+        if not known or (options.image and name == 'json'):
+            print('Unknown render format: {0}'.format(name))
+            exit(1)
+
+    checks = []
+    for value in (options.check, options.highlight):
+        names = list(map(str.strip, (value or '').split(',')))
+        names = [name for name in names if name]
+        for name in names:
+            if name not in analyze.CHECKS:
+                print('Unknown check: {0}'.format(name))
+                exit(1)
+        checks.append(names)
+
+    if not options.output and (len(formats) > 1 or options.image or
+                               options.split_schemas):
+        print('-o/--output option required for several formats, '
+              'images or split schemas')
+        exit(1)
+
+    return formats, checks
+
+
+def output(desc, options, formats, checks, progress=None):
+    """Check or render ``describe()`` result as set by output options
+
+    :param progress: optional sadisplay.progress.Progress of rendering
+                     and images, finished before returning
+    """
+    try:
+        _output(desc, options, formats, checks, progress)
+    finally:
+        finish_progress(progress)
+
+
+def _output(desc, options, formats, checks, progress):
+
+    if checks[0]:
+        report = analyze.check(desc, checks[0])
+        for name, line in report:
+            print('{0}: {1}'.format(name, line))
+        exit(1 if report else 0)
+
+    desc = analyze.highlight(desc, checks[1])
+
+    cache = None
+    if options.cache_dir:
+        cache = FragmentCache(directory=options.cache_dir)
+
+    def _filename(name, fmt):
+        if not options.image:
+            return '{0}.{1}'.format(name, fmt)
+        if len(formats) > 1:
+            return '{0}.{1}.{2}'.format(name, fmt, options.image)
+        return '{0}.{1}'.format(name, options.image)
+
+    outputs = []
+
+    if options.split_schemas:
+        parts = split_schemas(desc)
+    elif not options.overview:
+        parts = [('schema', desc)]
+    else:
+        parts = []
+
+    for name, part in parts:
+        result = render.multi(part, formats, cache=cache,
+                              large_columns=options.large_columns,
+                              progress=progress)
+        outputs += [(_filename(name, fmt), fmt, result[fmt])
+                    for fmt in formats]
+
+    if options.overview:
+        summary = overview(desc)
+        for fmt in formats:
+            link = None
+            if options.split_schemas:
+                link = _filename('{schema}', fmt)
+            outputs.append((_filename('overview', fmt), fmt,
+                            render.OVERVIEW_RENDERERS[fmt](summary,
+                                                           link=link)))
+
+    if not options.output:
+        print(outputs[0][2])
+        return
+
+    if not os.path.isdir(options.output):
+        os.makedirs(options.output)
+
+    if not options.image:
+        for filename, fmt, text in outputs:
+            path = os.path.join(options.output, filename)
+            with io.open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return
+
+    results = image.generate_many(
+        outputs,
+        options.image,
+        workers=options.jobs,
+        timeout=options.timeout,
+        plantuml_jar=options.plantuml_jar,
+        progress=progress, )
+
+    failed = False
+    for result in results:
+        if result['error']:
+            failed = True
+            sys.stderr.write('{0}: {1}\n'.format(result['name'],
+                                                 result['error']))
+            continue
+
+        with open(os.path.join(options.output, result['name']), 'wb') as f:
+            f.write(result['image'])
+        sys.stderr.write('{0} {1:.2f}s\n'.format(result['name'],
+                                                 result['seconds']))
+
+    if failed:
+        exit(1)
+
+
+def run_render(argv):
+    """Command for rendering saved description"""
+    parser = OptionParser(
+        prog='sadisplay render',
+        version=__version__,
+        description=__doc__, )
+
+    parser.add_option(
+        '--from',
+        dest='source',
+        help='Description file saved by sadisplay --save', )
+
+    add_output_options(parser)
+    add_progress_options(parser)
+
+    (options, args) = parser.parse_args(argv)
+
+    if not options.source:
+        print('--from option required')
+        exit(1)
+
+    formats, checks = output_settings(options)
+
+    try:
+        desc = load(options.source)
+    except (IOError, ValueError) as e:
+        print('Cannot load description: {0}'.format(e))
+        exit(1)
+
+    output(desc, options, formats, checks, make_progress(options))
+
+
+def run_source(argv):
+    """Command for describing models of source files"""
+    parser = OptionParser(
+        prog='sadisplay source',
+        usage='%prog [options] PATH...',
+        version=__version__,
+        description=__doc__, )
+
+    parser.add_option(
+        '-w',
+        '--workers',
+        dest='workers',
+        type='int',
+        help='Number of processes parsing files', )
+
+    parser.add_option(
+        '--save',
+        dest='save',
+        help='Save description to file for sadisplay render and exit', )
+
+    add_output_options(parser)
+    add_progress_options(parser)
+
+    (options, args) = parser.parse_args(argv)
+
+    if not args:
+        print('PATH argument required')
+        exit(1)
+
+    from sadisplay.source import describe_source
+
+    formats, checks = output_settings(options)
+
+    cache = None
+    if options.cache_dir:
+        cache = FragmentCache(directory=options.cache_dir)
+
+    try:
+        desc = describe_source(args, workers=options.workers, cache=cache)
+    except (IOError, SyntaxError) as e:
+        print('Cannot parse source: {0}'.format(e))
+        exit(1)
+
+    if options.save:
+        save(desc, options.save)
+        return
+
+    output(desc, options, formats, checks, make_progress(options))
+
+
+def run(argv=None):
+    """Entry point of the sadisplay command"""
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] == 'serve':
+        from sadisplay import serve
+        return serve.run(argv[1:])
+
+    if argv and argv[0] == 'render':
+        return run_render(argv[1:])
+
+    if argv and argv[0] == 'source':
+        return run_source(argv[1:])
+
+    from sadisplay import reflect
+    return reflect.run(argv)
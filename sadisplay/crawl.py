@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy reflection of the foreign key neighbourhood of seed tables
+
+Seed tables are reflected first, then foreign keys are followed breadth
+first and only newly reached tables are reflected, level by level.
+Outgoing foreign keys are known from the reflected tables, tables
+referencing reached ones are found by one catalog query per schema and
+level, so the rest of the database is never reflected.
+"""
+from collections import defaultdict
+
+from sqlalchemy import text, inspect
+
+from sadisplay.describer import SQLALCHEMY_VERSION
+
+DIRECTIONS = ('out', 'in', 'both')
+
+
+def _postgresql(conn, schema, names):
+    query = text("""
+        SELECT rn.nspname, r.relname
+        FROM pg_catalog.pg_constraint c
+        JOIN pg_catalog.pg_class r ON r.oid = c.conrelid
+        JOIN pg_catalog.pg_namespace rn ON rn.oid = r.relnamespace
+        JOIN pg_catalog.pg_class t ON t.oid = c.confrelid
+        JOIN pg_catalog.pg_namespace tn ON tn.oid = t.relnamespace
+        WHERE c.contype = 'f' AND tn.nspname = :schema
+          AND t.relname = ANY(:names)
+    """)
+    return set(
+        tuple(row)
+        for row in conn.execute(query, {'schema': schema,
+                                        'names': list(names)}))
+
+
+def _mysql(conn, schema, names):
+    params = dict(('name_%d' % i, name) for i, name in enumerate(names))
+    query = text("""
+        SELECT DISTINCT table_schema, table_name
+        FROM information_schema.key_column_usage
+        WHERE referenced_table_schema = :schema
+          AND referenced_table_name IN (%s)
+    """ % ', '.join(':%s' % key for key in sorted(params)))
+    params['schema'] = schema
+    return set(tuple(row) for row in conn.execute(query, params))
+
+
+def _sqlite(conn, schema, names):
+    # foreign keys of attached databases can not cross databases
+    prefix = '%s.' % conn.dialect.identifier_preparer.quote(schema)
+    query = text('SELECT DISTINCT m.name, f."table" '
+                 'FROM %ssqlite_master m '
+                 'JOIN pragma_foreign_key_list(m.name, :schema) f '
+                 'WHERE m.type = \'table\'' % prefix)
+    names = set(names)
+    return set((schema, name)
+               for name, target in conn.execute(query, {'schema': schema})
+               if target in names)
+
+
+DIALECTS = {
+    'postgresql': _postgresql,
+    'mysql': _mysql,
+    'sqlite': _sqlite,
+}
+
+DEFAULT_SCHEMAS = {
+    'sqlite': 'main',
+}
+
+
+def _inspector(conn, schema, names):
+    """Fallback of unsupported dialects, inspects every table of schema"""
+    inspector = inspect(conn)
+    result = set()
+    for name in inspector.get_table_names(schema=schema):
+        for fk in inspector.get_foreign_keys(name, schema=schema):
+            if fk['referred_table'] in names and \
+                    (fk.get('referred_schema') or schema) == schema:
+                result.add((schema, name))
+    return result
+
+
+def referencing_tables(conn, tables):
+    """Tables with foreign keys to any of tables by catalog queries
+
+    :param conn: database connection
+    :param tables: set of (schema, table name), schema None is the
+                   default one
+
+    Return set of (schema, table name)
+    """
+    schemas = defaultdict(set)
+    for schema, name in tables:
+        schemas[schema].add(name)
+
+    fetch = DIALECTS.get(conn.dialect.name, _inspector)
+    default = conn.dialect.default_schema_name or \
+        DEFAULT_SCHEMAS.get(conn.dialect.name)
+
+    result = set()
+    for schema, names in schemas.items():
+        for found, name in fetch(conn, schema or default, names):
+            if schema is None and found == default:
+                found = None
+            result.add((found, name))
+    return result
+
+
+def referenced_tables(table):
+    """Tables referenced by foreign keys of reflected table
+
+    Return set of (schema, table name), schema is None for unqualified
+    targets, which are in the default schema
+    """
+    result = set()
+    for fk in table.foreign_keys:
+        # "[schema.]table.column", the table may not be reflected yet
+        target = fk.target_fullname.rsplit('.', 1)[0]
+        schema, _, name = target.rpartition('.')
+        result.add((schema or None, name))
+    return result
+
+
+def _table_key(schema, name):
+    return '%s.%s' % (schema, name) if schema else name
+
+
+def crawl(engine, meta, seeds, schemas, depth=1, direction='out',
+          progress=None):
+    """Reflect seed tables and tables reached by foreign keys
+
+    :param engine: engine of the database
+    :param meta: MetaData to reflect tables into
+    :param seeds: list of ``table`` or ``schema.table`` names,
+                  unqualified names are looked up in every schema
+    :param schemas: list of schemas of unqualified seeds, None for the
+                    default one
+    :param depth: number of foreign key hops from seeds
+    :param direction: follow foreign keys ``out`` of reached tables,
+                      ``in`` to them or ``both``
+    :param progress: optional sadisplay.progress.Progress, levels are
+                     reported as they are reached and the crawl stops
+                     when its time budget is spent
+
+    Return set of reached (schema, table name), missing seeds are
+    skipped
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError('Unknown direction: %s' % direction)
+
+    kwargs = {}
+    if SQLALCHEMY_VERSION >= (1, 3):
+        # referred tables are reflected by the crawl itself, depth
+        # permitting
+        kwargs['resolve_fks'] = False
+
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+
+        existing = {}
+
+        def _exists(schema, name):
+            if schema not in existing:
+                existing[schema] = set(inspector.get_table_names(
+                    schema=schema))
+            return name in existing[schema]
+
+        frontier = set()
+        for seed in seeds:
+            schema, _, name = seed.rpartition('.')
+            for schema in [schema] if schema else schemas:
+                if _exists(schema, name):
+                    frontier.add((schema, name))
+
+        reached = set()
+        level = 0
+        while frontier:
+            if progress is not None:
+                if progress.expired():
+                    progress.skip('reflect', sorted(
+                        _table_key(*key) for key in frontier))
+                    break
+                progress.start('reflect', len(frontier))
+
+            by_schema = defaultdict(list)
+            for schema, name in frontier:
+                by_schema[schema].append(name)
+            for schema, names in sorted(by_schema.items(),
+                                        key=lambda item: item[0] or ''):
+                meta.reflect(
+                    bind=conn, schema=schema, only=sorted(names), **kwargs)
+
+            reached |= frontier
+            if progress is not None:
+                progress.advance(len(frontier))
+            if level == depth:
+                break
+
+            found = set()
+            if direction in ('out', 'both'):
+                for schema, name in frontier:
+                    found |= referenced_tables(
+                        meta.tables[_table_key(schema, name)])
+            if direction in ('in', 'both'):
+                found |= referencing_tables(conn, frontier)
+
+            frontier = set(key for key in found - reached
+                           if _exists(*key))
+            level += 1
+
+    return reached
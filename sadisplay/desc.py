@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+Operations on ``describe()`` results and their serialized form
+
+Nothing here imports SQLAlchemy, so descriptions can be saved once and
+rendered many times by processes that never load models or reflect.
+"""
+import io
+import json
+from collections import defaultdict, OrderedDict
+
+DEFAULT_SCHEMA = 'default'
+
+
+def schema_name(cls):
+    """Name of the schema of a ``describe()`` record
+
+    ``default`` for records without schema, prefixed by the database of
+    merged descriptions (see :func:`merge`)
+    """
+    schema = cls.get('schema') or DEFAULT_SCHEMA
+    if cls.get('database'):
+        return '%s.%s' % (cls['database'], schema)
+    return schema
+
+
+def _key(record, side=None):
+    """Key of object record, or of the object on side of a relation"""
+    if side is None:
+        return record.get('schema'), record['name']
+    return record.get('%s_schema' % side), record[side]
+
+
+def split_schemas(desc):
+    """Split ``describe()`` result into one description per schema
+
+    Relations and inherits crossing schemas are dropped, as only one
+    side of them is part of each diagram. Objects of relations are found
+    by schema and name, so tables of the same name in several schemas
+    are told apart.
+
+    :param desc: result of describe function
+
+    Return list of (schema name, (objects, relations, inherits)) ordered
+    by first appearance of the schema, see :func:`schema_name`
+    """
+    objects, relations, inherits = desc
+
+    order = []
+    parts = {}
+    schemas = {}
+    for obj in objects:
+        schema = schema_name(obj)
+        if schema not in parts:
+            order.append(schema)
+            parts[schema] = ([], [], [])
+        parts[schema][0].append(obj)
+        schemas[_key(obj)] = schema
+        # inherits are between classes, their names are unique
+        schemas.setdefault(obj['name'], schema)
+
+    for rel in relations:
+        schema = schemas.get(_key(rel, 'from'))
+        if schema == schemas.get(_key(rel, 'to'), object()):
+            parts[schema][1].append(rel)
+
+    for inh in inherits:
+        schema = schemas.get(inh['child'])
+        if schema == schemas.get(inh['parent'], object()):
+            parts[schema][2].append(inh)
+
+    return [(schema, parts[schema]) for schema in order]
+
+
+def overview(desc):
+    """Aggregate ``describe()`` result into one node per schema
+
+    :param desc: result of describe function
+
+    Return dict::
+
+        {
+            'schemas': [{
+                'name': '<schema name, see schema_name>',
+                'tables': <number of classes>,
+                'columns': <number of columns>,
+                'indexes': <number of indexes>,
+                'relations': <number of relations inside the schema>,
+            }, ...],
+            'relations': [{
+                'from': '<schema name>',
+                'to': '<schema name>',
+                'count': <number of relations between classes>,
+            }, ...],
+        }
+    """
+    objects, relations, inherits = desc
+
+    schemas = OrderedDict()
+    names = {}
+    for obj in objects:
+        name = names[_key(obj)] = schema_name(obj)
+        if name not in schemas:
+            schemas[name] = {
+                'name': name,
+                'tables': 0,
+                'columns': 0,
+                'indexes': 0,
+                'relations': 0,
+            }
+        schemas[name]['tables'] += 1
+        schemas[name]['columns'] += len(obj['cols'])
+        schemas[name]['indexes'] += len(obj['indexes'])
+
+    edges = OrderedDict()
+    for rel in relations:
+        from_, to = names.get(_key(rel, 'from')), names.get(_key(rel, 'to'))
+        if from_ is None or to is None:
+            continue
+        if from_ == to:
+            schemas[from_]['relations'] += 1
+        else:
+            edges[from_, to] = edges.get((from_, to), 0) + 1
+
+    return {
+        'schemas': list(schemas.values()),
+        'relations': [{
+            'from': from_,
+            'to': to,
+            'count': count,
+        } for (from_, to), count in edges.items()],
+    }
+
+
+def focus(desc, names, depth=1):
+    """Subset of ``describe()`` result around some classes
+
+    :param desc: result of describe function
+    :param names: names of classes (or tables) to focus on
+    :param depth: include classes up to this many relations or inherits
+                  away from the focused ones
+
+    Return tuple (objects, relations, inherits)
+    """
+    objects, relations, inherits = desc
+
+    neighbours = defaultdict(set)
+    for rel in relations:
+        neighbours[rel['from']].add(rel['to'])
+        neighbours[rel['to']].add(rel['from'])
+    for inh in inherits:
+        neighbours[inh['child']].add(inh['parent'])
+        neighbours[inh['parent']].add(inh['child'])
+
+    selected = set(names)
+    frontier = set(names)
+    for _ in range(depth):
+        frontier = set(n for name in frontier
+                       for n in neighbours[name]) - selected
+        if not frontier:
+            break
+        selected |= frontier
+
+    return (
+        [obj for obj in objects if obj['name'] in selected],
+        [rel for rel in relations
+         if rel['from'] in selected and rel['to'] in selected],
+        [inh for inh in inherits
+         if inh['child'] in selected and inh['parent'] in selected],
+    )
+
+
+def merge(descs):
+    """Merge ``describe()`` results of several databases into one
+
+    Records get a ``database`` key and names occurring in more than one
+    database are namespaced as ``<database>.<name>``.
+
+    :param descs: list of (database name, describe result)
+
+    Return tuple (objects, relations, inherits)
+    """
+    counts = defaultdict(int)
+    for database, (objects, relations, inherits) in descs:
+        for name in set(obj['name'] for obj in objects):
+            counts[name] += 1
+
+    result = ([], [], [])
+    for database, (objects, relations, inherits) in descs:
+
+        def _name(name):
+            if counts[name] > 1:
+                return '%s.%s' % (database, name)
+            return name
+
+        for obj in objects:
+            result[0].append(
+                dict(obj, name=_name(obj['name']), database=database))
+
+        for rel in relations:
+            rel = dict(rel)
+            rel['from'], rel['to'] = _name(rel['from']), _name(rel['to'])
+            result[1].append(rel)
+
+        for inh in inherits:
+            result[2].append(
+                dict(inh,
+                     child=_name(inh['child']),
+                     parent=_name(inh['parent'])))
+
+    return result
+
+
+FORMAT = 'sadisplay'
+FORMAT_VERSION = 1
+
+
+class _Strings(object):
+    """Table of interned strings, None is kept as is"""
+
+    def __init__(self, strings=None):
+        self.strings = strings if strings is not None else []
+        self._index = {}
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        try:
+            return self._index[value]
+        except KeyError:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+            return index
+
+    def many(self, values):
+        return [self(value) for value in values]
+
+
+def _extra(record, known):
+    """Keys of record other than known, e.g. added by sadisplay.stats"""
+    return dict((k, v) for k, v in record.items() if k not in known)
+
+
+def _constraints(obj, s):
+    """Constraints of object as lists of strings interned by s or None"""
+    constraints = obj.get('constraints')
+    if constraints is None:
+        return None
+    return [
+        s.many(constraints['pk']),
+        [s.many(cols) for cols in constraints['unique']],
+        [s.many(cols) for cols in constraints['fks']],
+    ]
+
+
+def _row(values, extra):
+    return values + [extra] if extra else values
+
+
+def dumps(desc):
+    """Serialize ``describe()`` result into a compact JSON document
+
+    Records are stored as positional lists and every name, type and
+    role (also those of constraints) is stored once in a table of
+    strings, so big descriptions are small and parsed by the C JSON
+    decoder alone. Keys other than those of ``describe()`` (e.g.
+    ``rows``, ``color`` or ``unindexed``) are kept as a trailing dict.
+
+    :param desc: result of sadisplay.describe function
+
+    Return string
+    """
+    objects, relations, inherits = desc
+    s = _Strings()
+
+    result = {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'objects': [
+            _row([
+                s(obj['name']),
+                s(obj.get('schema')),
+                [s(value) for col in obj['cols'] for value in col],
+                [_row([s(index['name']), s.many(index['cols'])],
+                      _extra(index, ('name', 'cols')))
+                 for index in obj['indexes']],
+                s.many(obj['props']),
+                s.many(obj['methods']),
+                _constraints(obj, s),
+            ], _extra(obj, ('name', 'schema', 'cols', 'indexes', 'props',
+                            'methods', 'constraints')))
+            for obj in objects
+        ],
+        'relations': [
+            _row([s(rel['from']), s(rel['by']), s(rel['to']),
+                  s(rel.get('to_col')), s(rel.get('from_schema')),
+                  s(rel.get('to_schema'))],
+                 _extra(rel, ('from', 'by', 'to', 'to_col', 'from_schema',
+                              'to_schema')))
+            for rel in relations
+        ],
+        'inherits': [
+            _row([s(inh['child']), s(inh['parent'])],
+                 _extra(inh, ('child', 'parent'))) for inh in inherits
+        ],
+    }
+    result['strings'] = s.strings
+
+    return json.dumps(result, separators=(',', ':'))
+
+
+def loads(data):
+    """Load ``describe()`` result serialized by :func:`dumps`
+
+    Raise ValueError for documents of other formats or versions
+    """
+    doc = json.loads(data)
+    if not isinstance(doc, dict) or doc.get('format') != FORMAT:
+        raise ValueError('Not a sadisplay description')
+    if doc.get('version') != FORMAT_VERSION:
+        raise ValueError('Unsupported description version: %s' %
+                         doc.get('version'))
+
+    strings = doc['strings']
+
+    def s(index):
+        return None if index is None else strings[index]
+
+    objects = []
+    for row in doc['objects']:
+        name, schema, cols, indexes, props, methods, constraints = row[:7]
+        obj = {
+            'name': s(name),
+            'schema': s(schema),
+            'cols': [(s(cols[i]), s(cols[i + 1]), s(cols[i + 2]))
+                     for i in range(0, len(cols), 3)],
+            'indexes': [],
+            'props': [s(i) for i in props],
+            'methods': [s(i) for i in methods],
+        }
+        for index in indexes:
+            item = {'name': s(index[0]), 'cols': [s(i) for i in index[1]]}
+            if len(index) > 2:
+                item.update(index[2])
+            obj['indexes'].append(item)
+        if constraints is not None:
+            pk, unique, fks = constraints
+            obj['constraints'] = {
+                'pk': [s(i) for i in pk],
+                'unique': [[s(i) for i in cols] for cols in unique],
+                'fks': [[s(i) for i in cols] for cols in fks],
+            }
+        if len(row) > 7:
+            obj.update(row[7])
+        objects.append(obj)
+
+    relations = []
+    for row in doc['relations']:
+        rel = {
+            'from': s(row[0]),
+            'by': s(row[1]),
+            'to': s(row[2]),
+            'to_col': s(row[3]),
+            'from_schema': s(row[4]),
+            'to_schema': s(row[5]),
+        }
+        if len(row) > 6:
+            rel.update(row[6])
+        relations.append(rel)
+
+    inherits = []
+    for row in doc['inherits']:
+        inh = {'child': s(row[0]), 'parent': s(row[1])}
+        if len(row) > 2:
+            inh.update(row[2])
+        inherits.append(inh)
+
+    return objects, relations, inherits
+
+
+def save(desc, path):
+    """Write ``describe()`` result to file, see :func:`dumps`"""
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(u'%s' % dumps(desc))
+
+
+def load(path):
+    """Read ``describe()`` result from file written by :func:`save`"""
+    with io.open(path, 'r', encoding='utf-8') as f:
+        return loads(f.read())
@@ -0,0 +1,657 @@
+# -*- coding: utf-8 -*-
+"""
+Describing mapped classes and tables, needs SQLAlchemy
+
+The package level ``sadisplay.describe`` and friends import this module
+on first call, see ``sadisplay/__init__.py``.
+"""
+import sys
+import types
+import locale
+import operator
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import defaultdict
+from functools import cmp_to_key
+
+import sqlalchemy
+from sqlalchemy import exc, orm
+from sqlalchemy.orm import class_mapper, Mapper
+from sqlalchemy import Column, Table, Index, UniqueConstraint, \
+    ForeignKeyConstraint
+from sqlalchemy.orm.properties import ColumnProperty
+
+try:
+    # sa >= 0.9
+    from sqlalchemy.sql.elements import Label
+except ImportError:
+    from sqlalchemy.sql.expression import Label
+
+SQLALCHEMY_VERSION = tuple(map(int, sqlalchemy.__version__.split('.')))
+
+
+class TypeStringCache(object):
+    """Memoized column type strings
+
+    Compiling a type through a dialect is the costly part of
+    ``describe()`` on big schemas, while most columns share a handful of
+    types like ``INTEGER`` or ``VARCHAR(n)``. Strings are cached by type
+    class and its parameters, so each distinct type is compiled once.
+
+    :param dialect: dialect to compile types with, by default each type
+                    uses its own default dialect like ``str(type)`` does
+    """
+
+    def __init__(self, dialect=None):
+        self.dialect = dialect
+        self._strings = {}
+
+    def __call__(self, type_):
+        key = self.key(type_)
+        if key is None:
+            return self.compile(type_)
+
+        try:
+            return self._strings[key]
+        except KeyError:
+            value = self._strings[key] = self.compile(type_)
+            return value
+
+    @staticmethod
+    def key(type_):
+        """Hashable key of type class and parameters or None"""
+        params = []
+        for name, value in sorted(vars(type_).items()):
+            if isinstance(value, list):
+                value = tuple(value)
+            try:
+                hash(value)
+            except TypeError:
+                # e.g. variant mappings, not worth caching
+                return None
+            params.append((name, value))
+        return type(type_), tuple(params)
+
+    def compile(self, type_):
+        try:
+            if self.dialect is None:
+                return str(type_)
+            return type_.compile(dialect=self.dialect)
+        except Exception:
+            # https://bitbucket.org/estin/sadisplay/issues/17/cannot-render-json-column-type
+            return type(type_).__name__.upper()
+
+
+def column_role(column):
+    if column.primary_key:
+        return 'pk'
+    elif column.foreign_keys:
+        return 'fk'
+
+
+def column_compare(a, b):
+    prefix = {
+        'pk': '0',
+        'fk': '1',
+    }
+    return locale.strcoll(
+        prefix.get(a[2], '2') + a[1],
+        prefix.get(b[2], '2') + b[1], )
+
+
+def get_columns_of_index(index):
+    return [c.name for c in index.columns if isinstance(c, Column)]
+
+
+def get_constraints(table):
+    """Primary key, unique and foreign key columns of table
+
+    Return dict::
+
+        {
+            'pk': ['<col name in key order>', ...],
+            'unique': [['<col name>', ...], ...],
+            'fks': [['<col name>', ...], ...],
+        }
+    """
+
+    def _names(cols):
+        # columns of constraints are names before sa 0.9
+        return [getattr(c, 'name', c) for c in cols]
+
+    return {
+        'pk': _names(table.primary_key.columns),
+        'unique': sorted(
+            _names(c.columns) for c in table.constraints
+            if isinstance(c, UniqueConstraint)),
+        'fks': sorted(
+            _names(c.columns) for c in table.constraints
+            if isinstance(c, ForeignKeyConstraint)),
+    }
+
+
+class EntryItem(object):
+    """Class adaptor for mapped classes and tables"""
+    name = None
+    methods = []
+    columns = []
+    indexes = []
+    table = None
+    inherits = None
+    properties = []
+    bases = tuple()
+    schema = None
+
+    def __init__(self, mapper=None, table=None):
+
+        if mapper is not None:
+            self.name = mapper.class_.__name__
+            self.columns = mapper.columns
+            if isinstance(mapper.mapped_table, Table):
+                self.table = mapper.mapped_table
+                self.indexes = mapper.mapped_table.indexes
+            self.methods = mapper.class_.__dict__.items()
+            self.inherits = mapper.inherits
+            self.properties = mapper.iterate_properties
+            self.bases = mapper.class_.__bases__
+            self.class_ = mapper.class_
+            self.table_name = str(mapper.mapped_table)
+
+        elif table is not None:
+            self.name = table.name
+            self.table_name = table.name
+            # prepend schema if exists for foreign key matching
+            if hasattr(table, "schema") and table.schema:
+                self.schema = table.schema
+                self.table_name = table.schema + "." + self.table_name
+            self.table = table
+            self.columns = table.columns
+            self.indexes = table.indexes
+        else:
+            pass
+
+    def __repr__(self):
+        return '<{s.__class__.__name__} {s.name}>'.format(s=self)
+
+    def __eq__(self, other):
+        if other.inherits or self.inherits:
+            return self.name == other.name
+        return self.table_name == other.table_name
+
+
+# state of process pool workers, inherited by fork
+_process_state = None
+_process_lock = threading.Lock()
+
+
+def _fork_context():
+    """``fork`` context for process pools, None where not available
+
+    ProcessPoolExecutor takes a context since python 3.7.
+    """
+    if sys.version_info < (3, 7):
+        return None
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+
+
+def _describe_partition_process(bounds):
+    describer, entries = _process_state
+    start, stop = bounds
+    return describer.describe_entries(entries[start:stop])
+
+
+class Describer(object):
+    """Reusable describe engine
+
+    Describing runs in two phases. The first one describes columns,
+    methods, indexes and properties of each entity on its own, so it can
+    run over partitions of the entities in a thread or process pool. The
+    short second phase resolves relations and inherits across all
+    entities in input order, so results are identical to the serial run.
+
+    Instances hold only options and may be shared by threads. Options
+    are those of :func:`describe`, plus:
+
+    :param workers: number of threads or processes for the first phase,
+                    None or 1 describes serially
+    :param executor: ``thread`` or ``process``, the latter needs the
+                     ``fork`` start method and python 3.7, it falls back
+                     to threads without them
+    :param partition_size: number of entities per task
+    """
+
+    def __init__(self,
+                 show_methods=True,
+                 show_properties=True,
+                 show_indexes=True,
+                 show_simple_indexes=True,
+                 show_columns_of_indexes=True,
+                 dialect=None,
+                 workers=None,
+                 executor='thread',
+                 partition_size=256):
+        if executor not in ('thread', 'process'):
+            raise ValueError('Unknown executor: %s' % executor)
+
+        self.show_methods = show_methods
+        self.show_properties = show_properties
+        self.show_indexes = show_indexes
+        self.show_simple_indexes = show_simple_indexes
+        self.show_columns_of_indexes = show_columns_of_indexes
+        self.dialect = dialect
+        self.workers = workers
+        self.executor = executor
+        self.partition_size = partition_size
+
+    def __call__(self, items, progress=None):
+        """Describe items, see :func:`describe`
+
+        :param progress: optional sadisplay.progress.Progress, entities
+                         left when its time budget is spent are skipped
+        """
+        entries = self.entries(items)
+        objects = self.describe_all(entries, progress)
+
+        partial = any(obj is None for obj in objects)
+        if partial:
+            progress.skip('describe', [
+                entry.name for entry, obj in zip(entries, objects)
+                if obj is None
+            ])
+            entries = [entry for entry, obj in zip(entries, objects)
+                       if obj is not None]
+            objects = [obj for obj in objects if obj is not None]
+
+        relations, inherits = self.resolve(entries)
+
+        if partial:
+            # parents may be skipped
+            names = set(entry.name for entry in entries)
+            inherits = [inh for inh in inherits if inh['parent'] in names]
+
+        return objects, relations, inherits
+
+    def entries(self, items):
+        """Adapt items to unique EntryItem list in input order"""
+        entries = []
+
+        # lookups equal to EntryItem.__eq__, instead of a linear scan
+        names = set()
+        inherit_names = set()
+        table_names = set()
+
+        for item in items:
+            if isinstance(item, Mapper):
+                entity = EntryItem(mapper=item)
+            elif isinstance(item, Table):
+                entity = EntryItem(table=item)
+            elif not isinstance(item, type):
+                # modules, functions, instances, etc. are never mapped
+                continue
+            else:
+                try:
+                    mapper = class_mapper(item)
+                except (exc.ArgumentError, orm.exc.UnmappedClassError):
+                    continue
+                entity = EntryItem(mapper=mapper)
+
+            if entity.inherits:
+                if entity.name in names:
+                    continue
+                inherit_names.add(entity.name)
+            else:
+                if entity.name in inherit_names or \
+                        entity.table_name in table_names:
+                    continue
+                table_names.add(entity.table_name)
+
+            names.add(entity.name)
+            entries.append(entity)
+
+        return entries
+
+    def describe_all(self, entries, progress=None):
+        """First phase over all entries, serially or in a pool
+
+        Return list of records in order of entries, None for entries
+        skipped because of the time budget of progress
+        """
+        if progress is not None:
+            progress.start('describe', len(entries))
+
+        workers = self.workers or 1
+        size = self.partition_size
+        if workers <= 1 or len(entries) <= size:
+            return self.describe_entries(entries, progress=progress)
+
+        bounds = [(i, i + size) for i in range(0, len(entries), size)]
+
+        if any(entry.inherits is not None or hasattr(entry, 'class_')
+               for entry in entries):
+            # configure mappers once, not concurrently from workers
+            orm.configure_mappers()
+
+        if self.executor == 'process':
+            context = _fork_context()
+            if context is not None:
+                global _process_state
+                with _process_lock:
+                    _process_state = (self, entries)
+                    try:
+                        with ProcessPoolExecutor(
+                                max_workers=workers,
+                                mp_context=context) as executor:
+                            futures = [
+                                executor.submit(
+                                    _describe_partition_process, b)
+                                for b in bounds
+                            ]
+                            parts = []
+                            for (start, stop), future in zip(bounds,
+                                                             futures):
+                                # workers can not report, so progress
+                                # is counted by partitions
+                                if progress is not None and \
+                                        progress.expired() and \
+                                        future.cancel():
+                                    parts.append(
+                                        [None] * len(entries[start:stop]))
+                                    continue
+                                parts.append(future.result())
+                                if progress is not None:
+                                    progress.advance(len(parts[-1]))
+                    finally:
+                        _process_state = None
+                return [obj for part in parts for obj in part]
+
+        type_strings = TypeStringCache(dialect=self.dialect)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(
+                lambda b: self.describe_entries(entries[b[0]:b[1]],
+                                                type_strings, progress),
+                bounds))
+        return [obj for part in parts for obj in part]
+
+    def describe_entries(self, entries, type_strings=None, progress=None):
+        if type_strings is None:
+            type_strings = TypeStringCache(dialect=self.dialect)
+
+        result = []
+        for entry in entries:
+            if progress is not None and progress.expired():
+                result.append(None)
+                continue
+            result.append(self.describe_entry(entry, type_strings))
+            if progress is not None:
+                progress.advance()
+        return result
+
+    def get_indexes(self, entity):
+        indexes = []
+
+        for index in entity.indexes:
+            if not isinstance(index, Index):
+                continue
+
+            if not self.show_simple_indexes and len(index.columns) <= 1:
+                continue
+
+            item = {
+                'name':
+                index.name,
+                'cols':
+                get_columns_of_index(index)
+                if self.show_columns_of_indexes else [],
+            }
+            if index.unique:
+                item['unique'] = True
+            indexes.append(item)
+
+        return indexes
+
+    def describe_entry(self, entry, type_strings):
+        """Describe one entry without looking at others"""
+
+        result_item = {
+            'name': entry.name,
+            'schema': entry.schema,
+            'cols': [(type_strings(col.type), name, column_role(col), )
+                     for name, col in entry.columns.items()
+                     if not isinstance(col, Label)],
+            'indexes': [],
+            'props': [],
+            'methods': [],
+        }
+
+        # sort columns by role and name
+        result_item['cols'].sort(
+            key=cmp_to_key(column_compare), )
+
+        if self.show_methods and entry.methods:
+
+            if entry.inherits:
+                base_methods = entry.inherits.class_.__dict__.keys()
+            else:
+                # Declarative only adds private attributes (``__table__``,
+                # ``__mapper__``, ...) to the class itself and these are
+                # skipped by name below. Mapping a throwaway subclass of
+                # the bases to find them would leak it into the registry
+                # and metadata of the described models.
+                base_methods = ()
+
+            # Filter mapper methods
+            for name, func in entry.methods:
+                if name[0] != '_' and name not in base_methods:
+                    if isinstance(func, types.FunctionType):
+                        result_item['methods'].append(name)
+
+        if self.show_indexes:
+            result_item['indexes'] = self.get_indexes(entry)
+            if entry.table is not None:
+                result_item['constraints'] = get_constraints(entry.table)
+
+        if self.show_properties:
+
+            # find relationship properties
+            for item in entry.properties:
+                if not isinstance(item, ColumnProperty):
+                    result_item['props'].append(item.key)
+
+            # find column_property() as sql expressions
+            for name, item in entry.columns.items():
+                if isinstance(item, Label):
+                    result_item['props'].append(name)
+
+        # ordering
+        for key in ('methods', 'props', ):
+            result_item[key].sort()
+
+        for key in ('indexes', ):
+            result_item[key].sort(key=operator.itemgetter('name'))
+
+        return result_item
+
+    def resolve(self, entries):
+        """Second phase - relations and inherits across entries"""
+        relations = []
+        inherits = []
+
+        by_table = defaultdict(list)
+        for m in entries:
+            by_table[str(m.table_name)].append(m)
+
+        for entry in entries:
+            start = len(relations)
+
+            # Detect relations by ForeignKey
+            for col in entry.columns:
+                for fk in col.foreign_keys:
+                    try:
+                        target = fk.column
+                    except exc.NoReferencedTableError:
+                        # referenced table was not reflected
+                        continue
+                    for m in by_table.get(str(target.table), ()):
+                        relations.append({
+                            'from': entry.name,
+                            'from_schema': entry.schema,
+                            'by': col.name,
+                            'to': m.name,
+                            'to_schema': m.schema,
+                            'to_col': target.name
+                        })
+
+            if entry.inherits:
+
+                inh = {
+                    'child': entry.name,
+                    'parent': entry.inherits.class_.__name__,
+                }
+
+                inherits.append(inh)
+
+                # Delete relation by inherits
+                own = relations[start:]
+                for i, rel in enumerate(own):
+                    if inh['child'] == rel['from'] and \
+                            inh['parent'] == rel['to']:
+                        own.pop(i)
+                relations[start:] = own
+
+        return relations, inherits
+
+
+def describe(items,
+             show_methods=True,
+             show_properties=True,
+             show_indexes=True,
+             show_simple_indexes=True,
+             show_columns_of_indexes=True,
+             dialect=None,
+             workers=None,
+             executor='thread',
+             progress=None):
+    """Detecting attributes, inherits and relations
+
+    :param items: list of objects to describe (mapped classes,
+                  mappers or tables)
+    :param show_methods: do detection of methods
+    :param show_properties: do detection of properties
+    :param show_indexes: do detection of indexes
+    :param show_simple_indexes: show indexes what contains only one column
+    :param show_columns_of_indexes: show columns of detected indexes
+    :param dialect: compile column types with this dialect (e.g. the
+                    ``engine.dialect`` of reflected tables)
+    :param workers: describe classes in this many threads or processes,
+                    see :class:`Describer`
+    :param executor: ``thread`` or ``process`` pool for workers
+    :param progress: sadisplay.progress.Progress to report to, classes
+                     left when its time budget is spent are skipped
+
+    Return tuple (objects, relations, inherits)
+
+
+    Where objects is list::
+
+        [{
+            'name': '<Mapper class name or table name>',
+            'cols': [
+                (
+                    '<Column type class name>',
+                    '<Column name>',
+                    '<pk|fk>',),
+                ...
+            ],
+            'props': ['<Property name>'],
+            'methods': ['<Method name>', ...],
+            'indexes': [{
+                'name': '<index name>',
+                'cols': ['<col name 1>', ...],
+                # only of unique indexes
+                'unique': True,
+            }, ...],
+            # with show_indexes, of classes mapped to a table
+            'constraints': see get_constraints,
+        }, ...]
+
+
+    Relations is::
+
+        [{
+            'from': '<From mapper class name>',
+            'from_schema': '<schema of from object or None>',
+            'by': '<By mapper foreign key column name>',
+            'to': '<To mapper class name>',
+            'to_schema': '<schema of to object or None>',
+            'to_col': '<referenced column name>',
+        }, ...]
+
+
+    Example usage::
+
+        import sadisplay
+        from app import models
+
+        desc = sadisplay.describe([
+            getattr(model, attr) for attr in dir(model)
+        ])
+
+        desc = sadisplay.describe([models.User, models.Group])
+    """
+
+    return Describer(
+        show_methods=show_methods,
+        show_properties=show_properties,
+        show_indexes=show_indexes,
+        show_simple_indexes=show_simple_indexes,
+        show_columns_of_indexes=show_columns_of_indexes,
+        dialect=dialect,
+        workers=workers,
+        executor=executor, )(items, progress=progress)
+
+
+def describe_registry(base, **kwargs):
+    """Describe all classes mapped by a declarative base or registry
+
+    Mappers are taken straight from the registry, so there is no
+    per-attribute ``class_mapper`` probing. Classes are ordered by name,
+    like ``dir(module)`` does for the usual ``describe()`` call.
+
+    :param base: declarative base class or ``sqlalchemy.orm.registry``
+    :param kwargs: options passed to :func:`describe`
+
+    Return tuple (objects, relations, inherits)
+    """
+    registry = getattr(base, 'registry', base)
+
+    if hasattr(registry, 'mappers'):
+        # sa >= 1.4
+        mappers = list(registry.mappers)
+    else:
+        mappers = []
+        classes = [base]
+        while classes:
+            cls = classes.pop()
+            classes.extend(cls.__subclasses__())
+            mapper = cls.__dict__.get('__mapper__')
+            if mapper is not None:
+                mappers.append(mapper)
+
+    mappers.sort(key=lambda m: m.class_.__name__)
+
+    return describe(mappers, **kwargs)
+
+
+def describe_metadata(metadata, **kwargs):
+    """Describe all tables of a ``MetaData`` in dependency order
+
+    :param metadata: ``sqlalchemy.MetaData`` instance
+    :param kwargs: options passed to :func:`describe`
+
+    Return tuple (objects, relations, inherits)
+    """
+    return describe(metadata.sorted_tables, **kwargs)
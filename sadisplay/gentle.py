@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Low impact reflection of busy production databases
+
+In gentle mode an engine has a small bounded pool, every new connection
+is made read only with statement and lock timeouts by session settings
+of its dialect, catalog queries may be rate limited, and reflection
+which failed on a lock timeout is retried with exponential backoff. So
+a nightly diagram job holds few connections, never waits long behind
+DDL locks and gives up after a bounded time.
+"""
+import math
+import time
+import threading
+
+from sqlalchemy import create_engine as _create_engine, event, exc
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+DEFAULTS = {
+    'pool_size': 1,
+    'statement_timeout': 30.0,
+    'lock_timeout': 2.0,
+    'rate': None,
+    'retries': 3,
+    'backoff': 1.0,
+}
+
+
+def _postgresql(dialect, settings):
+    return [
+        'SET statement_timeout = %d' %
+        (settings['statement_timeout'] * 1000),
+        'SET lock_timeout = %d' % (settings['lock_timeout'] * 1000),
+        'SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY',
+    ]
+
+
+def _mysql(dialect, settings):
+    # lock wait timeouts are whole seconds
+    lock_timeout = max(1, int(math.ceil(settings['lock_timeout'])))
+    if getattr(dialect, '_is_mariadb', False):
+        statement = 'SET SESSION max_statement_time = %s' % \
+            settings['statement_timeout']
+    else:
+        statement = 'SET SESSION max_execution_time = %d' % \
+            (settings['statement_timeout'] * 1000)
+    return [
+        statement,
+        'SET SESSION lock_wait_timeout = %d' % lock_timeout,
+        'SET SESSION innodb_lock_wait_timeout = %d' % lock_timeout,
+        'SET SESSION TRANSACTION READ ONLY',
+    ]
+
+
+def _sqlite(dialect, settings):
+    # sqlite has no statement timeout
+    return [
+        'PRAGMA busy_timeout = %d' % (settings['lock_timeout'] * 1000),
+        'PRAGMA query_only = 1',
+    ]
+
+
+SESSION_SETTINGS = {
+    'postgresql': _postgresql,
+    'mysql': _mysql,
+    'sqlite': _sqlite,
+}
+
+
+def settings(options):
+    """Gentle mode settings of command options, None if not enabled
+
+    Any of the timeout, rate or retry options enables gentle mode, the
+    others default to DEFAULTS.
+    """
+    result = dict(DEFAULTS)
+    enabled = getattr(options, 'gentle', False)
+    for key in DEFAULTS:
+        value = getattr(options, key, None)
+        if value is not None:
+            result[key] = value
+            enabled = True
+    return result if enabled else None
+
+
+def session_statements(dialect, settings):
+    """Statements making a connection of dialect gentle, empty list for
+    unsupported dialects
+    """
+    if dialect.name not in SESSION_SETTINGS:
+        return []
+    return SESSION_SETTINGS[dialect.name](dialect, settings)
+
+
+class RateLimit(object):
+    """Spaces calls at least ``1 / rate`` seconds apart
+
+    Methods may be called from several threads.
+
+    :param rate: maximum calls per second
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def create_engine(url, settings):
+    """Engine of url with a bounded pool and gentle connections
+
+    :param settings: dict like DEFAULTS
+    """
+    url = make_url(url)
+    kwargs = {}
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        kwargs = {
+            'pool_size': settings['pool_size'],
+            'max_overflow': 0,
+        }
+    engine = _create_engine(url, **kwargs)
+
+    statements = session_statements(engine.dialect, settings)
+
+    def _connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+        # settings are transactional on some databases, keep them when
+        # the pool rolls back
+        dbapi_connection.commit()
+
+    if statements:
+        event.listen(engine, 'connect', _connect)
+
+    if settings['rate']:
+        limit = RateLimit(settings['rate'])
+        event.listen(engine, 'before_cursor_execute',
+                     lambda *args: limit.wait())
+
+    return engine
+
+
+def is_lock_timeout(error):
+    """Whether sqlalchemy DBAPIError is a lock wait timeout"""
+    orig = getattr(error, 'orig', None)
+    if getattr(orig, 'pgcode', None) == '55P03':
+        # lock_not_available
+        return True
+    args = getattr(orig, 'args', ())
+    if args and args[0] == 1205:
+        # ER_LOCK_WAIT_TIMEOUT
+        return True
+    return 'database is locked' in str(orig)
+
+
+def retry(func, settings):
+    """Call func, again after lock timeouts with exponential backoff
+
+    Return result of func, the last error is raised when retries are
+    exhausted
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except exc.DBAPIError as e:
+            if attempt >= settings['retries'] or not is_lock_timeout(e):
+                raise
+            time.sleep(settings['backoff'] * 2**attempt)
+            attempt += 1
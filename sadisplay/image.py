@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from subprocess import TimeoutExpired
+except ImportError:
+    # python 2, communicate() has no timeout
+    TimeoutExpired = None
+
+IMAGE_TYPES = ('svg', 'png')
+
+
+class ImageError(Exception):
+    """Raised when graphviz or plantuml failed to render a diagram"""
+
+
+def command(render, image_type, plantuml_jar=None):
+    """Command line of the local renderer reading text from stdin
+
+    :param render: render format name - dot, dot-large or plantuml
+    :param image_type: svg or png
+    :param plantuml_jar: path to plantuml.jar, by default taken from
+                         ``PLANTUML_JAR`` environment variable
+    """
+    if image_type not in IMAGE_TYPES:
+        raise ValueError('Unknown image type: %s' % image_type)
+
+    if render in ('dot', 'dot-large'):
+        # dot-large sets layout=sfdp in the graph itself
+        return ['dot', '-T%s' % image_type]
+
+    if render == 'plantuml':
+        jar = plantuml_jar or os.environ.get('PLANTUML_JAR', 'plantuml.jar')
+        return [
+            'java', '-Djava.awt.headless=true', '-jar', jar,
+            '-t%s' % image_type, '-pipe'
+        ]
+
+    raise ValueError('Unknown render format: %s' % render)
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _communicate(process, data, timeout):
+    """process.communicate() killing the process after timeout seconds
+
+    Raise _Timeout if it was killed
+    """
+    if TimeoutExpired is not None:
+        try:
+            return process.communicate(data, timeout=timeout)
+        except TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise _Timeout()
+
+    if timeout is None:
+        return process.communicate(data)
+
+    killed = []
+
+    def _kill():
+        killed.append(True)
+        process.kill()
+
+    timer = threading.Timer(timeout, _kill)
+    timer.start()
+    try:
+        result = process.communicate(data)
+    finally:
+        timer.cancel()
+    if killed:
+        raise _Timeout()
+    return result
+
+
+def generate(text, render, image_type, timeout=None, plantuml_jar=None):
+    """Pipe rendered text into graphviz or plantuml process
+
+    :param text: result of sadisplay.dot or sadisplay.plantuml
+    :param render: render format name of text - dot or plantuml
+    :param image_type: svg or png
+    :param timeout: seconds to wait for the process
+    :param plantuml_jar: path to plantuml.jar
+
+    Return image bytes
+    """
+    args = command(render, image_type, plantuml_jar=plantuml_jar)
+
+    try:
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, )
+    except OSError as e:
+        raise ImageError('Cannot run %s: %s' % (args[0], e))
+
+    try:
+        out, err = _communicate(process, text.encode('utf-8'), timeout)
+    except _Timeout:
+        raise ImageError('%s timed out after %ss' % (args[0], timeout))
+
+    if process.returncode != 0:
+        raise ImageError('%s exited with %s: %s' % (
+            args[0], process.returncode, err.decode('utf-8', 'replace')))
+
+    return out
+
+
+def generate_many(jobs, image_type, workers=4, timeout=None,
+                  plantuml_jar=None, progress=None):
+    """Generate images of many diagrams concurrently
+
+    At most ``workers`` renderer processes run at the same time.
+
+    :param jobs: list of (name, render, text) tuples
+    :param image_type: svg or png
+    :param workers: maximum number of concurrent processes
+    :param timeout: seconds to wait for each process
+    :param plantuml_jar: path to plantuml.jar
+    :param progress: optional sadisplay.progress.Progress, jobs not
+                     started before its time budget is spent are
+                     skipped and running ones are limited to the rest
+                     of it
+
+    Return list of dicts in order of jobs::
+
+        [{
+            'name': '<job name>',
+            'render': '<dot|plantuml>',
+            'image': b'<image bytes or None on error>',
+            'error': '<error message or None>',
+            'seconds': <wall time of the process>,
+        }, ...]
+    """
+
+    def _run(job):
+        name, render, text = job
+        result = {
+            'name': name,
+            'render': render,
+            'image': None,
+            'error': None,
+        }
+        start = time.time()
+
+        limit = timeout
+        if progress is not None and progress.time_budget is not None:
+            if progress.expired():
+                progress.skip('images', [name])
+                result['error'] = 'skipped, time budget spent'
+                result['seconds'] = 0
+                return result
+            remaining = progress.remaining()
+            limit = remaining if timeout is None else min(timeout, remaining)
+
+        try:
+            result['image'] = generate(
+                text,
+                render,
+                image_type,
+                timeout=limit,
+                plantuml_jar=plantuml_jar, )
+        except (ImageError, ValueError) as e:
+            result['error'] = str(e)
+        result['seconds'] = time.time() - start
+
+        if progress is not None:
+            progress.advance()
+        return result
+
+    if progress is not None:
+        progress.start('images', len(jobs))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(_run, jobs))
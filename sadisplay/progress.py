@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Progress reporting and time budgets of long runs
+
+A :class:`Progress` is passed through reflection, ``describe()``,
+rendering and image generation. Each of them reports its stage with
+done/total counts, and between items checks whether the time budget is
+spent or the run was cancelled. Once it is, the remaining items are
+skipped and recorded, so the run ends in time with a partial but valid
+diagram.
+"""
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+# share of the time budget kept for later stages, e.g. reflection stops
+# with 30% of the budget left to describe and render what it got
+RESERVES = {
+    'reflect': 0.3,
+    'describe': 0.2,
+    'render': 0.1,
+}
+
+
+class Progress(object):
+    """Counts of the current stage, ETA and time budget of a run
+
+    Methods may be called from several threads.
+
+    :param callback: called as ``callback(stage, done, total, eta)`` on
+                     every change, eta is seconds left of the stage or
+                     None while unknown
+    :param time_budget: seconds for the whole run, None for no limit
+    """
+
+    def __init__(self, callback=None, time_budget=None):
+        self.callback = callback
+        self.time_budget = time_budget
+        self.started = time.time()
+        self.stage = None
+        self.done = 0
+        self.total = 0
+        self.skipped = OrderedDict()
+        self._stage_started = self.started
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def start(self, stage, total=0):
+        """Start stage, or add total to it if already started"""
+        with self._lock:
+            if stage != self.stage:
+                self.stage = stage
+                self.done = 0
+                self.total = 0
+                self._stage_started = time.time()
+            self.total += total
+            self._report()
+
+    def advance(self, count=1):
+        with self._lock:
+            self.done += count
+            self._report()
+
+    def skip(self, stage, names):
+        """Record items of stage skipped by the time budget or cancel"""
+        names = list(names)
+        if not names:
+            return
+        with self._lock:
+            self.skipped.setdefault(stage, []).extend(names)
+
+    def eta(self):
+        if not self.done or self.done >= self.total:
+            return None
+        elapsed = time.time() - self._stage_started
+        return elapsed / self.done * (self.total - self.done)
+
+    def remaining(self):
+        """Seconds left of the time budget or None without budget"""
+        if self.time_budget is None:
+            return None
+        return max(0.0, self.started + self.time_budget - time.time())
+
+    def cancel(self):
+        """Stop the run, e.g. from another thread
+
+        Stages skip their remaining items as if the time budget was spent.
+        """
+        self._cancelled.set()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def expired(self):
+        """Whether the time budget of the current stage is spent
+
+        Each stage is cut early by its share in RESERVES, so what it did
+        can still be processed by later stages in time. A cancelled run
+        is always expired.
+        """
+        if self._cancelled.is_set():
+            return True
+        if self.time_budget is None:
+            return False
+        reserve = RESERVES.get(self.stage, 0) * self.time_budget
+        return self.remaining() <= reserve
+
+    def summary(self):
+        """Lines describing what was skipped, empty if nothing"""
+        return [
+            '{0}: skipped {1} ({2}{3})'.format(
+                stage, len(names), ', '.join(names[:10]),
+                ', ...' if len(names) > 10 else '')
+            for stage, names in self.skipped.items()
+        ]
+
+    def _report(self):
+        if self.callback is not None:
+            self.callback(self.stage, self.done, self.total, self.eta())
+
+
+class StderrDisplay(object):
+    """Progress callback drawing one updating line per stage
+
+    :param stream: file to write to, sys.stderr by default
+    :param interval: minimal seconds between redraws of a stage
+    """
+
+    def __init__(self, stream=None, interval=0.2):
+        self.stream = stream
+        self.interval = interval
+        self._stage = None
+        self._drawn = 0
+        self._width = 0
+
+    def __call__(self, stage, done, total, eta):
+        now = time.time()
+
+        if stage != self._stage:
+            self.finish()
+            self._stage = stage
+        elif done < total and now - self._drawn < self.interval:
+            return
+
+        self._drawn = now
+        line = '{0}: {1}/{2}{3}'.format(
+            stage, done, total,
+            ' ETA {0:.0f}s'.format(eta) if eta is not None else '')
+        self._write('\r' + line.ljust(self._width))
+        self._width = len(line)
+
+    def finish(self):
+        """End the line of the current stage"""
+        if self._stage is not None:
+            self._write('\n')
+            self._stage = None
+            self._width = 0
+
+    def _write(self, text):
+        stream = self.stream or sys.stderr
+        stream.write(text)
+        stream.flush()
@@ -5,76 +5,404 @@ of a database tables by connection string
 
 \n\nDatabase connection string - http://goo.gl/3GpnE
 """
+import os
+import sys
 import operator
 from optparse import OptionParser
-from sqlalchemy import create_engine, MetaData
-from sadisplay import describe, render, __version__
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, inspect, MetaData
+from sqlalchemy.engine.url import make_url
+from sadisplay import describe, command, stats, crawl, catalog, gentle, \
+    __version__
+from sadisplay.desc import merge, save
 
+# tables per MetaData.reflect call when reporting progress
+REFLECT_BATCH = 50
 
-def run():
-    """Command for reflection database objects"""
-    parser = OptionParser(
-        version=__version__,
-        description=__doc__, )
+
+def _database_option(option, opt_str, value, parser):
+    """Callback of -u/-s/-i/-e/--seed options
+
+    Each -u starts a new database, -s/-i/-e/--seed after it apply to that
+    database only, given before any -u they apply to all of them.
+    """
+    databases = parser.values.databases
+    if option.dest == 'url':
+        name, sep, url = value.partition('=')
+        if not sep or '://' in name:
+            name, url = None, value
+        databases.append({
+            'name': name,
+            'url': url,
+            'schema': None,
+            'include': None,
+            'exclude': None,
+            'seed': None,
+        })
+        if parser.values.url is None:
+            parser.values.url = url
+    elif databases:
+        databases[-1][option.dest] = value
+    else:
+        setattr(parser.values, option.dest, value)
+
+
+def add_database_options(parser):
+    """Add options selecting databases and tables to reflect"""
+
+    parser.set_defaults(databases=[])
 
     parser.add_option(
         '-u',
         '--url',
         dest='url',
-        help='Database URL (connection string)', )
-
-    parser.add_option(
-        '-r',
-        '--render',
-        dest='render',
-        default='dot',
-        choices=['plantuml', 'dot'],
-        help='Output format - plantuml or dot', )
-
-    parser.add_option(
-        '-l',
-        '--list',
-        dest='list',
-        action='store_true',
-        help='Output database list of tables and exit', )
+        type='string',
+        action='callback',
+        callback=_database_option,
+        help='Database URL (connection string), repeat for several '
+        'databases, optionally as NAME=URL', )
 
     parser.add_option(
         '-i',
         '--include',
         dest='include',
+        type='string',
+        action='callback',
+        callback=_database_option,
         help='List of tables to include through ","', )
 
     parser.add_option(
         '-e',
         '--exclude',
         dest='exclude',
+        type='string',
+        action='callback',
+        callback=_database_option,
         help='List of tables to exlude through ","', )
 
     parser.add_option(
         '-s',
         '--schema',
         dest='schema',
+        type='string',
+        action='callback',
+        callback=_database_option,
         help='Additional schemas (besides `public`) ","', )
 
-    (options, args) = parser.parse_args()
+    parser.add_option(
+        '--seed',
+        dest='seed',
+        type='string',
+        action='callback',
+        callback=_database_option,
+        help='Reflect only these tables through "," and tables reached '
+        'from them by foreign keys', )
 
-    if not options.url:
-        print('-u/--url option required')
-        exit(1)
+    parser.add_option(
+        '--depth',
+        dest='depth',
+        type='int',
+        default=1,
+        help='Foreign key hops from --seed tables (default 1)', )
+
+    parser.add_option(
+        '--direction',
+        dest='direction',
+        default='out',
+        choices=list(crawl.DIRECTIONS),
+        help='Follow foreign keys from --seed tables: out (referenced '
+        'tables), in (referencing tables) or both', )
+
+    parser.add_option(
+        '--generic-reflection',
+        dest='generic_reflection',
+        action='store_true',
+        help='Reflect table by table also where schemas can be read by '
+        'a few catalog queries (SQLite)', )
+
+    parser.add_option(
+        '--gentle',
+        dest='gentle',
+        action='store_true',
+        help='Low impact reflection of production databases: one '
+        'connection, read only transactions, statement and lock '
+        'timeouts, retries after lock timeouts', )
+
+    parser.add_option(
+        '--statement-timeout',
+        dest='statement_timeout',
+        type='float',
+        help='Seconds per statement in gentle mode (default {0})'.format(
+            gentle.DEFAULTS['statement_timeout']), )
+
+    parser.add_option(
+        '--lock-timeout',
+        dest='lock_timeout',
+        type='float',
+        help='Seconds of waiting for locks in gentle mode (default '
+        '{0})'.format(gentle.DEFAULTS['lock_timeout']), )
+
+    parser.add_option(
+        '--max-queries',
+        dest='rate',
+        type='float',
+        help='Catalog queries per second in gentle mode (default no '
+        'limit)', )
+
+    parser.add_option(
+        '--retries',
+        dest='retries',
+        type='int',
+        help='Retries after lock timeouts in gentle mode (default '
+        '{0})'.format(gentle.DEFAULTS['retries']), )
+
+    parser.add_option(
+        '--dialect-types',
+        dest='dialect_types',
+        action='store_true',
+        help='Show column types as compiled by the database dialect', )
+
+    parser.add_option(
+        '--stats',
+        dest='stats',
+        action='store_true',
+        help='Show estimated row counts and sizes of tables', )
+
+    parser.add_option(
+        '--size-colors',
+        dest='size_colors',
+        action='store_true',
+        help='Color tables by size (implies --stats)', )
+
+
+def databases(options):
+    """Databases of options with defaults for schema/include/exclude/seed
 
-    engine = create_engine(options.url)
+    Return list of dicts with name, url, schema, include, exclude, seed,
+    depth, direction, catalog and gentle (see sadisplay.gentle.settings)
+    """
+    result = []
+    for database in options.databases:
+        database = dict(database)
+        for key in ('schema', 'include', 'exclude', 'seed'):
+            if database.get(key) is None:
+                database[key] = getattr(options, key, None)
+        database['depth'] = getattr(options, 'depth', 1)
+        database['direction'] = getattr(options, 'direction', 'out')
+        database['catalog'] = not getattr(options, 'generic_reflection',
+                                          False)
+        database['gentle'] = gentle.settings(options)
+        if database['name'] is None:
+            url = make_url(database['url'])
+            database['name'] = os.path.splitext(
+                os.path.basename(url.database or ''))[0] or url.host or \
+                'db%d' % (len(result) + 1)
+        result.append(database)
+    return result
+
+
+def reflect(database, progress=None):
+    """Reflect schemas of database, or with ``seed`` only the foreign
+    key neighbourhood of seed tables (see sadisplay.crawl)
+
+    :param database: item of :func:`databases`
+    :param progress: optional sadisplay.progress.Progress, tables are
+                     then reflected in batches of REFLECT_BATCH and
+                     those left when its time budget is spent are
+                     skipped
+
+    Schemas of dialects supported by sadisplay.catalog are read by a few
+    catalog queries unless ``catalog`` of database is false. With
+    ``gentle`` settings the engine is made by sadisplay.gentle and
+    reflection is retried after lock timeouts.
+
+    Return tuple (engine, meta)
+    """
+    settings = database.get('gentle')
+    if settings:
+        engine = gentle.create_engine(database['url'], settings)
+    else:
+        engine = create_engine(database['url'])
     meta = MetaData()
 
+    def _retry(func, *args, **kwargs):
+        if settings:
+            return gentle.retry(lambda: func(*args, **kwargs), settings)
+        return func(*args, **kwargs)
+
+    if database.get('seed'):
+        schemas = [None]
+        if database['schema']:
+            schemas = list(map(str.strip, database['schema'].split(',')))
+        _retry(
+            crawl.crawl,
+            engine,
+            meta,
+            list(map(str.strip, database['seed'].split(','))),
+            schemas,
+            depth=database.get('depth', 1),
+            direction=database.get('direction', 'out'),
+            progress=progress, )
+        return engine, meta
+
     # Set schema(s) to reflect
     schema = 'public'
-    if options.schema:
-        schema = options.schema
+    if database['schema']:
+        schema = database['schema']
+    fast = database.get('catalog', True) and \
+        catalog.supported(engine.dialect)
     for s in schema.split(','):
-        meta.reflect(bind=engine,schema=s)
+        if fast:
+            _retry(_reflect_catalog, engine, meta, s, progress)
+        elif progress is None:
+            _retry(meta.reflect, bind=engine, schema=s)
+        else:
+            _retry(_reflect_batches, engine, meta, s, progress)
+
+    return engine, meta
+
+
+def _reflect_catalog(engine, meta, schema, progress):
+    if progress is not None and progress.expired():
+        progress.skip('reflect', [schema])
+        return
+
+    with engine.connect() as conn:
+        names = catalog.reflect(conn, meta, schema)
+
+    if progress is not None:
+        progress.start('reflect', len(names))
+        progress.advance(len(names))
+
+
+def _reflect_batches(engine, meta, schema, progress):
+    names = inspect(engine).get_table_names(schema=schema)
+    progress.start('reflect', len(names))
+
+    for i in range(0, len(names), REFLECT_BATCH):
+        if progress.expired():
+            progress.skip('reflect', [
+                name for name in names[i:]
+                if '%s.%s' % (schema, name) not in meta.tables
+            ])
+            break
+        batch = names[i:i + REFLECT_BATCH]
+        meta.reflect(bind=engine, schema=schema, only=batch)
+        progress.advance(len(batch))
+
+
+def reflect_all(databases, progress=None):
+    """Reflect databases concurrently, each by its own engine and pool
+
+    Return list of (database, engine, meta)
+    """
+    if len(databases) == 1:
+        return [(databases[0], ) + reflect(databases[0], progress)]
+
+    with ThreadPoolExecutor(max_workers=len(databases)) as executor:
+        return [(database, ) + result for database, result in zip(
+            databases,
+            executor.map(lambda d: reflect(d, progress), databases))]
+
+
+def describe_tables(engine, meta, database, options, progress=None):
+    """Describe reflected tables selected by include/exclude options"""
+
+    tables = set(meta.tables.keys())
+
+    if database['include']:
+        tables &= set(map(str.strip, database['include'].split(',')))
+
+    if database['exclude']:
+        tables -= set(map(str.strip, database['exclude'].split(',')))
+
+    tables = [operator.getitem(meta.tables, x) for x in sorted(tables)]
+
+    desc = describe(
+        tables,
+        dialect=engine.dialect if options.dialect_types else None,
+        progress=progress, )
+
+    if options.stats or options.size_colors:
+        if progress is not None and progress.expired():
+            progress.skip('stats', [database['name']])
+        else:
+            desc = stats.annotate(
+                desc,
+                stats.table_stats(engine, tables),
+                colors=options.size_colors, )
+
+    return desc
+
+
+def describe_all(reflected, options, progress=None):
+    """Describe result of :func:`reflect_all` and dispose its engines
+
+    Descriptions of several databases are merged by
+    sadisplay.desc.merge
+    """
+    try:
+        descs = [(database['name'],
+                  describe_tables(engine, meta, database, options, progress))
+                 for database, engine, meta in reflected]
+    finally:
+        for database, engine, meta in reflected:
+            engine.dispose()
+
+    if len(descs) == 1:
+        return descs[0][1]
+
+    return merge(descs)
+
+
+def run(argv=None):
+    """Command for reflection database objects"""
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] in ('serve', 'render'):
+        return command.run(argv)
+
+    parser = OptionParser(
+        version=__version__,
+        description=__doc__,
+        usage='%prog [options]\n       %prog serve [options]'
+        '\n       %prog render --from FILE [options]', )
+
+    add_database_options(parser)
+
+    parser.add_option(
+        '-l',
+        '--list',
+        dest='list',
+        action='store_true',
+        help='Output database list of tables and exit', )
+
+    parser.add_option(
+        '--save',
+        dest='save',
+        help='Save description to file for sadisplay render and exit', )
+
+    command.add_output_options(parser)
+    command.add_progress_options(parser)
+
+    (options, args) = parser.parse_args(argv)
+
+    if not options.url:
+        print('-u/--url option required')
+        exit(1)
+
+    formats, checks = command.output_settings(options)
+
+    progress = command.make_progress(options)
+    reflected = reflect_all(databases(options), progress)
 
     if options.list:
         print('Database tables:')
-        tables = sorted(meta.tables.keys())
+        tables = sorted(
+            name if len(reflected) == 1 else
+            '{0}:{1}'.format(database['name'], name)
+            for database, engine, meta in reflected
+            for name in meta.tables.keys())
 
         def _g(l, i):
             try:
@@ -88,16 +416,14 @@ def run():
                 ' ' * (38 - len(_g(tables, i))),
                 _g(tables, i + 1), ))
 
+        command.finish_progress(progress)
         exit(0)
 
-    tables = set(meta.tables.keys())
-
-    if options.include:
-        tables &= set(map(str.strip, options.include.split(',')))
+    desc = describe_all(reflected, options, progress)
 
-    if options.exclude:
-        tables -= set(map(str.strip, options.exclude.split(',')))
+    if options.save:
+        save(desc, options.save)
+        command.finish_progress(progress)
+        return
 
-    desc = describe(
-        map(lambda x: operator.getitem(meta.tables, x), sorted(tables)))
-    print(getattr(render, options.render)(desc))
+    command.output(desc, options, formats, checks, progress)
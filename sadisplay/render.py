@@ -1,11 +1,29 @@
 # -*- coding: utf-8 -*-
+import re
 from sadisplay import __version__
-from collections import defaultdict
+import json as jsonlib
+from functools import partial
+from collections import OrderedDict, defaultdict
 
 from jinja2 import Environment, PackageLoader, select_autoescape
 env = Environment(
     loader=PackageLoader('sadisplay', 'templates'))
 
+DOT_ID_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+DOT_KEYWORDS = ('node', 'edge', 'graph', 'digraph', 'subgraph', 'strict')
+
+
+def dot_id(value):
+    """Quote dot node or port id unless it is a plain identifier"""
+    value = u'%s' % value
+    if DOT_ID_RE.match(value) and value.lower() not in DOT_KEYWORDS:
+        return value
+    return u'"%s"' % value.replace('"', '\\"')
+
+
+env.filters['dot_id'] = dot_id
+
 # by pull request
 # https://bitbucket.org/estin/sadisplay/pull-requests/4/format-table-info/diff
 def format_column(column):
@@ -18,9 +36,13 @@ def format_column(column):
     return type, name, '%s %s' % (role_char, name)
 
 
-def format_index(index_name):
+def format_index(index_name, redundant=None):
     type_char = u'\U000000BB'
 
+    if redundant:
+        # see sadisplay.analyze.redundant_indexes
+        return u'%s %s \u2717 %s' % (type_char, index_name, redundant)
+
     return '%s %s' % (type_char, index_name)
 
 
@@ -38,6 +60,34 @@ def format_property(property_name):
     return '%s %s' % (type_char, property_name)
 
 
+def format_count(value):
+    for unit in ('', 'K', 'M', 'G'):
+        if abs(value) < 1000:
+            return ('%d%s' if unit == '' else '%.1f%s') % (value, unit)
+        value /= 1000.0
+    return '%.1fT' % value
+
+
+def format_size(value):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(value) < 1024 or unit == 'TB':
+            return ('%d %s' if unit == 'B' else '%.1f %s') % (value, unit)
+        value /= 1024.0
+
+
+def format_stats(cls):
+    """Short text of ``rows`` and ``size`` of a class record, or ''
+
+    See sadisplay.stats.annotate
+    """
+    parts = []
+    if cls.get('rows') is not None:
+        parts.append('%s rows' % format_count(cls['rows']))
+    if cls.get('size') is not None:
+        parts.append(format_size(cls['size']))
+    return ', '.join(parts)
+
+
 def tabular_output(table, indent=None, col_delimiter=None):
     indent = indent or ' ' * 4
     col_delimiter = col_delimiter or ' '
@@ -47,54 +97,93 @@ def tabular_output(table, indent=None, col_delimiter=None):
                                           for i, x in enumerate(line))
 
 
-def plantuml(desc):
-    """Generate plantuml class diagram
-
-    :param desc: result of sadisplay.describe function
+def format_class(cls):
+    """Format members of a ``describe()`` class record once for all renderers
 
-    Return plantuml class diagram string
+    Return dict with preformatted ``cols`` (type, name, pretty name),
+    ``props``, ``methods`` and ``indexes`` (pretty name, type string)
     """
-
-    classes, relations, inherits = desc
+    return {
+        'name': cls['name'],
+        'schema': cls.get('schema'),
+        'stats': format_stats(cls),
+        'color': cls.get('color'),
+        'cols': [format_column(c) for c in cls['cols']],
+        'props': cls['props'],
+        'methods': cls['methods'],
+        'indexes': [(format_index(i['name'], i.get('redundant')),
+                     format_index_type_string(i['cols']))
+                    for i in cls['indexes']],
+    }
+
+
+def _clean(v):
+    return v.replace('(', '[').replace(')', ']')
+
+
+def plantuml_class(cls, formatted=None):
+    """Generate plantuml class block of one ``describe()`` class record"""
+
+    formatted = formatted or format_class(cls)
+
+    # issue #11 - tabular output of class members (attrs)
+    # http://stackoverflow.com/a/8356620/258194
+
+    # build table
+    class_desc = []
+    # table columns
+    class_desc += [(_clean(type), pretty_name)
+                   for type, name, pretty_name in formatted['cols']]
+    # class properties
+    class_desc += [('+', i) for i in formatted['props']]
+    # methods
+    class_desc += [('%s()' % i, '') for i in formatted['methods']]
+    # class indexes
+    class_desc += [(_clean(type), name)
+                   for name, type in formatted['indexes']]
+
+    title = formatted['name']
+    if formatted['stats']:
+        title += ' << %s >>' % formatted['stats']
+    if formatted['color']:
+        title += ' %s' % formatted['color']
+
+    return 'Class %(title)s {\n%(desc)s\n}' % {
+        'title': title,
+        'desc': '\n'.join(tabular_output(class_desc)),
+    }
+
+
+def plantuml_graph(fragments, relations, inherits):
+    """Assemble plantuml class diagram of rendered class blocks"""
 
     result = [
         '@startuml',
         'skinparam defaultFontName Courier',
     ]
 
-    def _clean(v):
-        return v.replace('(', '[').replace(')', ']')
-
-    def _cleanup(col):
-        type, name = col
-        return _clean(type), name
-
-    for cls in classes:
-        # issue #11 - tabular output of class members (attrs)
-        # http://stackoverflow.com/a/8356620/258194
-
-        # build table
-        class_desc = []
-        # table columns
-        class_desc += [_cleanup(format_column(i)) for i in cls['cols']]
-        # class properties
-        class_desc += [('+', i) for i in cls['props']]
-        # methods
-        class_desc += [('%s()' % i, '') for i in cls['methods']]
-        # class indexes
-        class_desc += [(_clean(format_index_type_string(i['cols'])),
-                        format_index(i['name'])) for i in cls['indexes']]
-
-        result.append('Class %(name)s {\n%(desc)s\n}' % {
-            'name': cls['name'],
-            'desc': '\n'.join(tabular_output(class_desc)),
-        })
+    databases = OrderedDict()
+    for cls, fragment in fragments:
+        databases.setdefault(cls.get('database'), []).append(fragment)
+
+    if list(databases) == [None]:
+        result += databases[None]
+    else:
+        # merged databases, see sadisplay.desc.merge
+        result.append('set namespaceSeparator none')
+        for database, classes in databases.items():
+            result.append('package %s <<Database>> {\n%s\n}' % (
+                database, '\n\n'.join(classes)))
 
     for item in inherits:
         result.append("%(parent)s <|-- %(child)s" % item)
 
     for item in relations:
-        result.append("%(from)s <--o %(to)s: %(by)s" % item)
+        if item.get('unindexed'):
+            # foreign key without index, see sadisplay.analyze
+            result.append("%(from)s <-[#red,bold]-o %(to)s: %(by)s" % item)
+        else:
+            result.append("%(from)s <--o %(to)s: %(by)s" % item)
 
     result += [
         'right footer generated by sadisplay v%s' % __version__,
@@ -104,9 +193,296 @@ def plantuml(desc):
     return '\n\n'.join(result)
 
 
-def dot(desc, schema_subgraphs=True):
+def plantuml(desc, cache=None, progress=None):
+    """Generate plantuml class diagram
+
+    :param desc: result of sadisplay.describe function
+    :param cache: optional sadisplay.cache.FragmentCache for class blocks
+    :param progress: optional sadisplay.progress.Progress, see :func:`multi`
+
+    Return plantuml class diagram string
+    """
+    return multi(desc, ['plantuml'], cache=cache,
+                 progress=progress)['plantuml']
+
+
+def dot_class(cls, formatted=None):
+    """Generate dot node of one ``describe()`` class record"""
+
+    formatted = formatted or format_class(cls)
+
+    template = env.get_template('column.html')
+    cols = ' '.join([
+        template.render(
+            type=c[0],
+            name=c[1],
+            pretty_name=c[2]
+        )
+        for c in formatted['cols']])
+
+    ix_template = env.get_template('index.html')
+    props = ' '.join([
+        ix_template.render(
+            name=format_property(p),
+            type="PROPERTY"
+        ) for p in formatted['props']
+    ])
+    methods = ' '.join([
+        ix_template.render(
+            name=m,
+            type="METHOD"
+        ) for m in formatted['methods']])
+
+    indexes = ' '.join([
+        template.render(
+            name=name,
+            type=type,
+        ) for name, type in formatted['indexes']
+    ])
+    template = env.get_template('class.html')
+    return template.render(
+        name=formatted['name'],
+        schema=formatted['schema'],
+        stats=formatted['stats'],
+        color=formatted['color'],
+        cols=cols,
+        indexes=indexes,
+        props=props,
+        methods=methods)
+
+
+def dot_graph(fragments, relations, inherits, schema_subgraphs=True):
+    """Assemble dot graph of rendered class nodes
+
+    Classes of merged databases (see sadisplay.desc.merge) are put
+    into one cluster per database.
+    """
+
+    databases = OrderedDict()
+    for cls, fragment in fragments:
+        subgraphs = databases.setdefault(cls.get('database'), OrderedDict())
+        key = cls.get('schema') if schema_subgraphs else 'default'
+        subgraphs.setdefault(key, []).append(fragment)
+
+    if list(databases) in ([], [None]):
+        # an empty description still makes a valid graph
+        graphs = ['\n'.join(result)
+                  for result in databases.get(None, {}).values()] or ['']
+        databases = None
+    else:
+        graphs = []
+        databases = [{
+            'label': database,
+            'graphs': ['\n'.join(result) for result in subgraphs.values()],
+        } for database, subgraphs in databases.items()]
+
+    return env.get_template("graph.dot").render(
+        graphs=graphs,
+        databases=databases,
+        inherits=inherits,
+        relations=relations)
+
+
+def dot(desc, schema_subgraphs=True, cache=None, progress=None):
     """Generate dot file
 
+    :param desc: result of sadisplay.describe function
+    :param schema_subgraphs: group classes into subgraphs by schema
+    :param cache: optional sadisplay.cache.FragmentCache for class nodes
+    :param progress: optional sadisplay.progress.Progress, see :func:`multi`
+
+    Return string
+    """
+    return multi(desc, ['dot'], cache=cache,
+                 schema_subgraphs=schema_subgraphs,
+                 progress=progress)['dot']
+
+
+def _record_escape(value):
+    return re.sub(r'([{}|<>" ])', r'\\\1', value)
+
+
+def _large_name(name, schema):
+    """Node name of the large graph mode, qualified outside public"""
+    if schema and schema != 'public':
+        return '%s.%s' % (schema, name)
+    return name
+
+
+def dot_large_class(cls, formatted=None, columns='keys'):
+    """Generate plain record node of one ``describe()`` class record
+
+    Used by the large graph mode, which has no per-column ports.
+
+    :param columns: columns to show - all, keys (pk and fk) or none
+    """
+
+    name = _large_name(cls['name'], cls.get('schema'))
+
+    fields = [_record_escape(name)]
+    if columns != 'none':
+        cols = [c for c in cls['cols'] if columns == 'all' or c[2]]
+        if cols:
+            fields.append(''.join(
+                '%s\\l' % _record_escape(format_column(c)[2])
+                for c in cols))
+
+    attrs = 'label="{%s}"' % '|'.join(fields)
+    if cls.get('color'):
+        attrs += ' style=filled fillcolor="%s"' % cls['color']
+
+    return '%s [%s]' % (dot_id(name), attrs)
+
+
+def dot_large_graph(fragments, relations, inherits):
+    """Assemble dot graph for big schemas laid out by sfdp
+
+    Parallel foreign keys between two classes are collapsed into one
+    edge weighted by their count. There are no clusters, ports or
+    ``concentrate``, which all slow down graphviz layouts a lot.
+    """
+
+    edges = OrderedDict()
+    for rel in relations:
+        key = (rel.get('from_schema'), rel['from'],
+               rel.get('to_schema'), rel['to'])
+        edge = edges.setdefault(key, [0, False])
+        edge[0] += 1
+        edge[1] = edge[1] or bool(rel.get('unindexed'))
+
+    # inherits name classes without schema, map names used in a single
+    # schema to their node
+    nodes = defaultdict(set)
+    for cls, fragment in fragments:
+        nodes[cls['name']].add(_large_name(cls['name'], cls.get('schema')))
+    names = dict((name, node.pop()) for name, node in nodes.items()
+                 if len(node) == 1)
+    inherits = [dict(inh, child=names.get(inh['child'], inh['child']),
+                     parent=names.get(inh['parent'], inh['parent']))
+                for inh in inherits]
+
+    lines = []
+    for key, (count, unindexed) in edges.items():
+        from_ = _large_name(key[1], key[0])
+        to = _large_name(key[3], key[2])
+        attrs = []
+        if count > 1:
+            attrs += ['weight=%d' % count, 'penwidth=%d' % min(count, 5),
+                      'label="%d"' % count]
+        if unindexed:
+            attrs.append('color="red"')
+        lines.append('%s -> %s%s' % (
+            dot_id(from_), dot_id(to),
+            ' [%s]' % ' '.join(attrs) if attrs else ''))
+
+    return env.get_template("large.dot").render(
+        nodes=[fragment for cls, fragment in fragments],
+        edges=lines,
+        inherits=inherits)
+
+
+def dot_large(desc, columns='keys', cache=None, progress=None):
+    """Generate dot file for big schemas
+
+    Nodes are plain records without ports, parallel foreign keys are
+    collapsed into weighted edges and the graph is set up for ``sfdp``.
+
+    :param desc: result of sadisplay.describe function
+    :param columns: columns to show - all, keys (pk and fk) or none
+    :param cache: optional sadisplay.cache.FragmentCache for class nodes
+    :param progress: optional sadisplay.progress.Progress, see :func:`multi`
+
+    Return string
+    """
+    return multi(desc, ['dot-large'], cache=cache,
+                 large_columns=columns, progress=progress)['dot-large']
+
+
+def format_overview_counts(schema):
+    return '%(tables)d tables, %(columns)d columns, %(indexes)d indexes' % \
+        schema
+
+
+def overview_dot(overview, link=None):
+    """Generate dot graph of ``sadisplay.desc.overview`` result
+
+    :param overview: result of sadisplay.desc.overview function
+    :param link: optional URL template of per-schema diagrams with
+                 ``{schema}`` placeholder, e.g. ``{schema}.svg``
+
+    Return string
+    """
+    return env.get_template("overview.dot").render(
+        schemas=overview['schemas'],
+        relations=overview['relations'],
+        counts=format_overview_counts,
+        link=link)
+
+
+def overview_plantuml(overview, link=None):
+    """Generate plantuml diagram of ``sadisplay.desc.overview`` result
+
+    :param overview: result of sadisplay.desc.overview function
+    :param link: optional URL template of per-schema diagrams with
+                 ``{schema}`` placeholder
+
+    Return string
+    """
+
+    result = [
+        '@startuml',
+        'skinparam defaultFontName Courier',
+    ]
+
+    aliases = {}
+    for i, schema in enumerate(overview['schemas']):
+        aliases[schema['name']] = 's%d' % i
+        line = 'rectangle "%s\\n%s" as %s' % (
+            schema['name'], format_overview_counts(schema), 's%d' % i)
+        if link:
+            line += ' [[%s]]' % link.format(schema=schema['name'])
+        result.append(line)
+
+    for item in overview['relations']:
+        result.append('%s --> %s: %d' % (aliases[item['from']],
+                                         aliases[item['to']], item['count']))
+
+    result += [
+        'right footer generated by sadisplay v%s' % __version__,
+        '@enduml',
+    ]
+
+    return '\n\n'.join(result)
+
+
+def overview_json(overview, link=None):
+    """Generate JSON document of ``sadisplay.desc.overview`` result
+
+    :param overview: result of sadisplay.desc.overview function
+    :param link: optional URL template of per-schema diagrams, adds
+                 ``link`` to every schema
+
+    Return string
+    """
+    if link:
+        overview = dict(overview, schemas=[
+            dict(schema, link=link.format(schema=schema['name']))
+            for schema in overview['schemas']
+        ])
+
+    return jsonlib.dumps(overview, indent=2, sort_keys=True)
+
+
+OVERVIEW_RENDERERS = {
+    'plantuml': overview_plantuml,
+    'dot': overview_dot,
+    'json': overview_json,
+}
+
+
+def json(desc):
+    """Generate JSON document of ``describe()`` result
+
     :param desc: result of sadisplay.describe function
 
     Return string
@@ -114,59 +490,96 @@ def dot(desc, schema_subgraphs=True):
 
     classes, relations, inherits = desc
 
-    subgraphs = dict(default=classes)
-    if schema_subgraphs:
-        subgraphs = defaultdict(list)
-        for cls in classes:
-            subgraphs[cls['schema']].append(cls)
-
-    graphs = []
-    for key, classes in subgraphs.items():
-        result = []
-        for cls in classes:
-            template = env.get_template('column.html')
-            cols = ' '.join([
-                template.render(
-                    type=c[0],
-                    name=c[1],
-                    pretty_name=c[2]
-                )
-                for c in map(format_column, cls['cols'])])
-
-
-            ix_template = env.get_template('index.html')
-            props = ' '.join([
-                ix_template.render(
-                    name=format_property(p),
-                    type="PROPERTY"
-                )  for p in cls['props']
-            ])
-            methods = ' '.join([
-                ix_template.render(
-                    name=m,
-                    type="METHOD"
-                ) for m in cls['methods']])
-
-            indexes = ' '.join([
-                template.render(
-                    name=format_index(i['name']),
-                    type=format_index_type_string(i['cols']),
-                ) for i in cls['indexes']
-            ])
-            template = env.get_template('class.html')
-            renderd = template.render(
-                name=cls['name'],
-                schema=cls['schema'],
-                cols=cols,
-                indexes=indexes,
-                props=props,
-                methods=methods)
-
-            result.append(renderd)
-
-
-        graphs.append('\n'.join(result))
+    return jsonlib.dumps({
+        'classes': classes,
+        'relations': relations,
+        'inherits': inherits,
+    }, indent=2, sort_keys=True)
 
-    return env.get_template("graph.dot").render(
-        graphs=graphs, inherits=inherits,relations=relations)
 
+RENDERERS = {
+    'plantuml': (plantuml_class, plantuml_graph),
+    'dot': (dot_class, dot_graph),
+    'dot-large': (dot_large_class, dot_large_graph),
+}
+
+
+def multi(desc,
+          formats,
+          cache=None,
+          schema_subgraphs=True,
+          large_columns='keys',
+          progress=None):
+    """Generate several output formats in one pass over classes
+
+    Each class record is formatted once into the shared form of
+    :func:`format_class` and rendered by every requested format.
+
+    :param desc: result of sadisplay.describe function
+    :param formats: list of format names - plantuml, dot, dot-large
+    :param cache: optional sadisplay.cache.FragmentCache for class blocks
+    :param schema_subgraphs: group dot classes into subgraphs by schema
+    :param large_columns: columns of dot-large nodes - all, keys or none
+    :param progress: optional sadisplay.progress.Progress to report to,
+                     classes left when its time budget is spent are
+                     skipped together with their relations
+
+    Return dict of format name and rendered string
+    """
+
+    classes, relations, inherits = desc
+
+    for name in formats:
+        if name not in RENDERERS:
+            raise ValueError('Unknown render format: %s' % name)
+
+    class_options = {
+        'dot-large': {'columns': large_columns},
+    }
+    graph_options = {
+        'dot': {'schema_subgraphs': schema_subgraphs},
+    }
+
+    if progress is not None:
+        progress.start('render', len(classes))
+
+    fragments = dict((name, []) for name in formats)
+    for i, cls in enumerate(classes):
+        if progress is not None and progress.expired():
+            progress.skip('render', [c['name'] for c in classes[i:]])
+            names = set(c['name'] for c in classes[:i])
+            relations = [rel for rel in relations
+                         if rel['from'] in names and rel['to'] in names]
+            inherits = [inh for inh in inherits if inh['child'] in names
+                        and inh['parent'] in names]
+            break
+
+        # filled on the first cache miss, shared by all formats
+        formatted = []
+
+        for name in formats:
+            options = class_options.get(name, {})
+            render = partial(_render_formatted, RENDERERS[name][0], options,
+                             formatted)
+            if cache is None:
+                fragment = render(cls)
+            else:
+                fragment = cache.fragment(name, cls, options, render)
+            fragments[name].append((cls, fragment))
+
+        if progress is not None:
+            progress.advance()
+
+    result = {}
+    for name in formats:
+        graph = RENDERERS[name][1]
+        result[name] = graph(fragments[name], relations, inherits,
+                             **graph_options.get(name, {}))
+
+    return result
+
+
+def _render_formatted(render, options, formatted, cls):
+    if not formatted:
+        formatted.append(format_class(cls))
+    return render(cls, formatted[0], **options)
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Serve diagrams of a database over HTTP, keeping the reflected schema
+in memory and refreshing it in background
+
+Paths::
+
+    /                           list of schemas and paths
+    /diagram.<format>           full diagram
+    /schemas/<schema>.<format>  diagram of one schema
+    /overview.<format>          schemas linked to their diagrams
+
+Formats are dot, dot-large, plantuml and json (overview: dot, plantuml
+and json). Both diagram paths accept
+``?focus=table1,table2&depth=N`` to show only the neighbourhood of
+some tables.
+"""
+import sys
+import json
+import time
+import hashlib
+import threading
+from optparse import OptionParser
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+
+from sadisplay import render, __version__
+from sadisplay.cache import FragmentCache
+from sadisplay.desc import split_schemas, focus, overview
+
+CONTENT_TYPES = {
+    'dot': 'text/vnd.graphviz; charset=utf-8',
+    'dot-large': 'text/vnd.graphviz; charset=utf-8',
+    'plantuml': 'text/plain; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
+
+
+class Diagrams(object):
+    """Warm describe() result and rendered diagrams
+
+    :param load: callable returning ``describe()`` result
+    :param cache: sadisplay.cache.FragmentCache shared by all renders
+    :param max_bodies: number of rendered diagrams kept in memory
+    """
+
+    def __init__(self, load, cache=None, max_bodies=256):
+        self.load = load
+        self.cache = cache or FragmentCache()
+        self.version = 0
+        self.loaded_at = None
+        self._bodies = FragmentCache(maxsize=max_bodies)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.reload()
+
+    def reload(self):
+        """Load description again and drop rendered diagrams"""
+        desc = self.load()
+        schemas = dict(split_schemas(desc))
+
+        with self._lock:
+            self.desc = desc
+            self.schemas = schemas
+            self.version += 1
+            self.loaded_at = time.time()
+            self._bodies.clear()
+
+    def start_refresh(self, interval):
+        """Reload description every interval seconds in a daemon thread"""
+
+        def _refresh():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    # keep serving the last good description
+                    sys.stderr.write('refresh failed: %s\n' % e)
+
+        thread = threading.Thread(target=_refresh, name='sadisplay-refresh')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def index(self):
+        """JSON listing of available diagrams"""
+        return json.dumps({
+            'version': self.version,
+            'formats': sorted(CONTENT_TYPES),
+            'diagram': '/diagram.{format}',
+            'overview': '/overview.{format}',
+            'schemas': dict(
+                (schema, '/schemas/%s.{format}' % schema)
+                for schema in sorted(self.schemas)),
+        }, indent=2, sort_keys=True)
+
+    def diagram(self, schema=None, fmt='dot', names=None, depth=1):
+        """Rendered diagram and its ETag
+
+        :param schema: schema name or None for the whole database
+        :param fmt: dot, dot-large, plantuml or json
+        :param names: optional class names to focus on
+        :param depth: focus depth
+
+        Return tuple (body, etag) or None for unknown schema or format
+        """
+        if fmt not in CONTENT_TYPES:
+            return None
+
+        with self._lock:
+            version = self.version
+            if schema is None:
+                desc = self.desc
+            elif schema in self.schemas:
+                desc = self.schemas[schema]
+            else:
+                return None
+
+        key = FragmentCache.key(version, schema, fmt,
+                                sorted(names or []), depth)
+        cached = self._bodies.get(key)
+        if cached is not None:
+            return cached, self.etag(cached)
+
+        if names:
+            desc = focus(desc, names, depth=depth)
+
+        if fmt == 'json':
+            body = render.json(desc)
+        else:
+            body = render.multi(desc, [fmt], cache=self.cache)[fmt]
+
+        self._bodies.set(key, body)
+        return body, self.etag(body)
+
+    def overview(self, fmt='dot'):
+        """Rendered schema overview and its ETag, or None"""
+        if fmt not in render.OVERVIEW_RENDERERS:
+            return None
+
+        with self._lock:
+            version = self.version
+            desc = self.desc
+
+        key = FragmentCache.key(version, 'overview', fmt)
+        body = self._bodies.get(key)
+        if body is None:
+            body = render.OVERVIEW_RENDERERS[fmt](
+                overview(desc), link='/schemas/{schema}.%s' % fmt)
+            self._bodies.set(key, body)
+
+        return body, self.etag(body)
+
+    @staticmethod
+    def etag(body):
+        return '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+class DiagramHandler(BaseHTTPRequestHandler):
+    """Request handler serving ``server.diagrams``"""
+
+    server_version = 'sadisplay/%s' % __version__
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip('/')
+
+        if not path:
+            return self.respond(self.server.diagrams.index(), 'json')
+
+        if path.startswith('/overview.'):
+            fmt = path[len('/overview.'):]
+            result = self.server.diagrams.overview(fmt)
+            if result is None:
+                return self.send_error(404)
+            return self.respond(result[0], fmt, etag=result[1])
+
+        schema = None
+        if path.startswith('/diagram.'):
+            fmt = path[len('/diagram.'):]
+        elif path.startswith('/schemas/'):
+            schema, _, fmt = path[len('/schemas/'):].rpartition('.')
+        else:
+            return self.send_error(404)
+
+        names = []
+        for value in query.get('focus', []):
+            names += [n.strip() for n in value.split(',') if n.strip()]
+
+        try:
+            depth = int(query.get('depth', ['1'])[0])
+        except ValueError:
+            return self.send_error(400, 'depth must be integer')
+
+        result = self.server.diagrams.diagram(
+            schema=schema, fmt=fmt, names=names, depth=depth)
+        if result is None:
+            return self.send_error(404)
+
+        body, etag = result
+        self.respond(body, fmt, etag=etag)
+
+    def respond(self, body, fmt, etag=None):
+        if etag is not None and etag in self.headers.get(
+                'If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES[fmt])
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-cache')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class DiagramServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server of diagrams"""
+
+    daemon_threads = True
+
+    def __init__(self, address, diagrams, verbose=False):
+        HTTPServer.__init__(self, address, DiagramHandler)
+        self.diagrams = diagrams
+        self.verbose = verbose
+
+
+def run(argv=None):
+    """Command for serving diagrams of database"""
+    from sadisplay import reflect
+
+    parser = OptionParser(
+        prog='sadisplay serve',
+        version=__version__,
+        description=__doc__, )
+
+    reflect.add_database_options(parser)
+
+    parser.add_option(
+        '--host',
+        dest='host',
+        default='127.0.0.1',
+        help='Address to listen on', )
+
+    parser.add_option(
+        '-p',
+        '--port',
+        dest='port',
+        type='int',
+        default=8000,
+        help='Port to listen on', )
+
+    parser.add_option(
+        '--refresh',
+        dest='refresh',
+        type='float',
+        default=600,
+        help='Seconds between background reflections (0 to disable)', )
+
+    parser.add_option(
+        '-v',
+        '--verbose',
+        dest='verbose',
+        action='store_true',
+        help='Log requests to stderr', )
+
+    (options, args) = parser.parse_args(argv)
+
+    if not options.url:
+        print('-u/--url option required')
+        exit(1)
+
+    def load():
+        return reflect.describe_all(
+            reflect.reflect_all(reflect.databases(options)), options)
+
+    diagrams = Diagrams(load)
+    if options.refresh > 0:
+        diagrams.start_refresh(options.refresh)
+
+    server = DiagramServer(
+        (options.host, options.port), diagrams, verbose=options.verbose)
+    sys.stderr.write('Serving diagrams on http://%s:%s/\n' %
+                     server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        diagrams.stop()
+        server.server_close()
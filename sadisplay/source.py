@@ -0,0 +1,1359 @@
+# -*- coding: utf-8 -*-
+"""
+Static discovery of models from source code, without importing it
+
+Model modules are parsed with ``ast`` into plain summaries of their
+declarative classes, ``Table`` definitions, imperative mappers and
+indexes. Summaries of all files are then combined into the same
+``(objects, relations, inherits)`` structure as ``describe()`` returns
+for the imported classes, following the same rules for inheritance,
+relations and deduplication. Models of the same name in different files
+are told apart, names used in a module are resolved through its imports.
+
+Recognized are ``declarative_base()``, ``DeclarativeBase`` subclasses,
+``@as_declarative``, Flask-SQLAlchemy ``db.Model``, ``Column`` and
+``mapped_column`` (also typed by ``Mapped[...]`` annotations),
+``ForeignKey`` and ``ForeignKeyConstraint``, ``relationship`` with
+backrefs, ``column_property``, ``Index`` and ``__table_args__``, mixins
+and abstract classes, single and joined table inheritance, ``Table``
+and ``mapper``/``map_imperatively``. What can only be known by running
+the code (``declared_attr``, naming conventions, types built at
+runtime) is skipped or shown by its name.
+
+Files are parsed in a process pool and their summaries can be cached
+by path and modification time in a sadisplay.cache.FragmentCache.
+"""
+import os
+import ast
+import copy
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from sadisplay.cache import FragmentCache
+
+# bump when summaries change, it is part of the cache key
+SUMMARY_VERSION = 4
+
+STRING_TYPES = (type(''), type(u''))
+
+COLUMNS = ('Column', 'mapped_column')
+DEFERRED = ('deferred', 'column_property')
+RELATIONSHIPS = ('relationship', 'relation', 'dynamic_loader')
+PROPERTIES = RELATIONSHIPS + ('synonym', 'composite')
+MAPPERS = ('mapper', 'map_imperatively')
+BASE_FACTORIES = ('declarative_base', 'generate_base')
+BASE_CLASSES = ('DeclarativeBase', 'DeclarativeBaseNoMeta')
+
+# decorators making something else than a function of a method
+DESCRIPTORS = ('property', 'staticmethod', 'classmethod', 'hybrid_property',
+               'hybrid_method', 'declared_attr', 'cached_property',
+               'setter', 'getter', 'deleter', 'expression', 'comparator')
+
+# type strings as compiled by the default dialect
+TYPES = {
+    'Integer': 'INTEGER',
+    'SmallInteger': 'SMALLINT',
+    'BigInteger': 'BIGINT',
+    'Boolean': 'BOOLEAN',
+    'Date': 'DATE',
+    'DateTime': 'DATETIME',
+    'Time': 'TIME',
+    'Interval': 'DATETIME',
+    'UnicodeText': 'TEXT',
+    'LargeBinary': 'BLOB',
+    'PickleType': 'BLOB',
+    'Float': 'FLOAT',
+    'JSON': 'JSON',
+    'Uuid': 'UUID',
+    'ARRAY': 'ARRAY',
+    'INT': 'INTEGER',
+}
+
+LENGTH_TYPES = {
+    'String': 'VARCHAR',
+    'Unicode': 'VARCHAR',
+    'Text': 'TEXT',
+}
+
+NUMERIC_TYPES = ('Numeric', 'NUMERIC', 'DECIMAL')
+
+PYTHON_TYPES = {
+    'int': 'INTEGER',
+    'str': 'VARCHAR',
+    'float': 'FLOAT',
+    'bool': 'BOOLEAN',
+    'bytes': 'BLOB',
+    'datetime': 'DATETIME',
+    'date': 'DATE',
+    'time': 'TIME',
+    'timedelta': 'DATETIME',
+    'Decimal': 'NUMERIC',
+    'UUID': 'UUID',
+}
+
+
+def _dotted(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted(node.value)
+        return value and '%s.%s' % (value, node.attr)
+    return None
+
+
+def _last(node):
+    name = _dotted(node)
+    return name.rsplit('.', 1)[-1] if name else None
+
+
+def _call_name(node):
+    if isinstance(node, ast.Call):
+        return _last(node.func)
+    return None
+
+
+def _literal(node, default=None):
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return default
+
+
+def _string(node):
+    value = _literal(node)
+    return value if isinstance(value, STRING_TYPES) else None
+
+
+def _keywords(call):
+    return dict((k.arg, k.value) for k in call.keywords if k.arg)
+
+
+def _statements(body):
+    """Statements of body including those of if/try/with blocks"""
+    for stmt in body:
+        if isinstance(stmt, ast.If):
+            for item in _statements(stmt.body + stmt.orelse):
+                yield item
+        elif isinstance(stmt, getattr(ast, 'Try', ())) or \
+                type(stmt).__name__ in ('TryExcept', 'TryFinally'):
+            blocks = stmt.body + getattr(stmt, 'orelse', []) + \
+                getattr(stmt, 'finalbody', [])
+            for handler in getattr(stmt, 'handlers', []):
+                blocks += handler.body
+            for item in _statements(blocks):
+                yield item
+        elif isinstance(stmt, ast.With):
+            for item in _statements(stmt.body):
+                yield item
+        else:
+            yield stmt
+
+
+class _Summary(object):
+    """Summary of one module, see :func:`summarize`"""
+
+    def __init__(self):
+        self.imports = {}
+        self.result = {
+            'version': SUMMARY_VERSION,
+            'path': None,
+            'module': None,
+            'package': None,
+            'imports': {},
+            'aliases': {},
+            'bases': [],
+            'flask': [],
+            'classes': [],
+            'tables': {},
+            'indexes': [],
+            'mappers': [],
+            'order': [],
+        }
+
+    def module(self, tree):
+        result = self.result
+        for stmt in _statements(tree.body):
+            if isinstance(stmt, ast.ImportFrom):
+                for alias in stmt.names:
+                    self.imports[alias.asname or alias.name] = \
+                        '%s.%s' % (stmt.module or '', alias.name)
+                    # resolved against the package when combining
+                    result['imports'][alias.asname or alias.name] = [
+                        stmt.level or 0, stmt.module, alias.name]
+
+            elif isinstance(stmt, ast.Import):
+                for alias in stmt.names:
+                    if alias.asname:
+                        result['aliases'][alias.asname] = alias.name
+
+            elif isinstance(stmt, ast.ClassDef):
+                result['classes'].append(self.cls(stmt))
+                result['order'].append(['class', stmt.name])
+
+            elif isinstance(stmt, ast.Assign) and \
+                    isinstance(stmt.value, ast.Call):
+                name = _call_name(stmt.value)
+                targets = [t.id for t in stmt.targets
+                           if isinstance(t, ast.Name)]
+                if not targets:
+                    continue
+                if name in BASE_FACTORIES:
+                    result['bases'] += targets
+                elif name == 'SQLAlchemy':
+                    result['flask'] += targets
+                elif name == 'Table':
+                    result['tables'][targets[0]] = self.table(stmt.value)
+                    result['order'].append(['table', targets[0]])
+                elif name in MAPPERS:
+                    self.mapper(stmt.value)
+                elif name == 'Index':
+                    result['indexes'].append(self.index(stmt.value))
+
+            elif isinstance(stmt, ast.Expr) and \
+                    isinstance(stmt.value, ast.Call):
+                name = _call_name(stmt.value)
+                if name in MAPPERS:
+                    self.mapper(stmt.value)
+                elif name == 'Index':
+                    result['indexes'].append(self.index(stmt.value))
+
+        return result
+
+    def type(self, node):
+        """Type string, or dict resolved when combining modules"""
+        call = node if isinstance(node, ast.Call) else None
+        name = _last(call.func if call is not None else node)
+        if name is None:
+            return None
+
+        args = call.args if call is not None else []
+        kwargs = _keywords(call) if call is not None else {}
+
+        def _int(key, index):
+            value = _literal(kwargs[key]) if key in kwargs else (
+                _literal(args[index]) if len(args) > index else None)
+            return value if isinstance(value, int) else None
+
+        if name in TYPES:
+            if name == 'ARRAY' and args and 'postgresql' in \
+                    self.imports.get(_dotted(call.func), _dotted(call.func)):
+                return {'array': self.type(args[0])}
+            return TYPES[name]
+
+        if name in LENGTH_TYPES or (name.isupper() and name.endswith(
+                ('CHAR', 'TEXT', 'BINARY'))):
+            result = LENGTH_TYPES.get(name, name)
+            length = _int('length', 0)
+            if length is not None:
+                result += '(%s)' % length
+            collation = _string(kwargs['collation']) \
+                if 'collation' in kwargs else None
+            if collation:
+                result += ' COLLATE "%s"' % collation
+            return result
+
+        if name in NUMERIC_TYPES:
+            precision, scale = _int('precision', 0), _int('scale', 1)
+            if precision is None:
+                return name.upper()
+            if scale is None:
+                return '%s(%s)' % (name.upper(), precision)
+            return '%s(%s, %s)' % (name.upper(), precision, scale)
+
+        if name == 'Enum':
+            values = [_string(arg) for arg in args]
+            if args and all(values):
+                return 'VARCHAR(%s)' % max(len(v) for v in values)
+            if args:
+                return {'enum': _last(args[0])}
+            return 'VARCHAR'
+
+        if name.isupper():
+            params = [_literal(arg) for arg in args]
+            if params and all(isinstance(p, int) for p in params):
+                return '%s(%s)' % (name, ', '.join(map(str, params)))
+            return name
+
+        return {'ref': name}
+
+    def annotation_type(self, node):
+        """Type string of ``Mapped[...]`` annotation, None for classes"""
+        if isinstance(node, ast.Subscript):
+            outer = _last(node.value)
+            inner = node.slice
+            if type(inner).__name__ == 'Index':
+                # python < 3.9
+                inner = inner.value
+            if outer in ('Optional', 'Mapped'):
+                return self.annotation_type(inner)
+            if outer == 'Union' and isinstance(inner, ast.Tuple):
+                types = [self.annotation_type(e) for e in inner.elts
+                         if _literal(e, default=0) is not None]
+                return types[0] if types else None
+            return None
+        if isinstance(node, ast.BinOp):
+            # X | None
+            for side in (node.left, node.right):
+                if _literal(side, default=0) is not None:
+                    return self.annotation_type(side)
+            return None
+        name = _string(node) or _last(node)
+        if name is None:
+            return None
+        name = name.rsplit('.', 1)[-1]
+        if name in PYTHON_TYPES:
+            return PYTHON_TYPES[name]
+        return {'ref': name, 'python': True}
+
+    def fk_target(self, node):
+        spec = _string(node)
+        if spec:
+            return {'spec': spec}
+        # names may be qualified by modules, like module.Class.column
+        parts = (_dotted(node) or '').split('.')
+        if len(parts) >= 3 and parts[-2] == 'c':
+            if len(parts) >= 4 and parts[-3] == '__table__':
+                return {'attr': ['.'.join(parts[:-3]), parts[-1]]}
+            return {'table': ['.'.join(parts[:-2]), parts[-1]]}
+        if len(parts) >= 2:
+            return {'attr': ['.'.join(parts[:-1]), parts[-1]]}
+        return None
+
+    def column(self, call, key=None, annotation=None):
+        column = {
+            'key': key,
+            'name': key,
+            'type': None,
+            'pk': False,
+            'fks': [],
+            'index': False,
+            'unique': False,
+        }
+        named = False
+        for arg in call.args:
+            name = _call_name(arg)
+            if not named and _string(arg) is not None:
+                column['name'] = _string(arg)
+                named = True
+            elif name == 'ForeignKey':
+                target = self.fk_target(arg.args[0]) if arg.args else None
+                if target:
+                    column['fks'].append(target)
+            elif name in ('Sequence', 'Computed', 'Identity',
+                          'CheckConstraint', 'DefaultClause',
+                          'FetchedValue'):
+                continue
+            elif column['type'] is None:
+                column['type'] = self.type(arg)
+
+        kwargs = _keywords(call)
+        if 'type_' in kwargs:
+            column['type'] = self.type(kwargs['type_'])
+        if 'name' in kwargs and _string(kwargs['name']):
+            column['name'] = _string(kwargs['name'])
+        for flag, kw in (('pk', 'primary_key'), ('index', 'index'),
+                         ('unique', 'unique')):
+            column[flag] = _literal(kwargs[kw]) is True \
+                if kw in kwargs else False
+
+        if column['type'] is None and annotation is not None:
+            column['type'] = self.annotation_type(annotation)
+        if column['key'] is None:
+            column['key'] = column['name']
+        return column
+
+    def index(self, call, table=None):
+        """Index of column names, class attributes or table columns"""
+        index = {
+            'name': _string(call.args[0]) if call.args else None,
+            'cols': [],
+            'table': table,
+            'unique': _literal(_keywords(call).get('unique')) is True,
+        }
+        for arg in call.args[1:]:
+            name = _string(arg)
+            if name is not None:
+                index['cols'].append({'key': name})
+            elif isinstance(arg, (ast.Attribute, ast.Name)):
+                target = self.fk_target(arg)
+                if target:
+                    index['cols'].append(target)
+        return index
+
+    def table_items(self, items, table):
+        """Indexes and constraints of Table args or __table_args__"""
+        for item in items:
+            name = _call_name(item)
+            if name == 'Index':
+                table['indexes'].append(self.index(item))
+            elif name == 'PrimaryKeyConstraint':
+                table['pks'] += [n for n in map(_string, item.args) if n]
+            elif name == 'UniqueConstraint':
+                table['uniques'].append(
+                    [n for n in map(_string, item.args) if n])
+            elif name == 'ForeignKeyConstraint' and len(item.args) == 2:
+                cols = _literal(item.args[0], default=[])
+                table['fk_groups'].append(list(cols))
+                refs = item.args[1].elts if isinstance(
+                    item.args[1], (ast.List, ast.Tuple)) else []
+                for col, ref in zip(cols, refs):
+                    target = self.fk_target(ref)
+                    if target:
+                        table['fks'].append([col, target])
+            elif isinstance(item, ast.Dict):
+                kwargs = dict(zip([_string(k) for k in item.keys],
+                                  item.values))
+                if 'schema' in kwargs:
+                    table['schema'] = _string(kwargs['schema'])
+
+    def table(self, call):
+        table = {
+            'name': _string(call.args[0]) if call.args else None,
+            'schema': None,
+            'columns': [],
+            'indexes': [],
+            'pks': [],
+            'fks': [],
+            'fk_groups': [],
+            'uniques': [],
+        }
+        others = []
+        for arg in call.args[2:]:
+            if _call_name(arg) in COLUMNS:
+                table['columns'].append(self.column(arg))
+            else:
+                others.append(arg)
+        self.table_items(others, table)
+        kwargs = _keywords(call)
+        if 'schema' in kwargs:
+            table['schema'] = _string(kwargs['schema'])
+        return table
+
+    def relationship(self, call, key, owner):
+        """Relationship property, adding its backref to the target"""
+        target = None
+        if call.args:
+            target = _string(call.args[0]) or _dotted(call.args[0])
+        kwargs = _keywords(call)
+        backref = kwargs.get('backref')
+        if target and backref is not None:
+            name = _string(backref)
+            if name is None and _call_name(backref) == 'backref' and \
+                    backref.args:
+                name = _string(backref.args[0])
+            if name:
+                owner['backrefs'].append([target, name])
+        owner['props'].append(key)
+
+    def mapper(self, call):
+        if len(call.args) < 2:
+            return
+        mapper = {
+            'class': _last(call.args[0]),
+            'table': _last(call.args[1]),
+            'props': [],
+            'backrefs': [],
+        }
+        kwargs = _keywords(call)
+        properties = call.args[2] if len(call.args) > 2 else \
+            kwargs.get('properties')
+        if isinstance(properties, ast.Dict):
+            for key, value in zip(properties.keys, properties.values):
+                key = _string(key)
+                if key is None:
+                    continue
+                if _call_name(value) in RELATIONSHIPS:
+                    self.relationship(value, key, mapper)
+                elif _call_name(value) in PROPERTIES:
+                    mapper['props'].append(key)
+        self.result['mappers'].append(mapper)
+        self.result['order'].append(['mapper', mapper['class']])
+
+    def cls(self, node):
+        cls = {
+            'name': node.name,
+            'bases': [_dotted(base) for base in node.bases
+                      if _dotted(base)],
+            'decorators': [
+                _last(d.func if isinstance(d, ast.Call) else d)
+                for d in node.decorator_list
+            ],
+            'tablename': None,
+            'table': None,
+            'table_args': {
+                'schema': None,
+                'indexes': [],
+                'pks': [],
+                'fks': [],
+                'fk_groups': [],
+                'uniques': [],
+            },
+            'abstract': False,
+            'columns': [],
+            'props': [],
+            'backrefs': [],
+            'methods': [],
+            'names': [],
+            'impl': None,
+        }
+
+        for stmt in node.body:
+            annotation = None
+            if isinstance(stmt, ast.Assign):
+                targets = [t.id for t in stmt.targets
+                           if isinstance(t, ast.Name)]
+                value = stmt.value
+            elif isinstance(stmt, getattr(ast, 'AnnAssign', ())) and \
+                    isinstance(stmt.target, ast.Name):
+                targets = [stmt.target.id]
+                value = stmt.value
+                annotation = stmt.annotation
+            elif isinstance(stmt, (ast.FunctionDef,
+                                   getattr(ast, 'AsyncFunctionDef', ()))):
+                cls['names'].append(stmt.name)
+                decorators = [
+                    _last(d.func if isinstance(d, ast.Call) else d)
+                    for d in stmt.decorator_list
+                ]
+                if not set(decorators) & set(DESCRIPTORS):
+                    cls['methods'].append(stmt.name)
+                continue
+            else:
+                continue
+
+            if not targets:
+                continue
+            key = targets[0]
+            cls['names'] += targets
+
+            if key == '__tablename__':
+                cls['tablename'] = _string(value)
+            elif key == '__abstract__':
+                cls['abstract'] = _literal(value) is True
+            elif key == '__table__' and _call_name(value) == 'Table':
+                cls['table'] = self.table(value)
+            elif key == '__table_args__':
+                items = value.elts if isinstance(
+                    value, (ast.Tuple, ast.List)) else [value]
+                self.table_items(items, cls['table_args'])
+            elif key == 'impl' and value is not None:
+                cls['impl'] = self.type(value)
+            elif _call_name(value) in COLUMNS:
+                cls['columns'].append(
+                    self.column(value, key, annotation=annotation))
+            elif _call_name(value) in DEFERRED and value.args and \
+                    _call_name(value.args[0]) in COLUMNS:
+                cls['columns'].append(self.column(value.args[0], key))
+            elif _call_name(value) == 'column_property':
+                # sql expression, shown as property like a Label
+                cls['props'].append(key)
+            elif _call_name(value) in RELATIONSHIPS:
+                self.relationship(value, key, cls)
+            elif _call_name(value) in PROPERTIES:
+                cls['props'].append(key)
+            elif value is None and annotation is not None and \
+                    _last(getattr(annotation, 'value', None)) == 'Mapped':
+                type_ = self.annotation_type(annotation)
+                if type_ is None:
+                    # Mapped[List[...]] of related classes
+                    cls['props'].append(key)
+                else:
+                    # Mapped['Other'] is told from Mapped[SomeEnum] when
+                    # combining modules
+                    cls['columns'].append({
+                        'key': key,
+                        'name': key,
+                        'type': type_,
+                        'pk': False,
+                        'fks': [],
+                        'index': False,
+                        'unique': False,
+                        'annotated': True,
+                    })
+
+        return cls
+
+
+def summarize(source, path='<source>', module=None):
+    """Summary of models defined by source of one module
+
+    :param path: file of the module, models of different files are told
+                 apart by it
+    :param module: dotted name of the module, to resolve imports of
+                   other modules
+
+    Return JSON serializable dict
+    """
+    result = _Summary().module(ast.parse(source, path))
+    result['path'] = path
+    if module is not None:
+        result['module'] = module
+        result['package'] = module if os.path.basename(path) == \
+            '__init__.py' else module.rpartition('.')[0]
+    return result
+
+
+def module_name(path):
+    """Dotted name of module file, by the packages it is in"""
+    directory, filename = os.path.split(os.path.abspath(path))
+    name = os.path.splitext(filename)[0]
+    parts = [] if name == '__init__' else [name]
+    while os.path.exists(os.path.join(directory, '__init__.py')):
+        directory, package = os.path.split(directory)
+        parts.insert(0, package)
+    return '.'.join(parts)
+
+
+def summarize_file(path):
+    with open(path, 'rb') as f:
+        return summarize(f.read(), path, module_name(path))
+
+
+def find_files(paths):
+    """Python files of paths, directories are walked in sorted order"""
+    result = []
+    for path in paths:
+        if not os.path.isdir(path):
+            result.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            result += [os.path.join(root, name) for name in sorted(files)
+                       if name.endswith('.py')]
+    return result
+
+
+def parse(paths, workers=None, cache=None):
+    """Summaries of files in order of paths
+
+    :param paths: list of files or directories of python modules
+    :param workers: parse files in this many processes
+    :param cache: sadisplay.cache.FragmentCache keeping summaries by
+                  file path and modification time
+    """
+    files = find_files(paths)
+    summaries = [None] * len(files)
+    keys = {}
+
+    for i, path in enumerate(files):
+        if cache is None:
+            continue
+        stat = os.stat(path)
+        keys[i] = FragmentCache.key('source', SUMMARY_VERSION,
+                                    os.path.abspath(path), stat.st_mtime,
+                                    stat.st_size)
+        cached = cache.get(keys[i])
+        if cached is not None:
+            summaries[i] = json.loads(cached)
+
+    todo = [i for i, summary in enumerate(summaries) if summary is None]
+    if workers and workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(summarize_file,
+                                       [files[i] for i in todo]))
+    else:
+        parsed = [summarize_file(files[i]) for i in todo]
+
+    for i, summary in zip(todo, parsed):
+        summaries[i] = summary
+        if cache is not None:
+            cache.set(keys[i], json.dumps(summary))
+
+    return summaries
+
+
+class _Models(object):
+    """Classes and tables of all summaries, see :func:`describe_summaries`
+
+    Classes, tables and base classes are keyed by (path of module, name),
+    so models of the same name in different files stay apart. Names used
+    in a module are resolved through its imports, see :meth:`resolve`.
+    """
+
+    def __init__(self, summaries):
+        self.classes = OrderedDict()
+        self.tables = OrderedDict()
+        self.bases = set()
+        self.flask = set()
+        self.mappers = {}
+        self.backrefs = []
+        self.indexes = []
+        self.order = []
+        self.modules = {}
+        self.imports = {}
+        self.aliases = {}
+        self._names = {}
+
+        # annotated columns are moved to properties below
+        summaries = copy.deepcopy(summaries)
+        mappers = []
+        for i, summary in enumerate(summaries):
+            path = summary['path']
+            if path in self.imports:
+                # several summaries of sources without a file
+                path = '%s:%s' % (path, i)
+            if summary['module']:
+                self.modules.setdefault(summary['module'], path)
+            self.imports[path] = self._imports(summary)
+            self.aliases[path] = summary['aliases']
+
+            self.bases.update((path, name) for name in summary['bases'])
+            self.flask.update((path, name) for name in summary['flask'])
+            for cls in summary['classes']:
+                cls['path'] = path
+                self.classes.setdefault((path, cls['name']), cls)
+                self.backrefs += [[path] + b for b in cls['backrefs']]
+                tables = [cls['table']] if cls['table'] else []
+                for table in tables:
+                    table['path'] = path
+                for column in cls['columns'] + sum(
+                        [t['columns'] for t in tables], []):
+                    column['path'] = path
+            for var, table in summary['tables'].items():
+                table['path'] = path
+                self.tables.setdefault((path, var), table)
+                for column in table['columns']:
+                    column['path'] = path
+            for mapper in summary['mappers']:
+                mappers.append((path, mapper))
+                self.backrefs += [[path] + b for b in mapper['backrefs']]
+            for index in summary['indexes']:
+                index['path'] = path
+                self.indexes.append(index)
+            self.order += [[kind, path, name]
+                           for kind, name in summary['order']]
+
+        self._kinds = {}
+        self._mapped = {}
+
+        for path, mapper in mappers:
+            key = self.resolve(path, mapper['class'], self.classes)
+            if key is not None:
+                mapper['table'] = self.resolve(path, mapper['table'],
+                                               self.tables)
+                self.mappers.setdefault(key, mapper)
+
+        self.enums = dict(
+            (key, cls['names']) for key, cls in self.classes.items()
+            if any(b.split('.')[-1] in ('Enum', 'IntEnum', 'StrEnum')
+                   for b in cls['bases']))
+
+        for cls in self.classes.values():
+            for column in list(cls['columns']):
+                if column.pop('annotated', False) and \
+                        isinstance(column['type'], dict) and \
+                        self.type_class(cls['path'],
+                                        column['type']['ref']) is None:
+                    cls['columns'].remove(column)
+                    cls['props'].append(column['key'])
+
+    def _imports(self, summary):
+        """Names imported from other modules as (module, name)"""
+        result = {}
+        for local, (level, module, name) in summary['imports'].items():
+            if level:
+                package = (summary['package'] or '').split('.')
+                package = package[:len(package) - level + 1]
+                module = '.'.join([p for p in package + [module] if p])
+            result[local] = (module, name)
+        return result
+
+    def resolve(self, path, dotted, found):
+        """Key of name used in module of path among keys of found
+
+        Names are looked up in the module, then followed through its
+        imports, ``module.Name`` through imported modules. Names that
+        can not be resolved, like those of modules not parsed or string
+        references resolved by the declarative registry, fall back to
+        the first one of found of the same name.
+        """
+        if dotted is None:
+            return None
+        module, _, name = dotted.rpartition('.')
+        if module:
+            first, _, rest = module.partition('.')
+            if first in self.aliases.get(path, {}):
+                first = self.aliases[path][first]
+            elif first in self.imports.get(path, {}):
+                first = '.'.join(self.imports[path][first])
+            module = '.'.join([p for p in (first, rest) if p])
+            key = (self.modules.get(module), name)
+        else:
+            key = (path, name)
+
+        seen = set()
+        while key not in found and key not in seen:
+            seen.add(key)
+            imported = self.imports.get(key[0], {}).get(key[1])
+            if imported is None:
+                break
+            key = (self.modules.get(imported[0]), imported[1])
+
+        if key in found:
+            return key
+        return self._by_name(found).get(name)
+
+    def _by_name(self, found):
+        """First key of each name among keys of found"""
+        if id(found) not in self._names:
+            names = self._names[id(found)] = {}
+            for key in found:
+                names.setdefault(key[1], key)
+        return self._names[id(found)]
+
+    def type_class(self, path, name):
+        """Enum or custom column type class of name used in module"""
+        key = self.resolve(path, name, self.classes)
+        if key is None:
+            return None
+        if key in self.enums or self.classes[key]['impl'] is not None:
+            return key
+        return None
+
+    def _is_base(self, path, dotted):
+        parts = dotted.split('.')
+        if self.resolve(path, dotted, self.bases) is not None:
+            return True
+        return len(parts) > 1 and parts[-1] == 'Model' and \
+            self.resolve(path, '.'.join(parts[:-1]), self.flask) is not None
+
+    def base_kind(self, path, dotted):
+        """base, model, abstract, mixin or None of base class name used
+        in module of path
+        """
+        if self._is_base(path, dotted):
+            return 'base'
+        if dotted.split('.')[-1] in BASE_CLASSES:
+            return 'declarative'
+        key = self.resolve(path, dotted, self.classes)
+        return self.kind(key) if key is not None else None
+
+    def kind(self, key):
+        """base, model, abstract, mixin or None of class key"""
+        if key in self._kinds:
+            return self._kinds[key]
+        self._kinds[key] = None
+
+        cls = self.classes.get(key)
+        if cls is None:
+            return None
+
+        kinds = [self.base_kind(cls['path'], base) for base in cls['bases']]
+        if 'declarative' in kinds or 'as_declarative' in cls['decorators']:
+            kind = 'base'
+        elif cls['abstract'] and ('base' in kinds or 'model' in kinds
+                                  or 'abstract' in kinds):
+            kind = 'abstract'
+        elif 'model' in kinds or 'mapped' in cls['decorators'] or \
+                key in self.mappers:
+            kind = 'model'
+        elif set(kinds) & set(['base', 'abstract']) and \
+                (cls['tablename'] or cls['table']):
+            kind = 'model'
+        elif 'base' in kinds and self._flask(cls) and any(
+                c['pk'] for c in cls['columns']):
+            kind = 'model'
+        else:
+            kind = 'mixin' if cls['columns'] else None
+
+        self._kinds[key] = kind
+        return kind
+
+    def _flask(self, cls):
+        return any(base.split('.')[-1] == 'Model' for base in cls['bases'])
+
+    def _bases(self, cls, kinds):
+        """Classes of bases of class of kinds"""
+        for base in cls['bases']:
+            if self.base_kind(cls['path'], base) in kinds:
+                yield self.classes[self.resolve(cls['path'], base,
+                                                self.classes)]
+
+    def parent(self, cls):
+        """Nearest mapped class in bases of class"""
+        for base in cls['bases']:
+            kind = self.base_kind(cls['path'], base)
+            if kind not in ('model', 'abstract', 'mixin'):
+                continue
+            found = self.classes[self.resolve(cls['path'], base,
+                                              self.classes)]
+            if kind == 'model':
+                return found
+            found = self.parent(found)
+            if found is not None:
+                return found
+        return None
+
+    def inherited_columns(self, cls):
+        """Columns of abstract and mixin bases"""
+        columns = []
+        for base in self._bases(cls, ('abstract', 'mixin')):
+            columns += self.inherited_columns(base) + base['columns']
+        return columns
+
+    def mapped(self, key):
+        """Mapping of class key, like sqlalchemy Mapper
+
+        Return dict with table, table_name, columns (key -> column),
+        props and names, or None if not mapped
+        """
+        if key in self._mapped:
+            return self._mapped[key]
+
+        cls = self.classes.get(key)
+        if cls is None or self.kind(key) != 'model':
+            self._mapped[key] = None
+            return None
+
+        parent = self.parent(cls)
+        parent_mapped = self.mapped((parent['path'], parent['name'])) \
+            if parent else None
+
+        columns = OrderedDict()
+        if parent_mapped is not None:
+            columns.update(parent_mapped['columns'])
+
+        own = self.inherited_columns(cls) + cls['columns']
+
+        if key in self.mappers:
+            table = self.tables.get(self.mappers[key]['table'])
+            own = table['columns'] if table else []
+        elif cls['table'] is not None:
+            table = cls['table']
+            own = table['columns']
+        elif cls['tablename'] or (parent is None and self._flask(cls)):
+            table = self._table(cls)
+        else:
+            # single table inheritance, columns go to the parent table
+            table = parent_mapped['table'] if parent_mapped else None
+            if table is not None:
+                table['columns'] += cls['columns']
+            own = cls['columns']
+
+        for column in own:
+            if column['key'] in columns:
+                # joined inheritance, own column comes first
+                columns[column['key']] = dict(column)
+            else:
+                columns[column['key']] = column
+
+        joined = parent_mapped is not None and \
+            table is not parent_mapped['table']
+        if table is None:
+            table_name = None
+        elif joined:
+            table_name = '%s JOIN %s' % (parent_mapped['table_name'],
+                                         _table_name(table))
+        else:
+            table_name = _table_name(table)
+
+        result = self._mapped[key] = {
+            'key': key,
+            'name': cls['name'],
+            'cls': cls,
+            'parent': parent_mapped,
+            'table': table,
+            'table_name': table_name,
+            'joined': joined,
+            'columns': columns,
+        }
+        return result
+
+    def _table(self, cls):
+        table = {
+            'name': cls['tablename'] or _snake_case(cls['name']),
+            'schema': cls['table_args']['schema'],
+            'path': cls['path'],
+            'columns': list(self.inherited_columns(cls) + cls['columns']),
+            'indexes': list(cls['table_args']['indexes']),
+            'pks': cls['table_args']['pks'],
+            'fks': cls['table_args']['fks'],
+            'fk_groups': cls['table_args']['fk_groups'],
+            'uniques': cls['table_args']['uniques'],
+        }
+        cls['table'] = table
+        return table
+
+
+def _table_name(table):
+    if table.get('schema'):
+        return '%s.%s' % (table['schema'], table['name'])
+    return table['name']
+
+
+def _constraints(table):
+    """Constraints of table like sadisplay.describer.get_constraints"""
+    columns = table['columns']
+    return {
+        'pk': list(table['pks']) or [c['name'] for c in columns if c['pk']],
+        'unique': sorted(
+            [[c['name']] for c in columns if c['unique'] and
+             not c['index']] + [list(u) for u in table['uniques']]),
+        'fks': sorted(
+            [[c['name']] for c in columns for target in c['fks']] +
+            [list(cols) for cols in table['fk_groups']]),
+    }
+
+
+def _snake_case(name):
+    """Table name of Flask-SQLAlchemy models"""
+    result = []
+    for i, char in enumerate(name):
+        if char.isupper() and i and not name[i - 1].isupper():
+            result.append('_')
+        result.append(char.lower())
+    return ''.join(result)
+
+
+class _Entry(object):
+    """Adaptor like sadisplay.describer.EntryItem for summaries"""
+
+    def __init__(self, name, table_name, columns, table, schema=None,
+                 inherits=None, cls=None, mapped=None):
+        self.name = name
+        self.table_name = table_name
+        self.columns = columns
+        self.table = table
+        self.schema = schema
+        self.inherits = inherits
+        self.cls = cls
+        self.mapped = mapped
+
+
+def describe_summaries(summaries,
+                       show_methods=True,
+                       show_properties=True,
+                       show_indexes=True,
+                       show_simple_indexes=True,
+                       show_columns_of_indexes=True):
+    """Combine summaries of :func:`parse` into ``describe()`` result
+
+    Classes and unmapped tables are described in order of definition,
+    tables mapped by ``mapper()`` at the place of the mapper call.
+    """
+    models = _Models(summaries)
+
+    # tables of all mapped classes first, as single table inheritance
+    # adds columns to them
+    def _class_key(kind, path, name):
+        if kind == 'mapper':
+            return models.resolve(path, name, models.classes)
+        return path, name
+
+    for kind, path, name in models.order:
+        if kind in ('class', 'mapper'):
+            models.mapped(_class_key(kind, path, name))
+
+    table_entries = dict((id(m['table']), m['name'])
+                         for m in models._mapped.values()
+                         if m is not None and m['table'] is not None)
+    tables_by_name = {}
+    for var, table in models.tables.items():
+        tables_by_name.setdefault(_table_name(table), table)
+    for mapped in models._mapped.values():
+        if mapped is not None and mapped['table'] is not None:
+            tables_by_name.setdefault(_table_name(mapped['table']),
+                                      mapped['table'])
+
+    entries = []
+    names = set()
+    inherit_names = set()
+    table_names = set()
+
+    for kind, path, name in models.order:
+        if kind == 'table':
+            table = models.tables[path, name]
+            if id(table) in table_entries:
+                continue
+            entry = _Entry(table['name'], _table_name(table),
+                           OrderedDict((c['key'], c)
+                                       for c in table['columns']),
+                           table, schema=table['schema'])
+        else:
+            mapped = models.mapped(_class_key(kind, path, name))
+            if mapped is None:
+                continue
+            entry = _Entry(
+                mapped['name'],
+                mapped['table_name'],
+                mapped['columns'],
+                None if mapped['joined'] else mapped['table'],
+                inherits=mapped['parent'],
+                cls=mapped['cls'],
+                mapped=mapped)
+
+        # deduplicated like EntryItem.__eq__
+        if entry.inherits:
+            if entry.name in names:
+                continue
+            inherit_names.add(entry.name)
+        else:
+            if entry.name in inherit_names or \
+                    entry.table_name in table_names:
+                continue
+            table_names.add(entry.table_name)
+        names.add(entry.name)
+        entries.append(entry)
+
+    backrefs = {}
+    for path, target, name in models.backrefs:
+        key = models.resolve(path, target, models.classes)
+        backrefs.setdefault(key, set()).add(name)
+
+    def _props(mapped):
+        if mapped is None:
+            return set()
+        props = set(mapped['cls']['props']) | \
+            backrefs.get(mapped['key'], set())
+        if mapped['key'] in models.mappers:
+            props |= set(models.mappers[mapped['key']]['props'])
+        return props | _props(mapped['parent'])
+
+    def _column_of(target, path):
+        """Table and column of foreign key or index target used in module
+        of path
+        """
+        if 'spec' in target:
+            table_name, _, column = target['spec'].rpartition('.')
+            table = tables_by_name.get(table_name)
+            columns = table['columns'] if table else []
+            found = [c for c in columns if c['name'] == column]
+            return table_name, column, found[0] if found else None
+        if 'table' in target:
+            table = models.tables.get(
+                models.resolve(path, target['table'][0], models.tables))
+            if table is None:
+                return None, None, None
+            found = [c for c in table['columns']
+                     if c['key'] == target['table'][1]]
+            return _table_name(table), target['table'][1], \
+                found[0] if found else None
+        mapped = models.mapped(
+            models.resolve(path, target['attr'][0], models.classes))
+        if mapped is None or mapped['table'] is None:
+            return None, None, None
+        column = mapped['columns'].get(target['attr'][1])
+        if column is None:
+            return None, None, None
+        return _table_name(mapped['table']), column['name'], column
+
+    def _type(column, seen=()):
+        type_ = column['type']
+        if type_ is None:
+            # typed by the referenced column
+            for target in column['fks']:
+                found = _column_of(target, column['path'])[2]
+                if found is not None and found is not column and \
+                        id(found) not in seen:
+                    return _type(found, seen + (id(column), ))
+            return 'NULL'
+        return _type_string(type_, models, column['path'])
+
+    def _fks(table):
+        result = {}
+        for col, target in table.get('fks', []) if table else []:
+            result.setdefault(col, []).append(target)
+        return result
+
+    def _role(column, table_fks, table_pks):
+        if column['pk'] or column['name'] in table_pks:
+            return 'pk'
+        if column['fks'] or column['name'] in table_fks:
+            return 'fk'
+        return None
+
+    table_indexes = {}
+
+    def _indexes(table):
+        if id(table) in table_indexes:
+            return table_indexes[id(table)]
+
+        indexes = []
+        by_key = dict((c['key'], c) for c in table['columns'])
+        for index in table['indexes']:
+            cols = []
+            for col in index['cols']:
+                if 'key' in col:
+                    if col['key'] in by_key:
+                        cols.append(by_key[col['key']]['name'])
+                else:
+                    found = _column_of(col, table['path'])
+                    if found[2] is not None:
+                        cols.append(found[1])
+            indexes.append({
+                'name': index['name'],
+                'cols': cols,
+                'unique': index['unique'],
+            })
+
+        for index in models.indexes:
+            targets = [_column_of(col, index['path'])
+                       for col in index['cols'] if 'key' not in col]
+            if targets and targets[0][0] == _table_name(table):
+                indexes.append({
+                    'name': index['name'],
+                    'cols': [t[1] for t in targets if t[2] is not None],
+                    'unique': index['unique'],
+                })
+
+        prefix = '%s_' % table['schema'] if table.get('schema') else ''
+        for column in table['columns']:
+            if column['index']:
+                indexes.append({
+                    'name': 'ix_%s%s_%s' % (prefix, table['name'],
+                                            column['name']),
+                    'cols': [column['name']],
+                    'unique': column['unique'],
+                })
+
+        table_indexes[id(table)] = indexes
+        return indexes
+
+    objects = []
+    for entry in entries:
+        table_fks = _fks(entry.table if entry.table else (
+            entry.mapped['table'] if entry.mapped else None))
+        table_pks = set(entry.table['pks']) if entry.table else set()
+
+        result_item = {
+            'name': entry.name,
+            'schema': entry.schema,
+            'cols': [(_type(col), key, _role(col, table_fks, table_pks))
+                     for key, col in entry.columns.items()],
+            'indexes': [],
+            'props': [],
+            'methods': [],
+        }
+
+        result_item['cols'].sort(key=lambda c: (
+            {'pk': '0', 'fk': '1'}.get(c[2], '2') + c[1]))
+
+        if show_methods and entry.cls is not None:
+            excluded = set()
+            if entry.inherits:
+                parent = entry.inherits
+                excluded = set(parent['cls']['names']) | \
+                    set(parent['columns']) | _props(parent)
+            result_item['methods'] = [
+                name for name in entry.cls['methods']
+                if name[0] != '_' and name not in excluded
+            ]
+
+        if show_indexes and entry.table is not None:
+            result_item['constraints'] = _constraints(entry.table)
+            for index in _indexes(entry.table):
+                if not show_simple_indexes and len(index['cols']) <= 1:
+                    continue
+                item = {
+                    'name': index['name'],
+                    'cols': index['cols'] if show_columns_of_indexes
+                    else [],
+                }
+                if index['unique']:
+                    item['unique'] = True
+                result_item['indexes'].append(item)
+
+        if show_properties:
+            result_item['props'] = list(_props(entry.mapped))
+
+        for key in ('methods', 'props', ):
+            result_item[key].sort()
+
+        result_item['indexes'].sort(key=lambda i: i['name'] or '')
+
+        objects.append(result_item)
+
+    # second phase like sadisplay.describer.Describer.resolve
+    relations = []
+    inherits = []
+
+    by_table = {}
+    for m in entries:
+        by_table.setdefault(m.table_name, []).append(m)
+
+    for entry in entries:
+        start = len(relations)
+        table = entry.table if entry.table else (
+            entry.mapped['table'] if entry.mapped else None)
+        table_fks = _fks(table)
+
+        for key, col in entry.columns.items():
+            targets = [(target, col['path']) for target in col['fks']] + \
+                [(target, table['path'])
+                 for target in table_fks.get(col['name'], [])]
+            for target, path in targets:
+                table_name, to_col, found = _column_of(target, path)
+                for m in by_table.get(table_name, ()):
+                    relations.append({
+                        'from': entry.name,
+                        'from_schema': entry.schema,
+                        'by': col['name'],
+                        'to': m.name,
+                        'to_schema': m.schema,
+                        'to_col': to_col,
+                    })
+
+        if entry.inherits:
+            inh = {
+                'child': entry.name,
+                'parent': entry.inherits['name'],
+            }
+            inherits.append(inh)
+
+            own = relations[start:]
+            for i, rel in enumerate(own):
+                if inh['child'] == rel['from'] and \
+                        inh['parent'] == rel['to']:
+                    own.pop(i)
+            relations[start:] = own
+
+    return objects, relations, inherits
+
+
+def _type_string(type_, models, path):
+    if isinstance(type_, STRING_TYPES):
+        return type_
+    if 'array' in type_:
+        inner = type_['array']
+        return '%s[]' % (_type_string(inner, models, path)
+                         if inner is not None else 'NULL')
+    name = type_.get('enum') or type_.get('ref')
+    key = models.type_class(path, name)
+    if key in models.enums:
+        members = [m for m in models.enums[key] if not m.startswith('_')]
+        if members:
+            return 'VARCHAR(%s)' % max(len(m) for m in members)
+        return 'VARCHAR'
+    if key is not None:
+        return _type_string(models.classes[key]['impl'], models, key[0])
+    if 'enum' in type_:
+        return 'VARCHAR'
+    return name.upper()
+
+
+def describe_source(paths,
+                    show_methods=True,
+                    show_properties=True,
+                    show_indexes=True,
+                    show_simple_indexes=True,
+                    show_columns_of_indexes=True,
+                    workers=None,
+                    cache=None):
+    """Describe models found in source files without importing them
+
+    :param paths: list of model modules or directories of them
+    :param workers: parse files in this many processes
+    :param cache: sadisplay.cache.FragmentCache for parsed files
+
+    Other options are those of sadisplay.describer.describe.
+
+    Return tuple (objects, relations, inherits)
+    """
+    return describe_summaries(
+        parse(paths, workers=workers, cache=cache),
+        show_methods=show_methods,
+        show_properties=show_properties,
+        show_indexes=show_indexes,
+        show_simple_indexes=show_simple_indexes,
+        show_columns_of_indexes=show_columns_of_indexes, )
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Estimated row counts and on-disk sizes of reflected tables
+
+Statistics are fetched from the database catalogs in a few batched
+queries per schema instead of one query per table.
+"""
+from collections import defaultdict
+
+from sqlalchemy import text
+
+# tables per COUNT(*) query on dialects without estimates
+COUNT_BATCH = 100
+
+# (upper bound in bytes, color) of size colors
+SIZE_COLORS = (
+    (1024 ** 2, '#d9f0d3'),
+    (100 * 1024 ** 2, '#fff7bc'),
+    (10 * 1024 ** 3, '#fdae6b'),
+    (None, '#f768a1'),
+)
+
+
+def _postgresql(conn, schema, names):
+    query = text("""
+        SELECT c.relname, c.reltuples, pg_total_relation_size(c.oid)
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relkind IN ('r', 'p', 'm')
+    """)
+    result = {}
+    for name, rows, size in conn.execute(query, {'schema': schema}):
+        # reltuples is -1 (or 0 on old servers) for never analyzed tables
+        result[name] = {
+            'rows': int(rows) if rows is not None and rows >= 0 else None,
+            'size': size,
+        }
+    return result
+
+
+def _mysql(conn, schema, names):
+    query = text("""
+        SELECT table_name, table_rows, data_length + index_length
+        FROM information_schema.tables
+        WHERE table_schema = :schema
+    """)
+    return dict((name, {
+        'rows': rows,
+        'size': size
+    }) for name, rows, size in conn.execute(query, {'schema': schema}))
+
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _sqlite(conn, schema, names):
+    schema = schema or 'main'
+    prefix = '%s.' % _quote(conn, schema)
+    result = defaultdict(lambda: {'rows': None, 'size': None})
+
+    try:
+        # tables with their indexes, like pg_total_relation_size
+        query = text('SELECT m.tbl_name, SUM(d.pgsize) '
+                     'FROM dbstat(:schema) d '
+                     'JOIN %ssqlite_master m ON m.name = d.name '
+                     'GROUP BY m.tbl_name' % prefix)
+        for name, size in conn.execute(query, {'schema': schema}):
+            result[name]['size'] = size
+    except Exception:
+        # sqlite built without SQLITE_ENABLE_DBSTAT_VTAB
+        pass
+
+    try:
+        query = text('SELECT tbl, stat FROM %ssqlite_stat1' % prefix)
+        for name, stat in conn.execute(query):
+            rows = int(stat.split()[0])
+            result[name]['rows'] = max(rows, result[name]['rows'] or 0)
+    except Exception:
+        # ANALYZE was never run
+        pass
+
+    missing = [name for name in names if result[name]['rows'] is None]
+    for i in range(0, len(missing), COUNT_BATCH):
+        batch = missing[i:i + COUNT_BATCH]
+        query = text(' UNION ALL '.join(
+            'SELECT :name_%d, COUNT(*) FROM %s%s' % (j, prefix,
+                                                     _quote(conn, name))
+            for j, name in enumerate(batch)))
+        params = dict(('name_%d' % j, name) for j, name in enumerate(batch))
+        for name, rows in conn.execute(query, params):
+            result[name]['rows'] = rows
+
+    return dict(result)
+
+
+DIALECTS = {
+    'postgresql': _postgresql,
+    'mysql': _mysql,
+    'sqlite': _sqlite,
+}
+
+
+def table_stats(engine, tables):
+    """Fetch estimated row counts and sizes of tables
+
+    :param engine: engine of reflected tables
+    :param tables: list of ``sqlalchemy.Table``
+
+    Return dict of (schema, table name) and ``{'rows': .., 'size': ..}``,
+    where both values may be None if unknown. Tables of unsupported
+    dialects are missing.
+    """
+    fetch = DIALECTS.get(engine.dialect.name)
+    if fetch is None:
+        return {}
+
+    schemas = defaultdict(list)
+    for table in tables:
+        schemas[table.schema].append(table.name)
+
+    result = {}
+    with engine.connect() as conn:
+        for schema, names in schemas.items():
+            stats = fetch(conn, schema or conn.dialect.default_schema_name,
+                          names)
+            for name in names:
+                if name in stats:
+                    result[schema, name] = stats[name]
+
+    return result
+
+
+def size_color(size):
+    for bound, color in SIZE_COLORS:
+        if bound is None or size < bound:
+            return color
+
+
+def annotate(desc, stats, colors=False):
+    """Add ``rows`` and ``size`` of tables to ``describe()`` records
+
+    :param desc: result of sadisplay.describe function
+    :param stats: result of :func:`table_stats`
+    :param colors: also add ``color`` of table size for the renderers
+
+    Return new ``describe()`` result
+    """
+    objects, relations, inherits = desc
+
+    result = []
+    for cls in objects:
+        values = stats.get((cls.get('schema'), cls['name']))
+        if values:
+            cls = dict(cls, rows=values['rows'], size=values['size'])
+            if colors and values['size'] is not None:
+                cls['color'] = size_color(values['size'])
+        result.append(cls)
+
+    return result, relations, inherits
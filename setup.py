@@ -35,11 +35,13 @@ setup(
     platforms='any',
     install_requires=[
         'SQLAlchemy >= 0.5',
-        'jinja2'
+        'jinja2',
+        # concurrent.futures of python 2
+        'futures; python_version < "3"',
     ],
     entry_points={
         'console_scripts': [
-            'sadisplay = sadisplay.reflect:run',
+            'sadisplay = sadisplay.command:run',
         ],
     },
     classifiers=[
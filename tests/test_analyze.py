@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy import MetaData, Table, Column, ForeignKey, Integer
+
+import sadisplay
+import model
+
+from sadisplay import analyze
+
+
+def test_unindexed_foreign_keys():
+
+    desc = sadisplay.describe([model.User, model.Address, model.notes])
+
+    assert analyze.unindexed_foreign_keys(desc) == [{
+        'name': 'Address',
+        'schema': None,
+        'columns': ['user_id'],
+        'to': ['User'],
+    }, {
+        'name': 'notes',
+        'schema': None,
+        'columns': ['user_id'],
+        'to': ['User'],
+    }]
+
+    assert analyze.check(desc, ['unindexed-fks'])[0] == (
+        'unindexed-fks',
+        'Address.user_id -> User: foreign key without index', )
+
+
+def test_indexed_foreign_key():
+
+    objects, relations, inherits = sadisplay.describe(
+        [model.User, model.Address])
+    objects[1]['indexes'].append({
+        'name': 'ix_address_user',
+        'cols': ['user_id', 'id'],
+    })
+
+    desc = (objects, relations, inherits)
+    assert analyze.unindexed_foreign_keys(desc) == []
+
+
+def _with_constraints(indexes=(), **constraints):
+    objects, relations, inherits = sadisplay.describe(
+        [model.User, model.notes])
+    objects[1]['indexes'] = [{
+        'name': name,
+        'cols': cols
+    } for name, cols in indexes]
+    objects[1]['constraints'] = dict(objects[1]['constraints'],
+                                     **constraints)
+    return objects, relations, inherits
+
+
+def test_composite_foreign_keys():
+
+    # (user_id, name) references a composite key, indexed in other order
+    desc = _with_constraints(
+        indexes=[('ix_name_user', ['name', 'user_id', 'body'])],
+        fks=[['user_id', 'name']])
+    assert analyze.unindexed_foreign_keys(desc) == []
+
+    # only the first column leads the index
+    desc = _with_constraints(
+        indexes=[('ix_user', ['user_id', 'body'])],
+        fks=[['user_id', 'name']])
+    assert analyze.unindexed_foreign_keys(desc) == [{
+        'name': 'notes',
+        'schema': None,
+        'columns': ['user_id', 'name'],
+        'to': ['User'],
+    }]
+    assert analyze.check(desc, ['unindexed-fks'])[0][1] == \
+        'notes.(user_id, name) -> User: foreign key without index'
+
+
+def test_foreign_keys_of_primary_key_and_unique():
+
+    # not leading the composite primary key
+    desc = _with_constraints(pk=['id', 'user_id'])
+    assert [f['columns'] for f in analyze.unindexed_foreign_keys(desc)] \
+        == [['user_id']]
+
+    desc = _with_constraints(pk=['user_id', 'id'])
+    assert analyze.unindexed_foreign_keys(desc) == []
+
+    desc = _with_constraints(unique=[['user_id', 'name']])
+    assert analyze.unindexed_foreign_keys(desc) == []
+
+
+def test_unindexed_foreign_keys_of_schemas():
+
+    metadata = MetaData()
+    for schema in ('a', 'b'):
+        Table('users', metadata, Column('id', Integer, primary_key=True),
+              schema=schema)
+        Table('addresses', metadata,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer,
+                     ForeignKey('%s.users.id' % schema),
+                     index=schema == 'a'),
+              schema=schema)
+    desc = sadisplay.describe_metadata(metadata)
+
+    assert analyze.unindexed_foreign_keys(desc) == [{
+        'name': 'addresses',
+        'schema': 'b',
+        'columns': ['user_id'],
+        'to': ['users'],
+    }]
+
+    objects, relations, inherits = analyze.highlight(desc, ['unindexed-fks'])
+    assert [(r['from_schema'], r.get('unindexed', False))
+            for r in relations] == [('a', False), ('b', True)]
+
+
+def test_highlight_unindexed_foreign_keys():
+
+    desc = sadisplay.describe([model.User, model.Address])
+    highlighted = analyze.highlight(desc, ['unindexed-fks'])
+
+    assert highlighted[1][0]['unindexed'] is True
+    assert 'unindexed' not in desc[1][0]
+
+    assert 'Address <-[#red,bold]-o User: user_id' in \
+        sadisplay.plantuml(highlighted)
+    assert 'color="red"' in sadisplay.dot(highlighted)
+    assert 'color="red"' not in sadisplay.dot(desc)
+
+
+def _with_indexes(*indexes, **constraints):
+    objects, relations, inherits = sadisplay.describe([model.notes])
+    objects[0]['indexes'] = [{
+        'name': name,
+        'cols': cols
+    } for name, cols in indexes]
+    objects[0]['constraints'].update(constraints)
+    return objects, relations, inherits
+
+
+def test_redundant_indexes():
+
+    desc = _with_indexes(
+        ('ix_a', ['name']),
+        ('ix_b', ['name', 'body']),
+        ('ix_c', ['name', 'body']),
+        ('ix_d', ['id']),
+        ('ix_e', ['body']),
+        ('ix_f', []), )
+
+    findings = analyze.redundant_indexes(desc)
+    assert [(f['index'], f['kind'], f['of']) for f in findings] == [
+        ('ix_a', 'prefix', 'ix_b'),
+        ('ix_c', 'duplicate', 'ix_b'),
+        ('ix_d', 'primary-key', 'PRIMARY KEY'),
+    ]
+
+    assert analyze.check(desc, ['redundant-indexes'])[0] == (
+        'redundant-indexes',
+        'notes: index ix_a is a left prefix of ix_b', )
+
+
+def test_redundant_indexes_of_primary_key():
+
+    desc = _with_indexes(
+        ('ix_a', ['id']),
+        ('ix_b', ['id', 'user_id']),
+        ('ix_c', ['user_id', 'id']),
+        pk=['id', 'user_id'])
+
+    findings = analyze.redundant_indexes(desc)
+    assert [(f['index'], f['kind'], f['of']) for f in findings] == [
+        ('ix_a', 'prefix', 'PRIMARY KEY'),
+        ('ix_b', 'primary-key', 'PRIMARY KEY'),
+    ]
+
+
+def test_redundant_unique_indexes():
+
+    desc = _with_indexes(
+        ('ix_a', ['name']),
+        ('ux_a', ['name']),
+        ('ix_b', ['name', 'body']),
+        ('ux_c', ['id']), )
+    for index in desc[0][0]['indexes']:
+        if index['name'].startswith('ux'):
+            index['unique'] = True
+
+    findings = analyze.redundant_indexes(desc)
+    assert [(f['index'], f['kind'], f['of']) for f in findings] == [
+        ('ix_a', 'duplicate', 'ux_a'),
+        ('ux_c', 'primary-key', 'PRIMARY KEY'),
+    ]
+
+
+def test_highlight_redundant_indexes():
+
+    desc = _with_indexes(('ix_a', ['name']), ('ix_b', ['name', 'body']))
+    highlighted = analyze.highlight(desc, ['redundant-indexes'])
+
+    assert highlighted[0][0]['indexes'][0]['redundant'] == 'prefix of ix_b'
+    assert 'redundant' not in highlighted[0][0]['indexes'][1]
+    assert u'ix_a ✗ prefix of ix_b' in sadisplay.plantuml(highlighted)
+    assert u'✗' not in sadisplay.plantuml(desc)
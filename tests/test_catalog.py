@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import pytest
+from sqlalchemy import create_engine, MetaData
+
+import sadisplay
+import model
+
+from sadisplay import catalog, reflect
+
+
+def _engine(path):
+    engine = create_engine('sqlite:///%s' % path)
+    model.BASE.metadata.create_all(engine)
+    with engine.connect() as conn:
+        conn.execute('CREATE TABLE pairs (a INTEGER, b VARCHAR(10) '
+                     'DEFAULT \'x\', n NUMERIC(10, 2), PRIMARY KEY (b, a))')
+        conn.execute('CREATE TABLE refs (id INTEGER PRIMARY KEY '
+                     'AUTOINCREMENT, a INT, b TEXT, note_id INTEGER '
+                     'REFERENCES notes, FOREIGN KEY (b, a) REFERENCES '
+                     'pairs (b, a))')
+        conn.execute('CREATE UNIQUE INDEX ux_refs ON refs (note_id, b)')
+        # lowercase types, reflected like their uppercase names
+        conn.execute('create table lower (id integer primary key, '
+                     'at datetime, flag boolean, code varchar(10), '
+                     'total numeric(10, 2), doubled integer generated '
+                     'always as (id * 2))')
+    return engine
+
+
+def _describe(meta):
+    return sadisplay.describe([
+        meta.tables[key] for key in sorted(meta.tables)
+        if 'sqlite_' not in key
+    ])
+
+
+@pytest.mark.parametrize('schema', [None, 'main'])
+def test_reflect(tmpdir, schema):
+
+    engine = _engine(tmpdir.join('db.sqlite'))
+    assert catalog.supported(engine.dialect)
+
+    generic = MetaData()
+    generic.reflect(bind=engine, schema=schema)
+
+    meta = MetaData()
+    with engine.connect() as conn:
+        names = catalog.reflect(conn, meta, schema)
+
+    # without sqlite_sequence
+    assert 'sqlite_sequence' not in names
+    assert _describe(meta) == _describe(generic)
+
+    lower, = [o for o in _describe(meta)[0] if o['name'] == 'lower']
+    assert lower['cols'] == [
+        ('INTEGER', 'id', 'pk'),
+        ('DATETIME', 'at', None),
+        ('VARCHAR(10)', 'code', None),
+        ('INTEGER', 'doubled', None),
+        ('BOOLEAN', 'flag', None),
+        ('NUMERIC(10, 2)', 'total', None),
+    ]
+
+
+def test_reflect_only(tmpdir):
+
+    engine = _engine(tmpdir.join('db.sqlite'))
+
+    meta = MetaData()
+    with engine.connect() as conn:
+        # with referenced tables
+        assert sorted(catalog.reflect(conn, meta, only=['refs'])) == \
+            ['notes', 'pairs', 'refs', 'user_table']
+        # tables already in meta are kept
+        assert catalog.reflect(conn, meta, only=['refs']) == []
+
+
+def test_reflect_database(tmpdir):
+
+    engine = _engine(tmpdir.join('db.sqlite'))
+    database = {
+        'url': str(engine.url),
+        'schema': 'main',
+        'seed': None,
+    }
+
+    engine, fast = reflect.reflect(database)
+    engine, generic = reflect.reflect(dict(database, catalog=False))
+
+    assert set(generic.tables) - set(fast.tables) == \
+        set(['main.sqlite_sequence'])
+    assert _describe(fast) == _describe(generic)
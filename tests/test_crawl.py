@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pytest
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, \
+    ForeignKey
+
+import sadisplay
+
+from sadisplay import crawl
+
+
+def _engine():
+    engine = create_engine('sqlite://')
+    meta = MetaData()
+    Table('a', meta, Column('id', Integer, primary_key=True))
+    Table('b', meta, Column('id', Integer, primary_key=True),
+          Column('a_id', Integer, ForeignKey('a.id')))
+    Table('c', meta, Column('id', Integer, primary_key=True),
+          Column('b_id', Integer, ForeignKey('b.id')))
+    Table('d', meta, Column('id', Integer, primary_key=True),
+          Column('c_id', Integer, ForeignKey('c.id')))
+    Table('x', meta, Column('id', Integer, primary_key=True))
+    meta.create_all(engine)
+    return engine
+
+
+@pytest.mark.parametrize('seeds, depth, direction, expected', [
+    (['b'], 1, 'out', ['a', 'b']),
+    (['b'], 0, 'out', ['b']),
+    (['b'], 1, 'in', ['b', 'c']),
+    (['b'], 2, 'both', ['a', 'b', 'c', 'd']),
+    (['c', 'missing'], 5, 'out', ['a', 'b', 'c']),
+    (['main.d'], 1, 'out', ['main.c', 'main.d']),
+])
+def test_crawl(seeds, depth, direction, expected):
+
+    meta = MetaData()
+    reached = crawl.crawl(
+        _engine(), meta, seeds, [None], depth=depth, direction=direction)
+
+    assert sorted(meta.tables) == expected
+    assert len(reached) == len(expected)
+
+
+def test_crawl_describe_boundary():
+
+    meta = MetaData()
+    crawl.crawl(_engine(), meta, ['c'], [None], depth=0)
+
+    # foreign key to the not reflected table b
+    objects, relations, inherits = sadisplay.describe(
+        list(meta.tables.values()))
+    assert [o['name'] for o in objects] == ['c']
+    assert relations == []
+
+
+def test_referencing_tables():
+
+    engine = _engine()
+    with engine.connect() as conn:
+        assert crawl.referencing_tables(conn, set([(None, 'b')])) == \
+            set([(None, 'c')])
+        assert crawl.referencing_tables(conn, set([('main', 'a')])) == \
+            set([('main', 'b')])
+
+
+def test_referenced_tables():
+
+    meta = MetaData()
+    table = Table('t', meta, Column('id', Integer, primary_key=True),
+                  Column('a_id', Integer, ForeignKey('a.id')),
+                  Column('b_id', Integer, ForeignKey('other.b.id')),
+                  schema='other')
+
+    # unqualified targets are in the default schema
+    assert crawl.referenced_tables(table) == \
+        set([(None, 'a'), ('other', 'b')])
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+import sadisplay
+import model
+
+from sadisplay import desc as description
+from sadisplay.desc import merge
+
+
+def _desc():
+    desc = sadisplay.describe([getattr(model, attr) for attr in dir(model)])
+    desc = merge([('one', desc), ('two', desc)])
+    desc[0][0].update(rows=10, size=4096, color='#d9f0d3')
+    cls = [c for c in desc[0] if c['indexes']][0]
+    cls['indexes'] = [dict(cls['indexes'][0], redundant='prefix of other')]
+    desc[1][0]['unindexed'] = True
+    return desc
+
+
+def test_dumps_loads():
+
+    desc = _desc()
+    data = description.dumps(desc)
+
+    assert description.loads(data) == desc
+    # names are stored once
+    assert data.count('"user_id"') == 1
+
+    desc[1][0]['to_schema'] = 'auth'
+    data = description.dumps(desc)
+    assert description.loads(data) == desc
+    assert data.count('"auth"') == 1
+
+
+def test_loads_version():
+
+    doc = json.loads(description.dumps(_desc()))
+    doc['version'] += 1
+
+    with pytest.raises(ValueError):
+        description.loads(json.dumps(doc))
+
+    with pytest.raises(ValueError):
+        description.loads('{"classes": []}')
+
+
+def test_render_command(tmpdir):
+
+    desc = _desc()
+    path = str(tmpdir.join('desc.json'))
+    description.save(desc, path)
+
+    code = ('import sys\n'
+            'from sadisplay.command import run\n'
+            'run(sys.argv[1:])\n'
+            'assert "sqlalchemy" not in sys.modules\n')
+    output = subprocess.check_output(
+        [sys.executable, '-c', code, 'render', '--from', path,
+         '-r', 'plantuml'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    assert output.decode('utf-8').strip() == sadisplay.plantuml(desc).strip()
@@ -1,10 +1,30 @@
 # -*- coding: utf-8 -*-
+import inspect
+
 import pytest
+from sqlalchemy import MetaData, Table, Column, ForeignKey, Integer, \
+    Unicode
+from sqlalchemy.dialects import mssql
 
 import sadisplay
 import model
 
-from sadisplay.describe import SQLALCHEMY_VERSION
+from sadisplay.describer import SQLALCHEMY_VERSION, TypeStringCache, \
+    Describer
+from sadisplay.desc import split_schemas, merge, overview
+
+
+def test_describe_function():
+    import sadisplay.describer
+    from sadisplay.describe import Describer as _Describer
+
+    # not shadowed by the module of the same name
+    assert inspect.isfunction(sadisplay.describe)
+    assert _Describer is sadisplay.describer.Describer
+    assert isinstance(sadisplay.Describer(), _Describer)
+    assert sadisplay.describe.__doc__
+    assert sadisplay.describe([model.notes]) == \
+        sadisplay.describer.describe([model.notes])
 
 
 def test_single_mapper():
@@ -17,6 +37,7 @@ def test_single_mapper():
     assert objects[0] == {
         'name':
         model.User.__name__,
+        'schema': None,
         'cols': [
             ('INTEGER', 'id', 'pk'),
             ('VARCHAR(50)', 'name', None),
@@ -25,6 +46,11 @@ def test_single_mapper():
             'cols': ['name', 'department'],
             'name': 'ix_username_department',
         }],
+        'constraints': {
+            'pk': ['id'],
+            'unique': [['name']],
+            'fks': [['manager_id']],
+        },
         'props': [
             'address',
             'books',
@@ -45,6 +71,7 @@ def test_single_table():
     assert objects[0] == {
         'name':
         model.notes.name,
+        'schema': None,
         'cols': [
             ('INTEGER', 'id', 'pk'),
             ('INTEGER', 'user_id', 'fk'),
@@ -58,6 +85,11 @@ def test_single_table():
             'cols': ['name'],
             'name': 'ix_notes_name'
         }],
+        'constraints': {
+            'pk': ['id'],
+            'unique': [],
+            'fks': [['user_id']],
+        },
         'props': [],
         'methods': [],
     }
@@ -74,6 +106,7 @@ def test_inherits():
     assert objects[1] == {
         'name':
         model.Admin.__name__,
+        'schema': None,
         'cols': [
             ('INTEGER', 'id', 'pk'),
             ('VARCHAR(50)', 'name', None),
@@ -83,6 +116,11 @@ def test_inherits():
             'cols': ['name', 'department'],
             'name': 'ix_username_department',
         }],
+        'constraints': {
+            'pk': ['id'],
+            'unique': [['name']],
+            'fks': [['manager_id']],
+        },
         'props': [
             'address',
             'books',
@@ -106,11 +144,17 @@ def test_relation():
     assert len(objects) == 2
     assert objects[1] == {
         'name': model.Address.__name__,
+        'schema': None,
         'cols': [
             ('INTEGER', 'id', 'pk'),
             ('INTEGER', 'user_id', 'fk'),
         ],
         'indexes': [],
+        'constraints': {
+            'pk': ['id'],
+            'unique': [],
+            'fks': [['user_id']],
+        },
         'props': ['user'],
         'methods': [],
     }
@@ -118,8 +162,11 @@ def test_relation():
     assert len(inherits) == 0
     assert relations[0] == {
         'from': model.Address.__name__,
+        'from_schema': None,
         'to': model.User.__name__,
+        'to_schema': None,
         'by': 'user_id',
+        'to_col': 'id',
     }
 
 
@@ -132,6 +179,7 @@ def test_table():
     assert objects[0] == {
         'name':
         model.Book.__name__,
+        'schema': None,
         'cols': [
             ('INTEGER', 'id', 'pk'),
             ('INTEGER', 'user_id', 'fk'),
@@ -141,6 +189,11 @@ def test_table():
             'cols': ['title'],
             'name': 'ix_books_title',
         }],
+        'constraints': {
+            'pk': ['id'],
+            'unique': [],
+            'fks': [['user_id']],
+        },
         'props': ['user'],
         'methods': [],
     }
@@ -152,6 +205,7 @@ def test_table():
     assert objects[0] == {
         'name':
         model.Book.__name__,
+        'schema': None,
         'cols': [
             ('INTEGER', 'id', 'pk'),
             ('INTEGER', 'user_id', 'fk'),
@@ -161,6 +215,11 @@ def test_table():
             'cols': ['title'],
             'name': 'ix_books_title',
         }],
+        'constraints': {
+            'pk': ['id'],
+            'unique': [],
+            'fks': [['user_id']],
+        },
         'props': ['user'],
         'methods': [],
     }
@@ -172,6 +231,7 @@ def test_table():
     assert objects[0] == {
         'name':
         model.books.name,
+        'schema': None,
         'cols': [
             ('INTEGER', 'id', 'pk'),
             ('INTEGER', 'user_id', 'fk'),
@@ -181,6 +241,11 @@ def test_table():
             'cols': ['title'],
             'name': 'ix_books_title',
         }],
+        'constraints': {
+            'pk': ['id'],
+            'unique': [],
+            'fks': [['user_id']],
+        },
         'props': [],
         'methods': [],
     }
@@ -195,6 +260,7 @@ def test_column_property():
     assert objects[0] == {
         'name':
         model.Employee.__name__,
+        'schema': None,
         'cols': [
             ('INTEGER', 'id', 'pk'),
             ('INTEGER', 'manager_id', 'fk'),
@@ -205,6 +271,11 @@ def test_column_property():
             'cols': ['name', 'department'],
             'name': 'ix_username_department',
         }],
+        'constraints': {
+            'pk': ['id'],
+            'unique': [['name']],
+            'fks': [['manager_id']],
+        },
         'props': ['address', 'books', 'department'],
         'methods': [],
     }
@@ -221,11 +292,214 @@ def test_json_column():
         assert len(objects) == 1
         assert objects[0] == {
             'name': getattr(target, 'name', None) or target.__name__,
+            'schema': None,
             'cols': [
                 ('INTEGER', 'id', 'pk'),
                 ('JSON', 'data', None),
             ],
             'indexes': [],
+            'constraints': {
+                'pk': ['id'],
+                'unique': [],
+                'fks': [],
+            },
             'props': [],
             'methods': [],
         }
+
+
+def test_describe_registry():
+
+    desc = sadisplay.describe_registry(model.BASE)
+
+    classes = [
+        getattr(model, attr) for attr in sorted(dir(model))
+        if hasattr(getattr(model, attr), '__mapper__')
+        and issubclass(getattr(model, attr), model.BASE)
+    ]
+    assert desc == sadisplay.describe(classes)
+
+    objects, relations, inherits = desc
+    assert [o['name'] for o in objects] == [c.__name__ for c in classes]
+    assert len(inherits) == 3
+
+
+def test_describe_metadata():
+
+    metadata = model.BASE.metadata
+    objects, relations, inherits = sadisplay.describe_metadata(metadata)
+
+    assert [o['name'] for o in objects] == \
+        [t.name for t in metadata.sorted_tables]
+    assert inherits == []
+    assert sorted(r['from'] for r in relations) == [
+        'address_table',
+        'books',
+        'notes',
+        'user_table',
+    ]
+
+
+def test_split_schemas():
+
+    desc = sadisplay.describe([model.User, model.Address])
+    desc[0][1]['schema'] = 'other'
+
+    parts = split_schemas(desc)
+
+    assert [schema for schema, part in parts] == ['default', 'other']
+    assert [o['name'] for o in parts[0][1][0]] == ['User']
+    assert [o['name'] for o in parts[1][1][0]] == ['Address']
+    assert parts[0][1][1] == parts[1][1][1] == []
+
+
+def _same_names():
+    metadata = MetaData()
+    for schema in ('a', 'b'):
+        Table('users', metadata, Column('id', Integer, primary_key=True),
+              schema=schema)
+        Table('addresses', metadata,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer,
+                     ForeignKey('%s.users.id' % schema)),
+              schema=schema)
+    Table('orders', metadata, Column('id', Integer, primary_key=True),
+          Column('user_id', Integer, ForeignKey('a.users.id')),
+          schema='b')
+    return sadisplay.describe_metadata(metadata)
+
+
+def test_split_schemas_same_names():
+
+    parts = dict(split_schemas(_same_names()))
+
+    assert sorted(parts) == ['a', 'b']
+    for schema in ('a', 'b'):
+        objects, relations, inherits = parts[schema]
+        assert [(r['from_schema'], r['from'], r['to_schema'], r['to'])
+                for r in relations] == [
+                    (schema, 'addresses', schema, 'users')]
+    assert sorted(o['name'] for o in parts['b'][0]) == \
+        ['addresses', 'orders', 'users']
+
+
+def test_overview_same_names():
+
+    summary = overview(_same_names())
+
+    assert [(s['name'], s['tables'], s['relations'])
+            for s in summary['schemas']] == [('a', 2, 1), ('b', 3, 1)]
+    assert summary['relations'] == [{'from': 'b', 'to': 'a', 'count': 1}]
+
+
+def test_type_string_cache(monkeypatch):
+
+    compiled = []
+    cache = TypeStringCache()
+    compile = cache.compile
+
+    def _compile(type_):
+        compiled.append(type_)
+        return compile(type_)
+
+    monkeypatch.setattr(cache, 'compile', _compile)
+
+    assert cache(Unicode(50)) == 'VARCHAR(50)'
+    assert cache(Unicode(50)) == 'VARCHAR(50)'
+    assert cache(Unicode(20)) == 'VARCHAR(20)'
+    assert cache(Integer()) == 'INTEGER'
+    assert len(compiled) == 3
+
+
+def test_type_string_cache_dialect():
+
+    cache = TypeStringCache(dialect=mssql.dialect())
+    assert cache(Unicode(50)) == 'NVARCHAR(50)'
+
+
+def test_merge():
+
+    desc = merge([
+        ('one', sadisplay.describe([model.User, model.Address])),
+        ('two', sadisplay.describe([model.User, model.notes])),
+    ])
+    objects, relations, inherits = desc
+
+    assert [(o['database'], o['name']) for o in objects] == [
+        ('one', 'one.User'),
+        ('one', 'Address'),
+        ('two', 'two.User'),
+        ('two', 'notes'),
+    ]
+    assert [(r['from'], r['to']) for r in relations] == [
+        ('Address', 'one.User'),
+        ('notes', 'two.User'),
+    ]
+
+
+def test_overview():
+
+    desc = sadisplay.describe([model.User, model.Address, model.notes])
+    desc[0][0]['schema'] = 'auth'
+    for rel in desc[1]:
+        rel['to_schema'] = 'auth'
+
+    assert overview(desc) == {
+        'schemas': [{
+            'name': 'auth',
+            'tables': 1,
+            'columns': 2,
+            'indexes': 1,
+            'relations': 0,
+        }, {
+            'name': 'default',
+            'tables': 2,
+            'columns': 6,
+            'indexes': 2,
+            'relations': 0,
+        }],
+        'relations': [{
+            'from': 'default',
+            'to': 'auth',
+            'count': 2,
+        }],
+    }
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_describer_parallel(executor):
+
+    items = [getattr(model, attr) for attr in dir(model)]
+    serial = sadisplay.describe(items)
+
+    describer = Describer(workers=3, executor=executor, partition_size=2)
+    assert describer(items) == serial
+
+
+def test_describer_process_fallback(monkeypatch):
+    from sadisplay import describer as module
+
+    # no fork context or python < 3.7
+    monkeypatch.setattr(module, '_fork_context', lambda: None)
+
+    items = [getattr(model, attr) for attr in dir(model)]
+    describer = Describer(workers=3, executor='process', partition_size=2)
+    assert describer(items) == sadisplay.describe(items)
+
+
+def test_describer_concurrent_calls():
+    from concurrent.futures import ThreadPoolExecutor
+
+    items = [getattr(model, attr) for attr in dir(model)]
+    serial = sadisplay.describe(items)
+
+    describer = Describer(workers=2, partition_size=3)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: describer(items), range(8)))
+
+    assert all(result == serial for result in results)
+
+
+def test_describer_unknown_executor():
+    with pytest.raises(ValueError):
+        Describer(executor='fiber')
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import time
+from optparse import OptionParser
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.dialects import postgresql, mysql
+
+import sadisplay
+import model
+
+from sadisplay import gentle, reflect
+
+
+def _options(argv):
+    parser = OptionParser()
+    reflect.add_database_options(parser)
+    return parser.parse_args(argv)[0]
+
+
+def test_settings():
+
+    assert gentle.settings(_options(['-u', 'sqlite://'])) is None
+    assert gentle.settings(_options(['--gentle'])) == gentle.DEFAULTS
+
+    settings = gentle.settings(_options(['--lock-timeout', '0.5']))
+    assert settings['lock_timeout'] == 0.5
+    assert settings['retries'] == gentle.DEFAULTS['retries']
+
+
+def test_session_statements():
+
+    settings = dict(gentle.DEFAULTS, statement_timeout=10, lock_timeout=0.5)
+
+    assert gentle.session_statements(postgresql.dialect(), settings) == [
+        'SET statement_timeout = 10000',
+        'SET lock_timeout = 500',
+        'SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY',
+    ]
+
+    statements = gentle.session_statements(mysql.dialect(), settings)
+    assert 'SET SESSION max_execution_time = 10000' in statements
+    # whole seconds
+    assert 'SET SESSION lock_wait_timeout = 1' in statements
+
+
+def test_create_engine(tmpdir):
+
+    engine = gentle.create_engine('sqlite:///%s' % tmpdir.join('db.sqlite'),
+                                  gentle.DEFAULTS)
+
+    with engine.connect() as conn:
+        assert conn.execute('PRAGMA query_only').scalar() == 1
+        assert conn.execute('PRAGMA busy_timeout').scalar() == 2000
+        with pytest.raises(exc.OperationalError):
+            conn.execute('CREATE TABLE t (id INTEGER)')
+
+
+def test_rate_limit():
+
+    limit = gentle.RateLimit(50)
+
+    started = time.time()
+    for i in range(5):
+        limit.wait()
+
+    assert time.time() - started >= 0.08
+
+
+def test_retry(monkeypatch):
+
+    delays = []
+    monkeypatch.setattr(gentle.time, 'sleep', delays.append)
+
+    calls = []
+
+    def _locked():
+        calls.append(1)
+        if len(calls) < 3:
+            raise exc.OperationalError('SELECT', {},
+                                       Exception('database is locked'))
+        return 'done'
+
+    assert gentle.retry(_locked, gentle.DEFAULTS) == 'done'
+    assert delays == [1.0, 2.0]
+
+    # other errors and exhausted retries are raised
+    def _failed():
+        raise exc.OperationalError('SELECT', {}, Exception('no such table'))
+
+    with pytest.raises(exc.OperationalError):
+        gentle.retry(_failed, gentle.DEFAULTS)
+
+    del calls[:]
+    with pytest.raises(exc.OperationalError):
+        gentle.retry(_locked, dict(gentle.DEFAULTS, retries=1))
+
+
+def test_reflect_gentle(tmpdir):
+
+    url = 'sqlite:///%s' % tmpdir.join('db.sqlite')
+    reflect.create_engine(url).execute('CREATE TABLE t (id INTEGER)')
+    model.BASE.metadata.create_all(reflect.create_engine(url))
+
+    options = _options(['-u', url, '-s', 'main', '--gentle',
+                        '--max-queries', '1000'])
+    database, = reflect.databases(options)
+
+    engine, meta = reflect.reflect(database)
+    engine, generic = reflect.reflect(dict(database, gentle=None))
+
+    assert sorted(meta.tables) == sorted(generic.tables)
+    assert sadisplay.describe(list(meta.tables.values())) == \
+        sadisplay.describe(list(generic.tables.values()))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from sadisplay import image
+
+
+def test_command():
+
+    assert image.command('dot', 'svg') == ['dot', '-Tsvg']
+    assert image.command('plantuml', 'png', plantuml_jar='p.jar')[-3:] == \
+        ['p.jar', '-tpng', '-pipe']
+
+    with pytest.raises(ValueError):
+        image.command('dot', 'gif')
+
+
+def test_generate_many(monkeypatch):
+
+    monkeypatch.setattr(image, 'command',
+                        lambda render, image_type, plantuml_jar=None: {
+                            'dot': ['cat'],
+                            'plantuml': ['false'],
+                        }[render])
+
+    results = image.generate_many(
+        [('a', 'dot', u'digraph a {}'), ('b', 'plantuml', u'@startuml')],
+        'svg',
+        workers=2,
+        timeout=10, )
+
+    assert [r['name'] for r in results] == ['a', 'b']
+    assert results[0]['image'] == b'digraph a {}'
+    assert results[0]['error'] is None
+    assert results[1]['image'] is None
+    assert 'exited with 1' in results[1]['error']
+    assert all(r['seconds'] >= 0 for r in results)
+
+
+@pytest.mark.parametrize('timeout_expired', [True, False])
+def test_generate_timeout(monkeypatch, timeout_expired):
+
+    monkeypatch.setattr(image, 'command',
+                        lambda render, image_type, plantuml_jar=None:
+                        ['sleep', '5'])
+    if not timeout_expired:
+        # python 2
+        monkeypatch.setattr(image, 'TimeoutExpired', None)
+
+    with pytest.raises(image.ImageError) as e:
+        image.generate(u'digraph a {}', 'dot', 'svg', timeout=0.2)
+
+    assert 'timed out' in str(e.value)
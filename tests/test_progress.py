@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import io
+import threading
+
+import sadisplay
+import model
+
+from sadisplay import render
+from sadisplay.progress import Progress, StderrDisplay
+from sadisplay.describer import Describer
+
+
+class _Steps(Progress):
+    """Budget spent after some steps of the current stage"""
+
+    def __init__(self, steps, **kwargs):
+        Progress.__init__(self, time_budget=1, **kwargs)
+        self.steps = steps
+
+    def expired(self):
+        return self.done >= self.steps
+
+
+ITEMS = [model.User, model.Address, model.Book, model.notes]
+
+
+def test_progress_callback():
+
+    calls = []
+    progress = Progress(callback=lambda *args: calls.append(args))
+    desc = sadisplay.describe(ITEMS, progress=progress)
+
+    assert desc == sadisplay.describe(ITEMS)
+    assert calls[0] == ('describe', 0, 4, None)
+    assert calls[-1] == ('describe', 4, 4, None)
+    assert not progress.expired()
+    assert progress.summary() == []
+
+
+def test_describe_time_budget():
+
+    progress = _Steps(2)
+    objects, relations, inherits = sadisplay.describe(
+        ITEMS, progress=progress)
+
+    assert [o['name'] for o in objects] == ['User', 'Address']
+    assert all(r['to'] in ('User', 'Address') for r in relations)
+    assert progress.skipped == {'describe': ['Book', 'notes']}
+    assert progress.summary() == ['describe: skipped 2 (Book, notes)']
+
+
+def test_describe_time_budget_parallel():
+
+    progress = _Steps(0)
+    desc = Describer(workers=2, partition_size=1)(ITEMS, progress=progress)
+
+    assert desc == ([], [], [])
+    assert len(progress.skipped['describe']) == 4
+
+
+def test_cancel():
+
+    progress = Progress()
+    assert not progress.expired()
+
+    worker = threading.Thread(target=progress.cancel)
+    worker.start()
+    worker.join()
+
+    assert progress.cancelled()
+    assert progress.expired()
+    objects, relations, inherits = sadisplay.describe(
+        ITEMS, progress=progress)
+    assert objects == []
+    assert progress.skipped == {'describe': ['User', 'Address', 'Book',
+                                             'notes']}
+
+
+def test_render_time_budget():
+
+    desc = sadisplay.describe(ITEMS)
+    progress = _Steps(1)
+    result = render.multi(desc, ['dot', 'plantuml'], progress=progress)
+
+    assert 'User' in result['plantuml']
+    assert 'Address' not in result['plantuml']
+    assert '->' not in result['dot'].split('arrowtail')[-1]
+    assert progress.skipped['render'] == ['Address', 'Book', 'notes']
+
+
+def test_stderr_display():
+
+    stream = io.StringIO()
+    display = StderrDisplay(stream=stream, interval=0)
+    progress = Progress(callback=display)
+
+    progress.start('render', 2)
+    progress.advance()
+    progress.advance()
+    display.finish()
+
+    assert stream.getvalue().split('\r')[-1].rstrip() == 'render: 2/2'
+    assert 'render: 1/2 ETA' in stream.getvalue()
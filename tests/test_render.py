@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import sadisplay
+import model
+
+from sadisplay import render
+from sadisplay.desc import merge, overview
+
+from sadisplay.cache import FragmentCache
+
+
+def _desc():
+    return sadisplay.describe([model.User, model.Address, model.notes])
+
+
+def test_cache_output_identical():
+
+    desc = _desc()
+    cache = FragmentCache()
+
+    for func in (sadisplay.dot, sadisplay.plantuml):
+        expected = func(desc)
+        assert func(desc, cache=cache) == expected
+        assert func(desc, cache=cache) == expected
+
+    assert cache.misses == 6
+    assert cache.hits == 6
+
+
+def test_cache_changed_class():
+
+    objects, relations, inherits = _desc()
+    cache = FragmentCache()
+    sadisplay.plantuml((objects, relations, inherits), cache=cache)
+
+    objects[0] = dict(objects[0], cols=objects[0]['cols'][:1])
+    result = sadisplay.plantuml((objects, relations, inherits), cache=cache)
+
+    assert cache.misses == 4
+    assert cache.hits == 2
+    assert result == sadisplay.plantuml((objects, relations, inherits))
+
+
+def test_cache_lru():
+
+    cache = FragmentCache(maxsize=2)
+    cache.set('a', u'1')
+    cache.set('b', u'2')
+    assert cache.get('a') == u'1'
+    cache.set('c', u'3')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == u'1'
+    assert len(cache) == 2
+
+
+def test_cache_directory(tmpdir):
+
+    desc = _desc()
+    expected = sadisplay.dot(desc)
+    sadisplay.dot(desc, cache=FragmentCache(directory=str(tmpdir)))
+
+    cache = FragmentCache(directory=str(tmpdir))
+    assert sadisplay.dot(desc, cache=cache) == expected
+    assert cache.misses == 0
+    assert cache.hits == 3
+
+
+def test_multi():
+
+    desc = _desc()
+    result = render.multi(desc, ['dot', 'plantuml'])
+
+    assert result == {
+        'dot': sadisplay.dot(desc),
+        'plantuml': sadisplay.plantuml(desc),
+    }
+
+    with pytest.raises(ValueError):
+        render.multi(desc, ['svg'])
+
+
+def test_multi_formats_once(monkeypatch):
+
+    calls = []
+    format_class = render.format_class
+
+    def _format_class(cls):
+        calls.append(cls['name'])
+        return format_class(cls)
+
+    monkeypatch.setattr(render, 'format_class', _format_class)
+    render.multi(_desc(), ['dot', 'plantuml'])
+
+    assert calls == ['User', 'Address', 'notes']
+
+
+def test_merged_databases():
+
+    desc = merge([
+        ('one', sadisplay.describe([model.User, model.Address])),
+        ('two', sadisplay.describe([model.User])),
+    ])
+
+    result = sadisplay.plantuml(desc)
+    assert 'package one <<Database>> {\nClass one.User {' in result
+    assert 'Address <--o one.User: user_id' in result
+
+    result = sadisplay.dot(desc)
+    assert 'label = "one";' in result
+    assert 'label = "two";' in result
+    assert 'Address:user_id_out:e -> "one.User":id_in:w' in result
+
+
+def test_dot_id():
+
+    assert render.dot_id('user_table') == 'user_table'
+    assert render.dot_id('my table') == '"my table"'
+    assert render.dot_id('1st') == '"1st"'
+
+
+def test_dot_large():
+
+    objects, relations, inherits = _desc()
+    relations = relations + [dict(relations[0], by='other_id')]
+    desc = (objects, relations, inherits)
+
+    result = render.dot_large(desc)
+    assert 'layout=sfdp' in result
+    assert 'concentrate' not in result
+    assert 'Address [label="{Address|■\\ id\\l□\\ user_id\\l}"]' in result
+    assert 'notes [label="{notes|■\\ id\\l□\\ user_id\\l}"]' in result
+    assert 'Address -> User [weight=2 penwidth=2 label="2"]' in result
+    assert 'notes -> User\n' in result
+
+    result = render.dot_large(desc, columns='none')
+    assert 'User [label="{User}"]' in result
+
+    result = render.dot_large(desc, columns='all')
+    assert 'User [label="{User|■\\ id\\l\\ \\ name\\l}"]' in result
+
+
+def test_dot_large_cache_options():
+
+    desc = _desc()
+    cache = FragmentCache()
+    keys = render.dot_large(desc, cache=cache)
+
+    assert render.dot_large(desc, columns='none', cache=cache) != keys
+    assert render.dot_large(desc, cache=cache) == keys
+    assert cache.misses == 6
+
+
+def test_dot_large_schemas():
+
+    objects, relations, inherits = _desc()
+    other = [dict(cls, schema='b') for cls in objects]
+    relations = relations + [dict(rel, from_schema='b', to_schema='b')
+                             for rel in relations]
+    desc = (objects + other, relations, inherits)
+
+    result = render.dot_large(desc, columns='none')
+    assert 'User [label="{User}"]' in result
+    assert '"b.User" [label="{b.User}"]' in result
+    assert 'Address -> User\n' in result
+    assert '"b.Address" -> "b.User"\n' in result
+    assert 'weight' not in result
+
+
+def test_overview():
+
+    desc = _desc()
+    desc[0][0]['schema'] = 'auth'
+    for rel in desc[1]:
+        if rel['to'] == desc[0][0]['name']:
+            rel['to_schema'] = 'auth'
+    summary = overview(desc)
+
+    result = render.overview_dot(summary, link='{schema}.svg')
+    assert 'auth [label="auth\\n1 tables, 2 columns, 1 indexes" ' \
+        'URL="auth.svg"]' in result
+    assert 'default -> auth [label="2" weight=2]' in result
+
+    result = render.overview_plantuml(summary)
+    assert 'rectangle "default\\n2 tables, 6 columns, 2 indexes" as s1' \
+        in result
+    assert 's1 --> s0: 2' in result
+
+    result = render.overview_json(summary, link='{schema}.dot')
+    assert '"link": "auth.dot"' in result
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+try:
+    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, Request, HTTPError
+
+import pytest
+
+import sadisplay
+import model
+
+from sadisplay.serve import Diagrams, DiagramServer
+
+
+@pytest.fixture
+def server():
+    loads = []
+
+    def load():
+        loads.append(1)
+        return sadisplay.describe(
+            [model.User, model.Address, model.Book, model.notes])
+
+    diagrams = Diagrams(load)
+    server = DiagramServer(('127.0.0.1', 0), diagrams)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    server.url = 'http://127.0.0.1:%s' % server.server_address[1]
+    server.loads = loads
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url, etag=None):
+    request = Request(url)
+    if etag:
+        request.add_header('If-None-Match', etag)
+    try:
+        response = urlopen(request)
+    except HTTPError as e:
+        return e.code, e.headers, b''
+    return response.getcode(), response.headers, response.read()
+
+
+def test_diagram_etag(server):
+
+    code, headers, body = _get(server.url + '/diagram.dot')
+    assert code == 200
+    assert body.decode('utf-8') == server.diagrams.diagram(fmt='dot')[0]
+
+    code, headers, body = _get(server.url + '/diagram.dot',
+                               etag=headers['ETag'])
+    assert code == 304
+    assert server.loads == [1]
+
+
+def test_schema_and_focus(server):
+
+    code, headers, body = _get(server.url + '/schemas/default.plantuml')
+    assert code == 200
+    assert body.startswith(b'@startuml')
+
+    code, headers, body = _get(server.url +
+                               '/diagram.json?focus=Address&depth=1')
+    assert code == 200
+    desc = json.loads(body.decode('utf-8'))
+    assert sorted(c['name'] for c in desc['classes']) == ['Address', 'User']
+
+    assert _get(server.url + '/schemas/missing.dot')[0] == 404
+    assert _get(server.url + '/diagram.svg')[0] == 404
+
+
+def test_reload(server):
+
+    first = server.diagrams.diagram(fmt='plantuml')
+    server.diagrams.reload()
+
+    assert server.loads == [1, 1]
+    assert server.diagrams.version == 2
+    assert server.diagrams.diagram(fmt='plantuml') == first
+
+
+def test_overview(server):
+
+    code, headers, body = _get(server.url + '/overview.json')
+    assert code == 200
+    summary = json.loads(body.decode('utf-8'))
+    assert summary['schemas'][0]['link'] == '/schemas/default.json'
+    assert _get(server.url + '/overview.dot-large')[0] == 404
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+import os
+import textwrap
+
+import sadisplay
+import model
+
+from sadisplay.cache import FragmentCache
+from sadisplay import source
+from sadisplay.source import summarize, parse, describe_summaries
+from sadisplay.source import describe_source
+
+MODEL = os.path.join(os.path.dirname(__file__), 'model.py')
+
+
+def _items():
+    items = [model.User, model.Admin, model.Manager, model.Employee,
+             model.Address, model.Book, model.notes]
+    if hasattr(model, 'JsonData'):
+        items += [model.JsonData, model.json_data]
+    return items
+
+
+def test_describe_source():
+
+    desc = describe_source([MODEL])
+
+    assert desc == sadisplay.describe(_items())
+
+
+def test_describe_source_options():
+
+    options = dict(
+        show_methods=False,
+        show_properties=False,
+        show_simple_indexes=False,
+        show_columns_of_indexes=False, )
+
+    desc = describe_source([MODEL], **options)
+
+    assert desc == sadisplay.describe(_items(), **options)
+
+
+def test_annotated_models():
+
+    source = textwrap.dedent('''
+        import enum
+        from typing import List, Optional
+        from sqlalchemy import ForeignKey, String, Index
+        from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+        from sqlalchemy.orm import relationship
+
+
+        class Color(enum.Enum):
+            red = 1
+            yellow = 2
+
+
+        class Base(DeclarativeBase):
+            pass
+
+
+        class Created(object):
+            created: Mapped[Optional[int]] = mapped_column(index=True)
+
+
+        class Person(Created, Base):
+            __tablename__ = 'person'
+            __table_args__ = (Index('ix_person_kind', 'kind', 'name'), )
+            id: Mapped[int] = mapped_column(primary_key=True)
+            name: Mapped[str] = mapped_column(String(30))
+            kind: Mapped[str]
+            color: Mapped[Color]
+            pets: Mapped[List['Pet']] = relationship(back_populates='owner')
+
+            def greet(self):
+                pass
+
+
+        class Engineer(Person):
+            __tablename__ = 'engineer'
+            id: Mapped[int] = mapped_column(ForeignKey('person.id'),
+                                            primary_key=True)
+
+            def build(self):
+                pass
+
+
+        class Pet(Base):
+            __tablename__ = 'pet'
+            id: Mapped[int] = mapped_column(primary_key=True)
+            owner_id = mapped_column(ForeignKey(Person.id))
+            owner: Mapped['Person'] = relationship(back_populates='pets')
+    ''')
+
+    objects, relations, inherits = describe_summaries(
+        [summarize(source)])
+
+    person, engineer, pet = objects
+
+    assert person['cols'] == [
+        ('INTEGER', 'id', 'pk'),
+        ('VARCHAR(6)', 'color', None),
+        ('INTEGER', 'created', None),
+        ('VARCHAR', 'kind', None),
+        ('VARCHAR(30)', 'name', None),
+    ]
+    assert person['indexes'] == [
+        {'name': 'ix_person_created', 'cols': ['created']},
+        {'name': 'ix_person_kind', 'cols': ['kind', 'name']},
+    ]
+    assert person['props'] == ['pets']
+    assert person['methods'] == ['greet']
+
+    # joined table inheritance
+    assert engineer['indexes'] == []
+    assert engineer['methods'] == ['build']
+
+    assert pet['cols'] == [('INTEGER', 'id', 'pk'),
+                           ('INTEGER', 'owner_id', 'fk')]
+
+    assert relations == [{
+        'from': 'Pet',
+        'from_schema': None,
+        'by': 'owner_id',
+        'to': 'Person',
+        'to_schema': None,
+        'to_col': 'id',
+    }]
+    assert inherits == [{'child': 'Engineer', 'parent': 'Person'}]
+
+
+def test_same_names_in_modules(tmpdir):
+
+    package = tmpdir.mkdir('app')
+    package.join('__init__.py').write('')
+    package.join('base.py').write(textwrap.dedent('''
+        from sqlalchemy.ext.declarative import declarative_base
+        Base = declarative_base()
+    '''))
+    for name, type_ in (('a', 'String(10)'), ('b', 'Integer')):
+        package.join('%s.py' % name).write(textwrap.dedent('''
+            import enum
+            from sqlalchemy import Column, Integer, String, Enum
+            from .base import Base
+
+
+            class Kind(enum.Enum):
+                {name}_long_name = 1
+
+
+            class User(Base):
+                __tablename__ = '{name}_users'
+                id = Column({type_}, primary_key=True)
+                kind = Column(Enum(Kind))
+        '''.format(name=name, type_=type_)))
+    package.join('c.py').write(textwrap.dedent('''
+        from sqlalchemy import Column, Integer, ForeignKey
+        from sqlalchemy.orm import relationship
+        from app.base import Base
+        from app.b import User
+        from app import a
+
+
+        class Address(Base):
+            __tablename__ = 'addresses'
+            id = Column(Integer, primary_key=True)
+            user_id = Column(ForeignKey(User.id))
+            a_user_id = Column(ForeignKey(a.User.id))
+            user = relationship(User, backref='addresses')
+    '''))
+
+    objects, relations, inherits = describe_source([str(package)])
+
+    a_user, b_user, address = objects
+    assert a_user['cols'] == [('VARCHAR(10)', 'id', 'pk'),
+                              ('VARCHAR(11)', 'kind', None)]
+    assert a_user['props'] == []
+    assert b_user['cols'] == [('INTEGER', 'id', 'pk'),
+                              ('VARCHAR(11)', 'kind', None)]
+    assert b_user['props'] == ['addresses']
+
+    # typed by the referenced columns
+    assert address['cols'] == [('INTEGER', 'id', 'pk'),
+                               ('VARCHAR(10)', 'a_user_id', 'fk'),
+                               ('INTEGER', 'user_id', 'fk')]
+    assert [(r['by'], r['to']) for r in relations] == [
+        ('user_id', 'User'), ('a_user_id', 'User')]
+
+
+def test_parse_cache(tmpdir, monkeypatch):
+
+    path = tmpdir.join('models.py')
+    path.write('t = Table("t", meta, Column("id", Integer))\n')
+
+    cache = FragmentCache()
+    first = parse([str(tmpdir)], cache=cache)
+
+    def _summarize_file(path):
+        raise AssertionError('parsed again')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(source, 'summarize_file', _summarize_file)
+        assert parse([str(tmpdir)], cache=cache) == first
+
+    # modified files are parsed again
+    path.write('t = Table("t", meta, Column("id", Integer))\n'
+               'u = Table("u", meta, Column("id", Integer))\n')
+    os.utime(str(path), (0, 0))
+
+    summaries = parse([str(tmpdir)], cache=cache)
+    assert sorted(summaries[0]['tables']) == ['t', 'u']
+
+
+def test_parse_workers():
+
+    paths = [MODEL, os.path.join(os.path.dirname(__file__), 'issue_13.py')]
+
+    assert parse(paths, workers=2) == parse(paths)
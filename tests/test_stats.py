@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer
+
+import sadisplay
+
+from sadisplay import stats, render
+
+
+def _engine():
+    engine = create_engine('sqlite://')
+    meta = MetaData()
+    small = Table('small', meta, Column('id', Integer, primary_key=True))
+    Table('empty', meta, Column('id', Integer, primary_key=True))
+    meta.create_all(engine)
+
+    with engine.connect() as conn:
+        conn.execute(small.insert(), [{'id': i} for i in range(3)])
+
+    return engine, meta
+
+
+def test_table_stats():
+
+    engine, meta = _engine()
+    tables = meta.sorted_tables
+    result = stats.table_stats(engine, tables)
+
+    assert result[None, 'small']['rows'] == 3
+    assert result[None, 'empty']['rows'] == 0
+
+    desc = stats.annotate(
+        sadisplay.describe(tables), result, colors=True)
+    small = [c for c in desc[0] if c['name'] == 'small'][0]
+    assert small['rows'] == 3
+    assert ('color' in small) == (small['size'] is not None)
+
+
+def test_render_stats():
+
+    desc = sadisplay.describe(_engine()[1].sorted_tables)
+    desc[0][0].update(rows=1234567, size=3 * 1024 ** 2, color='#fdae6b')
+
+    assert render.format_stats(desc[0][0]) == '1.2M rows, 3.0 MB'
+    assert render.format_stats(desc[0][1]) == ''
+    assert 'Class empty << 1.2M rows, 3.0 MB >> #fdae6b {' in \
+        sadisplay.plantuml(desc)
+    assert '1.2M rows, 3.0 MB' in sadisplay.dot(desc)
+    assert 'bgcolor="#fdae6b"' in sadisplay.dot(desc)